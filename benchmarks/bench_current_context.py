@@ -0,0 +1,35 @@
+"""
+Compares KubeConfig.current_context()'s scanning fast path against reading
+the same value out of a full view, on multi-megabyte configs.
+"""
+import pytest
+
+import kubeconfig
+
+import synthetic
+
+# 200 entries is roughly 1.6 MB, 2000 roughly 16 MB.
+SIZES = [200, 2000]
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=lambda size: '%d-entries' % size)
+def config_path(request, tmpdir_factory):
+    path = str(tmpdir_factory.mktemp('current-context').join('config'))
+    return synthetic.write(path, entries=request.param)
+
+
+def bench_current_context(benchmark, config_path):
+    conf = kubeconfig.KubeConfig(config_path, backend='native', cache=False)
+    assert benchmark(conf.current_context) == 'tenant-%05d' % (
+        len(conf.view()['contexts']) - 1)
+
+
+def bench_current_context_from_view(benchmark, config_path):
+    conf = kubeconfig.KubeConfig(config_path, backend='native', cache=False)
+    benchmark.pedantic(lambda: conf.view()['current-context'], rounds=3)
+
+
+def bench_current_context_cached(benchmark, config_path):
+    conf = kubeconfig.KubeConfig(config_path, backend='native')
+    conf.view()
+    benchmark(conf.current_context)
@@ -0,0 +1,42 @@
+"""
+How long a fresh interpreter takes to import the package, as short-lived
+tools that use it pay this on every run. Each round starts a new Python
+with ``-X importtime``; the timings include interpreter startup, and the
+import's own cumulative time (in microseconds, as reported by Python) is
+recorded in the benchmark's ``extra_info``.
+"""
+import subprocess
+import sys
+
+import pytest
+
+STATEMENTS = {
+    'package': 'import kubeconfig',
+    'kubeconfig-class': 'import kubeconfig; kubeconfig.KubeConfig',
+}
+
+
+def _import_time(statement):
+    """
+    :rtype: int
+    :return: The cumulative time, in microseconds, that ``-X importtime``
+        reports for the ``kubeconfig`` package and its submodules.
+    """
+    proc = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', statement],
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True, check=True)
+    total = 0
+    for line in proc.stderr.splitlines():
+        _, cumulative, name = line.split('|')
+        # Nested imports are indented. Only top-level ones are counted, so
+        # that nothing is counted twice.
+        name = name[1:]
+        if name.split('.')[0] == 'kubeconfig':
+            total += int(cumulative)
+    return total
+
+
+@pytest.mark.parametrize('statement', sorted(STATEMENTS))
+def bench_import(benchmark, statement):
+    benchmark.extra_info['import_us'] = _import_time(STATEMENTS[statement])
+    benchmark.pedantic(_import_time, args=(STATEMENTS[statement],), rounds=10)
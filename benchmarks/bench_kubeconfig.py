@@ -0,0 +1,146 @@
+"""
+Times every KubeConfig method against both backends, on the synthetic
+configs from conftest.CONFIGS. The kubectl backend runs against the fake
+kubectl in ``bin/``.
+"""
+import pytest
+
+import kubeconfig
+from kubeconfig import kubectl
+
+# Write benchmarks start from a fresh copy of the config every round, so
+# they're run a fixed number of times rather than calibrated.
+ROUNDS = 5
+
+WRITES = {
+    'delete_cluster': (('tenant-00000',), {}),
+    'delete_context': (('tenant-00000',), {}),
+    'delete_user': (('tenant-00000',), {}),
+    'rename_context': (('tenant-00000', 'renamed'), {}),
+    'set': (('contexts.tenant-00000.namespace', 'bench'), {}),
+    'set_cluster': (('tenant-00000',), {'server': 'https://bench'}),
+    'set_context': (('bench', ), {'cluster': 'tenant-00000', 'user': 'tenant-00000'}),
+    'set_credentials': (('tenant-00000',), {'token': 'bench'}),
+    'unset': (('contexts.tenant-00000.namespace',), {}),
+    'use_context': (('tenant-00000',), {}),
+}
+
+
+@pytest.fixture(params=['native', 'kubectl'])
+def backend(request):
+    return request.param
+
+
+def bench_kubectl_run(benchmark):
+    """The fixed cost of running kubectl at all."""
+    benchmark.pedantic(kubectl.run, rounds=10)
+
+
+def bench_view(benchmark, backend, config_template):
+    conf = kubeconfig.KubeConfig(config_template, backend=backend, cache=False)
+    benchmark.pedantic(conf.view, rounds=ROUNDS)
+
+
+def bench_view_cached(benchmark, backend, config_template):
+    conf = kubeconfig.KubeConfig(config_template, backend=backend)
+    conf.view()
+    benchmark(conf.view)
+
+
+def bench_view_snapshot(benchmark, backend, config_template, tmpdir):
+    """A new instance's first view, as in a new process, from a snapshot."""
+    snapshots = str(tmpdir.join('snapshots'))
+    kubeconfig.KubeConfig(config_template, backend=backend, snapshot=snapshots).view()
+
+    def _view():
+        kubeconfig.KubeConfig(config_template, backend=backend, cache=False,
+                              snapshot=snapshots).view()
+    benchmark.pedantic(_view, rounds=ROUNDS)
+
+
+def bench_current_context(benchmark, backend, config_template):
+    conf = kubeconfig.KubeConfig(config_template, backend=backend, cache=False)
+    benchmark(conf.current_context)
+
+
+def bench_get_context(benchmark, backend, config_template):
+    conf = kubeconfig.KubeConfig(config_template, backend=backend)
+    conf.index()
+    benchmark(conf.get_context, 'tenant-00000')
+
+
+@pytest.mark.parametrize('method', sorted(WRITES))
+def bench_write(benchmark, backend, fresh_config, method):
+    args, kwargs = WRITES[method]
+
+    def setup():
+        return (kubeconfig.KubeConfig(fresh_config(), backend=backend, cache=False),), {}
+
+    benchmark.pedantic(lambda conf: getattr(conf, method)(*args, **kwargs),
+                       setup=setup, rounds=ROUNDS)
+
+
+def bench_batch(benchmark, backend, fresh_config):
+    """Provisioning a cluster: the four calls it takes, written once."""
+    def setup():
+        return (kubeconfig.KubeConfig(fresh_config(), backend=backend, cache=False),), {}
+
+    def provision(conf):
+        with conf.batch():
+            conf.set_cluster('bench', server='https://bench')
+            conf.set_credentials('bench', token='bench')
+            conf.set_context('bench', cluster='bench', user='bench')
+            conf.use_context('bench')
+
+    benchmark.pedantic(provision, setup=setup, rounds=ROUNDS)
+
+
+@pytest.mark.parametrize('write_policy', ['immediate', 'coalesce'])
+def bench_write_burst(benchmark, fresh_config, write_policy):
+    """A rollout's worth of changes in quick succession, then a flush."""
+    def setup():
+        return (kubeconfig.KubeConfig(fresh_config(), backend='native', cache=False,
+                                      write_policy=write_policy),), {}
+
+    def burst(conf):
+        for i in range(20):
+            conf.set('contexts.tenant-00000.namespace', 'bench-%d' % i)
+        conf.flush()
+
+    benchmark.pedantic(burst, setup=setup, rounds=ROUNDS)
+
+
+def bench_export_many(benchmark, config_template):
+    """A minified config per context. Not flattened, since the files that
+    the no-certs configs refer to don't exist."""
+    conf = kubeconfig.KubeConfig(config_template, backend='native')
+    benchmark.pedantic(conf.export_many, kwargs={'flatten': False}, rounds=ROUNDS)
+
+
+def _changed(config_template):
+    """The template's view, with a rollout's worth of changes made to it."""
+    view = kubeconfig.KubeConfig(config_template, backend='native').view(raw=True)
+    for context in view['contexts'][:20]:
+        context['context']['namespace'] = 'bench'
+    return view
+
+
+def bench_diff(benchmark, config_template):
+    changed = _changed(config_template)
+    benchmark.pedantic(kubeconfig.diff, args=(config_template, changed), rounds=ROUNDS)
+
+
+def bench_apply_delta(benchmark, fresh_config, config_template):
+    """Shipping just the changes, rather than the whole file."""
+    changeset = kubeconfig.diff(config_template, _changed(config_template))
+
+    def setup():
+        return (kubeconfig.KubeConfig(fresh_config(), backend='native', cache=False),
+                changeset), {}
+
+    benchmark.pedantic(kubeconfig.KubeConfig.apply_delta, setup=setup, rounds=ROUNDS)
+
+
+def bench_validate(benchmark, config_template):
+    conf = kubeconfig.KubeConfig(config_template, backend='native')
+    benchmark.pedantic(conf.validate, rounds=ROUNDS)
@@ -0,0 +1,45 @@
+"""
+Compares the memory held by a view as dicts and lists with the compact
+form (see ``kubeconfig.model``). The bytes retained by each are recorded in
+the benchmark's ``extra_info``, and shown by ``--benchmark-columns`` or in
+the saved JSON; the timings are of building each form.
+
+Retained bytes are counted from cold caches, and include whatever the view
+and parse caches keep, since that's held as long as the view is.
+"""
+import gc
+import tracemalloc
+
+import pytest
+
+import kubeconfig
+from kubeconfig import cache
+
+
+def _retained(conf, compact, rounds=3):
+    """
+    :return: The fewest bytes that a view (and whatever it leaves in the
+        caches) held over a few rounds, since the interpreter's table of
+        interned strings grows now and then, and stays grown.
+    """
+    sizes = []
+    for _ in range(rounds):
+        conf.cache_clear()
+        cache.parse_cache.clear()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = conf.view(compact=compact)
+            gc.collect()
+            sizes.append(tracemalloc.get_traced_memory()[0])
+        finally:
+            tracemalloc.stop()
+        del result
+    return min(sizes)
+
+
+@pytest.mark.parametrize('compact', [False, True], ids=['dicts', 'compact'])
+def bench_view_memory(benchmark, config_template, compact):
+    conf = kubeconfig.KubeConfig(config_template, backend='native')
+    benchmark.extra_info['retained_bytes'] = _retained(conf, compact)
+    benchmark.pedantic(conf.view, kwargs={'compact': compact}, rounds=5)
@@ -0,0 +1,42 @@
+"""
+Times a refresh of a view merged from many files (one per cluster, as when
+KUBECONFIG lists a file per cluster) after one of them changes.
+"""
+import os
+
+import pytest
+
+import kubeconfig
+from kubeconfig import cache
+
+import synthetic
+
+FILES = 100
+
+
+@pytest.fixture()
+def many_files(tmpdir, monkeypatch):
+    paths = []
+    for index in range(FILES):
+        path = str(tmpdir.join('config-%03d' % index))
+        paths.append(synthetic.write(path, entries=1, first=index))
+    monkeypatch.setenv('KUBECONFIG', os.pathsep.join(paths))
+    return paths
+
+
+def _touch_one(paths):
+    # A content change, so that the file can't be served from cache.
+    with open(paths[FILES // 2], 'a') as fobj:
+        fobj.write('\n')
+    return (), {}
+
+
+def bench_refresh_one_changed(benchmark, many_files):
+    conf = kubeconfig.KubeConfig(backend='native', cache=False)
+    conf.view()
+    benchmark.pedantic(conf.view, setup=lambda: _touch_one(many_files), rounds=20)
+
+
+def bench_refresh_cold(benchmark, many_files):
+    conf = kubeconfig.KubeConfig(backend='native', cache=False)
+    benchmark.pedantic(conf.view, setup=cache.parse_cache.clear, rounds=5)
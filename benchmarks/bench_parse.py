@@ -0,0 +1,50 @@
+"""
+Compares the ways a view can be parsed, on configs large enough for the
+parser to dominate: kubectl's YAML output with the pure-Python and libyaml
+loaders, kubectl's JSON output, and the native backend's file parser.
+"""
+import json
+
+import pytest
+import yaml
+
+from kubeconfig import native
+
+import synthetic
+
+# 200 entries is roughly 1.6 MB, 2000 roughly 16 MB.
+SIZES = [200, 2000]
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=lambda size: '%d-entries' % size)
+def config(request):
+    return synthetic.generate(entries=request.param)
+
+
+@pytest.fixture(scope='module')
+def config_yaml(config):
+    return yaml.dump(config, Dumper=yaml.CSafeDumper, default_flow_style=False)
+
+
+@pytest.fixture(scope='module')
+def config_json(config):
+    return json.dumps(config)
+
+
+def bench_yaml_safe_loader(benchmark, config_yaml):
+    benchmark.pedantic(yaml.load, args=(config_yaml,), kwargs={'Loader': yaml.SafeLoader},
+                       rounds=3)
+
+
+@pytest.mark.skipif(not hasattr(yaml, 'CSafeLoader'), reason='PyYAML built without libyaml')
+def bench_yaml_csafe_loader(benchmark, config_yaml):
+    benchmark.pedantic(yaml.load, args=(config_yaml,), kwargs={'Loader': yaml.CSafeLoader},
+                       rounds=5)
+
+
+def bench_json(benchmark, config_json):
+    benchmark(json.loads, config_json)
+
+
+def bench_native_parse(benchmark, config_yaml):
+    benchmark.pedantic(native.parse, args=(config_yaml.encode('utf-8'),), rounds=5)
@@ -0,0 +1,61 @@
+import os
+import shutil
+import sys
+
+import pytest
+
+import synthetic
+
+HERE = os.path.abspath(os.path.dirname(__file__))
+ROOT = os.path.dirname(HERE)
+
+#: (entries, embed_certs) combinations to run the config benchmarks against.
+#: 500 entries with embedded certs is roughly 4 MB.
+CONFIGS = [
+    (20, True),
+    (500, True),
+    (500, False),
+]
+
+
+@pytest.fixture(scope='session', autouse=True)
+def fake_kubectl():
+    """
+    Puts the fake kubectl (see ``fake_kubectl.py``) first on the path, so
+    that nothing here depends on, or is skewed by, a real kubectl.
+    """
+    saved = {key: os.environ.get(key) for key in ('PATH', 'PYTHON', 'PYTHONPATH')}
+    os.environ['PATH'] = os.path.join(HERE, 'bin') + os.pathsep + os.environ.get('PATH', '')
+    os.environ['PYTHON'] = sys.executable
+    os.environ['PYTHONPATH'] = os.pathsep.join(
+        filter(None, [ROOT, saved['PYTHONPATH']]))
+    yield
+    for key, value in saved.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+
+
+@pytest.fixture(scope='session', params=CONFIGS,
+                ids=lambda c: '%d-entries%s' % (c[0], '' if c[1] else '-no-certs'))
+def config_template(request, tmpdir_factory):
+    """A synthetic config, generated once per session. Don't change it."""
+    entries, embed_certs = request.param
+    path = str(tmpdir_factory.mktemp('template').join('config'))
+    return synthetic.write(path, entries=entries, embed_certs=embed_certs)
+
+
+@pytest.fixture()
+def fresh_config(config_template, tmpdir):
+    """
+    :return: A function that (re)writes a private copy of the template, and
+        returns its path. Pass it as a ``benchmark.pedantic`` setup so that
+        every round of a write benchmark starts from the same state.
+    """
+    path = str(tmpdir.join('config'))
+
+    def _fresh():
+        shutil.copyfile(config_template, path)
+        return path
+    return _fresh
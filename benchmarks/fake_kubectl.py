@@ -0,0 +1,104 @@
+"""
+A deterministic stand-in for ``kubectl``, for benchmarking the kubectl
+backend without a real kubectl (or cluster) around.
+
+It understands the ``kubectl [--kubeconfig PATH] config ...`` sub-commands
+that :py:class:`kubeconfig.kubectl.KubectlBackend` runs, and carries them out
+with the native backend. Timings therefore include everything the kubectl
+backend pays for (a fork and exec per call, output parsing) with the config
+work itself held constant.
+
+Like the real kubectl, it doesn't take :py:mod:`kubeconfig.locking`'s
+locks, which the backend already holds while it runs.
+"""
+import contextlib
+import json
+import sys
+
+import yaml
+
+from kubeconfig import embedded
+from kubeconfig import exceptions
+from kubeconfig import locking
+from kubeconfig import native
+from kubeconfig.index import ConfigIndex
+
+_BOOL_FLAGS = ('embed-certs', 'insecure-skip-tls-verify')
+# Flags that may be given without a value, which then means ``true``.
+_SWITCHES = frozenset(_BOOL_FLAGS + ('flatten', 'minify', 'raw'))
+
+
+def _parse(argv):
+    """
+    :rtype: tuple
+    :return: ``(positional, flags)``, where repeated flags are collected
+        into lists. Other than :py:data:`_SWITCHES`, a flag without an
+        ``=value`` takes the next argument as its value.
+    """
+    positional, flags = [], {}
+    args = iter(argv)
+    for arg in args:
+        if not arg.startswith('--'):
+            positional.append(arg)
+            continue
+        key, sep, value = arg[2:].partition('=')
+        if not sep:
+            value = 'true' if key in _SWITCHES else next(args)
+        flags.setdefault(key, []).append(value)
+    return positional, flags
+
+
+def _switch(flags, key):
+    return flags.get(key, ['false'])[-1] == 'true'
+
+
+def _kwargs(flags):
+    kwargs = {}
+    for key, values in flags.items():
+        if key == 'auth-provider-arg':
+            kwargs['auth_provider_args'] = dict(v.split('=', 1) for v in values)
+        elif key in _BOOL_FLAGS:
+            kwargs[key.replace('-', '_')] = values[-1] == 'true'
+        else:
+            kwargs[key.replace('-', '_')] = values[-1]
+    return kwargs
+
+
+@contextlib.contextmanager
+def _unlocked(filenames):
+    yield
+
+
+def main(argv):
+    locking.locked = _unlocked
+    positional, flags = _parse(argv)
+    backend = native.NativeBackend(flags.pop('kubeconfig', [None])[-1])
+    if not positional:
+        print('kubectl controls the Kubernetes cluster manager.')
+        return 0
+    if positional[0] != 'config' or len(positional) < 2:
+        print('error: unknown command %s' % ' '.join(positional))
+        return 1
+
+    command, args = positional[1], positional[2:]
+    try:
+        if command == 'view':
+            view = backend.view(raw=_switch(flags, 'raw'))
+            if _switch(flags, 'minify'):
+                view = native.minify(ConfigIndex(view), view['current-context'],
+                                     flatten=_switch(flags, 'flatten'))
+            view = embedded.materialize(view)
+            if flags.get('output', [''])[-1] == 'json':
+                print(json.dumps(view, indent=4, sort_keys=True))
+            else:
+                print(yaml.safe_dump(view, default_flow_style=False), end='')
+        else:
+            getattr(backend, command.replace('-', '_'))(*args, **_kwargs(flags))
+    except exceptions.KubectlCommandError as exc:
+        print(exc.message)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
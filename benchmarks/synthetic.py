@@ -0,0 +1,75 @@
+"""
+Generates deterministic, synthetic kubeconfigs of any size for benchmarking.
+"""
+import base64
+import random
+
+import yaml
+
+
+def _blob(rng, size):
+    """
+    :rtype: str
+    :return: ``size`` pseudo-random bytes, base64-encoded like embedded
+        certificate data.
+    """
+    return base64.b64encode(bytes(rng.getrandbits(8) for _ in range(size))).decode('ascii')
+
+
+def generate(entries=100, embed_certs=True, cert_size=1200, seed=0, first=0):
+    """
+    :param int entries: The number of clusters, contexts, and users
+        (``entries`` of each).
+    :param bool embed_certs: If ``True``, clusters embed CA data and users
+        embed a client certificate and key. Otherwise they point at files.
+    :param int cert_size: The size, in bytes, of each embedded blob before
+        base64-encoding.
+    :param int seed: Seeds the generator, so the same arguments always give
+        the same config.
+    :param int first: The number of the first entry, so that several
+        configs can be generated without their names clashing.
+    :rtype: dict
+    :return: A config in the on-disk (v1) form.
+    """
+    rng = random.Random(seed)
+    # Generating unique blobs is slow, so share a small pool of them.
+    blobs = [_blob(rng, cert_size) for _ in range(8)] if embed_certs else []
+    clusters, contexts, users = [], [], []
+    for index in range(first, first + entries):
+        name = 'tenant-%05d' % index
+        cluster = {'server': 'https://10.%d.%d.1:6443' % (index // 256 % 256, index % 256)}
+        user = {}
+        if embed_certs:
+            cluster['certificate-authority-data'] = blobs[index % len(blobs)]
+            user['client-certificate-data'] = blobs[(index + 1) % len(blobs)]
+            user['client-key-data'] = blobs[(index + 2) % len(blobs)]
+        else:
+            cluster['certificate-authority'] = '/etc/kubernetes/%s/ca.crt' % name
+            user['client-certificate'] = '/etc/kubernetes/%s/client.crt' % name
+            user['client-key'] = '/etc/kubernetes/%s/client.key' % name
+        clusters.append({'name': name, 'cluster': cluster})
+        users.append({'name': name, 'user': user})
+        contexts.append({'name': name, 'context': {
+            'cluster': name, 'user': name, 'namespace': 'ns-%d' % (index % 10)}})
+    return {
+        'apiVersion': 'v1',
+        'kind': 'Config',
+        'clusters': clusters,
+        'contexts': contexts,
+        'current-context': contexts[-1]['name'] if contexts else '',
+        'preferences': {},
+        'users': users,
+    }
+
+
+def write(path, **kwargs):
+    """
+    Writes a :py:func:`generate`-d config to ``path``, formatted the way
+    kubectl formats configs.
+
+    :return: ``path``, for convenience.
+    """
+    with open(path, 'w') as fobj:
+        yaml.dump(generate(**kwargs), fobj, Dumper=getattr(yaml, 'CSafeDumper', yaml.SafeDumper),
+                  default_flow_style=False)
+    return path
@@ -1,3 +1,40 @@
-from . import kubectl
-from . import exceptions
-from . kubeconfig import KubeConfig
+import importlib
+import sys
+
+# Everything is imported on first use (see __getattr__ below), so that
+# ``import kubeconfig`` stays cheap for short-lived processes.
+_SUBMODULES = frozenset([
+    'aio', 'bulk', 'cache', 'coalesce', 'credentials', 'delta', 'embedded',
+    'exceptions', 'index', 'kubeconfig', 'kubectl', 'lint', 'locking', 'model',
+    'native', 'overrides', 'tracing', 'watch',
+])
+
+# What ``from kubeconfig import *`` gives, as it did before imports were
+# made lazy.
+__all__ = ['KubeConfig', 'diff', 'exceptions', 'kubeconfig', 'kubectl']
+
+
+def __getattr__(name):
+    if name == 'KubeConfig':
+        from .kubeconfig import KubeConfig
+        globals()[name] = KubeConfig
+        return KubeConfig
+    if name == 'diff':
+        from .delta import diff
+        globals()[name] = diff
+        return diff
+    if name in _SUBMODULES:
+        return importlib.import_module('.' + name, __name__)
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
+
+
+def __dir__():
+    return sorted(set(globals()) | _SUBMODULES | {'KubeConfig', 'diff'})
+
+
+if sys.version_info < (3, 7):
+    # Module-level __getattr__ arrived in Python 3.7.
+    from . import kubectl
+    from . import exceptions
+    from . kubeconfig import KubeConfig
+    from . delta import diff
@@ -0,0 +1,81 @@
+"""
+Command-line tools. Currently just ``python -m kubeconfig lint``; see
+:py:mod:`kubeconfig.lint`.
+"""
+import argparse
+import json
+import sys
+
+from . import bulk, lint
+
+
+def _print_error(args, path, message, code):
+    if args.format == 'json':
+        print(json.dumps({'path': path, 'severity': 'error',
+                          'code': code, 'message': message}))
+    else:
+        print('%s: error: %s [%s]' % (path, message, code))
+
+
+def _lint(args):
+    failed = False
+    paths = []
+    for pattern in args.paths:
+        matches = bulk.expand_paths(pattern)
+        if not matches:
+            # A glob that matches nothing is most likely a typo, or a CI job
+            # run from the wrong directory: don't pass it off as clean.
+            failed = True
+            _print_error(args, pattern, 'no files match', 'no-match')
+        paths.extend(matches)
+    results = lint.lint(paths, executor='thread' if args.threads else 'process',
+                        max_workers=args.jobs) if paths else ()
+    for result in results:
+        if result.error is not None:
+            failed = True
+            message = str(result.error)
+            if message.startswith('error: '):
+                message = message[len('error: '):]
+            _print_error(args, result.path, message, 'unreadable')
+            continue
+        for finding in result.value:
+            if finding.severity == 'error' or args.strict:
+                failed = True
+            if args.format == 'json':
+                record = finding._asdict()
+                record['path'] = result.path
+                print(json.dumps(record, sort_keys=True))
+            else:
+                print('%s: %s: %s [%s]' % (result.path, finding.severity,
+                                           finding.message, finding.code))
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m kubeconfig')
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    lint_parser = commands.add_parser(
+        'lint', help='check kubeconfig files for dangling references and missing files',
+        description='Checks each file, as the only file in its config, in parallel. '
+                    'Exits with 1 if any errors were found, a file could not be read, '
+                    'or a pattern matched no files.')
+    lint_parser.add_argument('paths', nargs='+', metavar='path',
+                             help='a kubeconfig file, or a glob pattern (** recurses)')
+    lint_parser.add_argument('-j', '--jobs', type=int, default=None,
+                             help='how many files to check at once (default: one per CPU)')
+    lint_parser.add_argument('--threads', action='store_true',
+                             help='check files in threads rather than processes')
+    lint_parser.add_argument('--format', choices=['text', 'json'], default='text',
+                             help='print findings as text, or one JSON object per line')
+    lint_parser.add_argument('--strict', action='store_true',
+                             help='exit with 1 on warnings, too')
+    lint_parser.set_defaults(run=_lint)
+
+    args = parser.parse_args(argv)
+    return args.run(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
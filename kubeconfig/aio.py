@@ -0,0 +1,427 @@
+"""
+An asyncio-native counterpart to :py:class:`KubeConfig <kubeconfig.KubeConfig>`.
+
+For example:
+
+.. code-block:: py
+
+    from kubeconfig.aio import AsyncKubeConfig
+
+    async def switch(name):
+        conf = AsyncKubeConfig(max_concurrency=4, timeout=10)
+        await conf.use_context(name)
+        return await conf.current_context()
+
+With the ``'kubectl'`` backend, kubectl is run with
+:py:func:`asyncio.create_subprocess_exec`, so the event loop is never
+blocked waiting on it. Timed-out or cancelled calls kill the kubectl process.
+With the ``'native'`` backend, file I/O and parsing are handed off to the
+loop's default executor.
+
+This module needs Python 3.7 or later.
+"""
+import asyncio
+import contextlib
+import copy
+import functools
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import contextvars
+except ImportError:
+    contextvars = None
+
+from . import delta
+from . import exceptions
+from . import kubectl
+from . import locking
+from . import native
+from .cache import CacheInfo, ViewCache
+from .index import ConfigIndex
+from .kubeconfig import BACKENDS
+from .model import CompactConfig
+
+if contextvars is None or sys.version_info < (3, 7):
+    raise ImportError("kubeconfig.aio needs Python 3.7 or later")
+
+
+async def run(kubeconfig=None, subcmd_args=None, tracer=None):
+    """
+    Coroutine version of :py:func:`kubeconfig.kubectl.run`. If the calling
+    task is cancelled (including by :py:func:`asyncio.wait_for` timing out),
+    the kubectl process is killed before the cancellation propagates.
+
+    :raise: KubectlCommandError when kubectl exits with an error.
+    :rtype: str
+    """
+    args = kubectl.build_args(kubeconfig=kubeconfig, subcmd_args=subcmd_args)
+    start = time.perf_counter()
+    proc = await asyncio.create_subprocess_exec(
+        *args, executable=kubectl.find_kubectl(), stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT)
+    try:
+        stdout, _ = await proc.communicate()
+    except BaseException:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+        raise
+    output = stdout.decode('utf-8', 'replace')
+    kubectl.trace_invocation(tracer, args, start, proc.returncode, len(output))
+    if proc.returncode:
+        raise exceptions.KubectlCommandError(output)
+    return output.strip()
+
+
+def _abandon(manager):
+    manager.__exit__(asyncio.TimeoutError, asyncio.TimeoutError(), None)
+
+
+async def _enter(manager):
+    """
+    Enters a context manager that may block (one that takes a lock, say) in
+    the loop's default executor. If the calling task is cancelled (including
+    by :py:func:`asyncio.wait_for` timing out) first, ``manager`` is exited
+    again as soon as it has been entered, so that what it holds isn't kept.
+    """
+    # Whichever of entering and giving up comes second exits the manager.
+    claimed = threading.Lock()
+
+    def _enter_manager():
+        manager.__enter__()
+        if not claimed.acquire(blocking=False):
+            _abandon(manager)
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, _enter_manager)
+    except BaseException:
+        if not claimed.acquire(blocking=False):
+            _abandon(manager)
+        raise
+
+
+class AsyncKubectlBackend(kubectl.KubectlBackend):
+    """
+    A :py:class:`KubectlBackend <kubeconfig.kubectl.KubectlBackend>` whose
+    methods return coroutines.
+    """
+
+    async def _run_kubectl_config(self, *args):
+        subcmd_args = ['config'] + list(args)
+        if args[0] == 'view':
+            return await run(kubeconfig=self.path, subcmd_args=subcmd_args,
+                             tracer=self.tracer)
+        # As with the synchronous backend, changes take turns with every
+        # other writer. The lock is waited for off the event loop.
+        lock = locking.locked(native.loading_precedence(self.path))
+        await _enter(lock)
+        try:
+            return await run(kubeconfig=self.path, subcmd_args=subcmd_args,
+                             tracer=self.tracer)
+        finally:
+            lock.__exit__(None, None, None)
+
+    async def view(self, raw=False):
+        conf_doc_str = await self._run_kubectl_config(*self._view_args(raw))
+        return self._parse_view(conf_doc_str, raw)
+
+
+class AsyncKubeConfig(object):
+    """
+    Coroutine versions of :py:class:`KubeConfig <kubeconfig.KubeConfig>`'s
+    reads (:py:meth:`view`, :py:meth:`current_context`, :py:meth:`index`,
+    :py:meth:`get`, :py:meth:`get_many`, ``get_cluster()`` and the like,
+    :py:meth:`resolve`, and :py:meth:`validate`), of every change it can
+    make, and of :py:meth:`batch`. Every coroutine also accepts a
+    ``timeout`` keyword argument, which overrides the instance-wide default
+    for that call.
+
+    ``export()``, ``export_many()``, ``overrides()``, ``with_context()``,
+    ``resolve_credentials()``, and ``watch()`` have no coroutine versions;
+    use a :py:class:`KubeConfig <kubeconfig.KubeConfig>` for those. Nor
+    does ``flush()``, since changes are never coalesced here.
+
+    :param str path: As with :py:class:`KubeConfig <kubeconfig.KubeConfig>`.
+    :param str backend: As with :py:class:`KubeConfig <kubeconfig.KubeConfig>`.
+    :param bool cache: As with :py:class:`KubeConfig <kubeconfig.KubeConfig>`.
+    :param int max_concurrency: The most calls that may be in flight (kubectl
+        processes running, or executor jobs queued) at once. Further calls
+        wait their turn. Changes to the config are always made one at a
+        time.
+    :param float timeout: The default number of seconds a call may take
+        before :py:exc:`asyncio.TimeoutError` is raised, or ``None`` to wait
+        indefinitely.
+    :param Tracer tracer: As with :py:class:`KubeConfig <kubeconfig.KubeConfig>`.
+
+    .. note:: Timed-out native backend calls can't be interrupted; they're
+        abandoned, and run to completion in the executor.
+    """
+
+    def __init__(self, path=None, backend='kubectl', cache=True, max_concurrency=8,
+                 timeout=None, tracer=None):
+        if backend not in BACKENDS:
+            raise ValueError("Unknown backend: %s" % backend)
+        self.path = path
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.tracer = tracer
+        if backend == 'kubectl':
+            self._base_backend = AsyncKubectlBackend(path, tracer=tracer)
+        else:
+            self._base_backend = native.NativeBackend(path, tracer=tracer)
+        # The open batch's backend, in the task (and the tasks it starts)
+        # that opened it.
+        self._batch = contextvars.ContextVar('batch', default=None)
+        self._view_cache = ViewCache(tracer=tracer) if cache else None
+        # Created on first use, so that they belong to the running loop.
+        self._semaphore = None
+        self._write_lock = None
+        # The most recent view, and its index.
+        self._indexed = None
+
+    @property
+    def _backend(self):
+        return self._batch.get() or self._base_backend
+
+    def _in_batch(self):
+        return self._batch.get() is not None
+
+    def cache_info(self):
+        """See :py:meth:`KubeConfig.cache_info <kubeconfig.KubeConfig.cache_info>`."""
+        if self._view_cache is None:
+            return CacheInfo(0, 0)
+        return self._view_cache.info()
+
+    def cache_clear(self):
+        """See :py:meth:`KubeConfig.cache_clear <kubeconfig.KubeConfig.cache_clear>`."""
+        if self._view_cache is not None:
+            self._view_cache.invalidate()
+
+    async def _call(self, method, *args, timeout=None, **kwargs):
+        """
+        Runs one backend method, within the concurrency limit and timeout.
+        """
+        return await self._call_on(self._backend, method, *args, timeout=timeout, **kwargs)
+
+    async def _call_on(self, backend, method, *args, timeout=None, **kwargs):
+        func = functools.partial(getattr(backend, method), *args, **kwargs)
+        if getattr(backend, 'in_transaction', False):
+            # Batched changes only touch memory; there's nothing to wait on.
+            return func()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        if timeout is None:
+            timeout = self.timeout
+        async with self._semaphore:
+            if isinstance(backend, native.NativeBackend):
+                awaitable = asyncio.get_running_loop().run_in_executor(None, func)
+            else:
+                awaitable = func()
+            return await asyncio.wait_for(awaitable, timeout)
+
+    async def _write(self, method, *args, **kwargs):
+        if self._in_batch():
+            return await self._call(method, *args, **kwargs)
+        # Writes wait for each other's file locks anyway (see
+        # kubeconfig.locking), but waiting here ties up no executor threads
+        # or kubectl processes. Reads are left to run alongside them.
+        if self._write_lock is None:
+            self._write_lock = asyncio.Lock()
+        try:
+            async with self._write_lock:
+                return await self._call(method, *args, **kwargs)
+        finally:
+            self.cache_clear()
+
+    @contextlib.asynccontextmanager
+    async def batch(self, timeout=None):
+        """
+        Coroutine version of :py:meth:`KubeConfig.batch <kubeconfig.KubeConfig.batch>`,
+        for use with ``async with``. Calls made within the block complete
+        immediately; the config is read on entry and written on a clean
+        exit.
+
+        A batch belongs to the task that opened it (and any tasks started
+        within the block). Other tasks using this instance carry on as if
+        it weren't there, and their changes wait for it to complete.
+        """
+        if self._in_batch():
+            # Nested batches join the outermost one.
+            yield self
+            return
+
+        backend = native.NativeBackend(self.path, tracer=self.tracer)
+        transaction = backend.transaction()
+        # An abandoned transaction is closed again (without writing), so
+        # that it doesn't keep the config's write lock.
+        await asyncio.wait_for(_enter(transaction),
+                               timeout if timeout is not None else self.timeout)
+        token = self._batch.set(backend)
+        try:
+            try:
+                yield self
+            finally:
+                self._batch.reset(token)
+        except BaseException:
+            self.cache_clear()
+            if not transaction.__exit__(*sys.exc_info()):
+                raise
+        else:
+            try:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, transaction.__exit__, None, None, None)
+            finally:
+                self.cache_clear()
+
+    #: An alias for :py:meth:`batch`.
+    transaction = batch
+
+    async def apply_delta(self, changeset, timeout=None):
+        """See :py:meth:`KubeConfig.apply_delta <kubeconfig.KubeConfig.apply_delta>`."""
+        if isinstance(changeset, (str, bytes)):
+            changeset = delta.loads(changeset)
+        async with self.batch(timeout=timeout):
+            await self._call('apply_delta', changeset)
+
+    async def current_context(self, timeout=None):
+        """See :py:meth:`KubeConfig.current_context <kubeconfig.KubeConfig.current_context>`."""
+        current_context = (await self.view(timeout=timeout)).get('current-context')
+        return current_context if current_context else None
+
+    async def delete_cluster(self, name, timeout=None):
+        """See :py:meth:`KubeConfig.delete_cluster <kubeconfig.KubeConfig.delete_cluster>`."""
+        await self._write('delete_cluster', name, timeout=timeout)
+
+    async def delete_context(self, name, timeout=None):
+        """See :py:meth:`KubeConfig.delete_context <kubeconfig.KubeConfig.delete_context>`."""
+        await self._write('delete_context', name, timeout=timeout)
+
+    async def delete_user(self, name, timeout=None):
+        """See :py:meth:`KubeConfig.delete_user <kubeconfig.KubeConfig.delete_user>`."""
+        await self._write('delete_user', name, timeout=timeout)
+
+    async def merge(self, fragment, strategy='overwrite', timeout=None):
+        """See :py:meth:`KubeConfig.merge <kubeconfig.KubeConfig.merge>`."""
+        async with self.batch(timeout=timeout):
+            return await self._call('merge', fragment, strategy)
+
+    async def rename_context(self, old_name, new_name, timeout=None):
+        """See :py:meth:`KubeConfig.rename_context <kubeconfig.KubeConfig.rename_context>`."""
+        await self._write('rename_context', old_name, new_name, timeout=timeout)
+
+    async def set(self, name, value, timeout=None):
+        """See :py:meth:`KubeConfig.set <kubeconfig.KubeConfig.set>`."""
+        await self._write('set', name, value, timeout=timeout)
+
+    async def set_cluster(self, name, certificate_authority=None, embed_certs=None,
+                          insecure_skip_tls_verify=None, server=None, timeout=None):
+        """See :py:meth:`KubeConfig.set_cluster <kubeconfig.KubeConfig.set_cluster>`."""
+        await self._write(
+            'set_cluster', name, certificate_authority=certificate_authority,
+            embed_certs=embed_certs, insecure_skip_tls_verify=insecure_skip_tls_verify,
+            server=server, timeout=timeout)
+
+    async def set_context(self, name, cluster=None, namespace=None, user=None,
+                          timeout=None):
+        """See :py:meth:`KubeConfig.set_context <kubeconfig.KubeConfig.set_context>`."""
+        await self._write('set_context', name, cluster=cluster, namespace=namespace,
+                          user=user, timeout=timeout)
+
+    async def set_credentials(self, name, auth_provider=None, auth_provider_args=None,
+                              client_certificate=None, client_key=None,
+                              embed_certs=None, password=None, token=None,
+                              username=None, timeout=None):
+        """See :py:meth:`KubeConfig.set_credentials <kubeconfig.KubeConfig.set_credentials>`."""
+        await self._write(
+            'set_credentials', name, auth_provider=auth_provider,
+            auth_provider_args=auth_provider_args,
+            client_certificate=client_certificate, client_key=client_key,
+            embed_certs=embed_certs, password=password, token=token,
+            username=username, timeout=timeout)
+
+    async def unset(self, name, timeout=None):
+        """See :py:meth:`KubeConfig.unset <kubeconfig.KubeConfig.unset>`."""
+        await self._write('unset', name, timeout=timeout)
+
+    async def use_context(self, name, timeout=None):
+        """See :py:meth:`KubeConfig.use_context <kubeconfig.KubeConfig.use_context>`."""
+        await self._write('use_context', name, timeout=timeout)
+
+    async def _shared_view(self, timeout=None):
+        """
+        :return: The current view, which may be the cached copy itself and
+            so must not be changed.
+        """
+        if self._view_cache is None or getattr(self._backend, 'in_transaction', False):
+            return await self._call('view', timeout=timeout)
+        signature, value = self._view_cache.lookup(native.loading_precedence(self.path))
+        if value is None:
+            value = await self._call('view', timeout=timeout)
+            self._view_cache.store(signature, value)
+        return value
+
+    async def _index_of_view(self, timeout=None):
+        view = await self._shared_view(timeout=timeout)
+        indexed = self._indexed
+        if indexed is None or indexed[0] is not view:
+            indexed = self._indexed = (view, ConfigIndex(view))
+        return indexed
+
+    async def index(self, timeout=None):
+        """See :py:meth:`KubeConfig.index <kubeconfig.KubeConfig.index>`."""
+        return (await self._index_of_view(timeout=timeout))[1]
+
+    async def get_cluster(self, name, timeout=None):
+        """See :py:meth:`KubeConfig.get_cluster <kubeconfig.KubeConfig.get_cluster>`."""
+        return (await self.index(timeout=timeout)).get_cluster(name)
+
+    async def get_context(self, name, timeout=None):
+        """See :py:meth:`KubeConfig.get_context <kubeconfig.KubeConfig.get_context>`."""
+        return (await self.index(timeout=timeout)).get_context(name)
+
+    async def get_user(self, name, timeout=None):
+        """See :py:meth:`KubeConfig.get_user <kubeconfig.KubeConfig.get_user>`."""
+        return (await self.index(timeout=timeout)).get_user(name)
+
+    async def get(self, path, default=None, timeout=None):
+        """See :py:meth:`KubeConfig.get <kubeconfig.KubeConfig.get>`."""
+        index = await self.index(timeout=timeout)
+        return index.lookup(native.compile_property_path(path), default)
+
+    async def get_many(self, paths, default=None, timeout=None):
+        """See :py:meth:`KubeConfig.get_many <kubeconfig.KubeConfig.get_many>`."""
+        index = await self.index(timeout=timeout)
+        return {path: index.lookup(native.compile_property_path(path), default)
+                for path in paths}
+
+    async def resolve(self, context_name=None, timeout=None):
+        """See :py:meth:`KubeConfig.resolve <kubeconfig.KubeConfig.resolve>`."""
+        view, index = await self._index_of_view(timeout=timeout)
+        if context_name is None:
+            context_name = view.get('current-context')
+        return index.resolve(context_name)
+
+    async def validate(self, timeout=None):
+        """See :py:meth:`KubeConfig.validate <kubeconfig.KubeConfig.validate>`."""
+        backend = self._backend
+        if not getattr(backend, 'in_transaction', False):
+            backend = native.NativeBackend(self.path, tracer=self.tracer)
+        return await self._call_on(backend, 'validate', timeout=timeout)
+
+    async def view(self, compact=False, raw=False, timeout=None):
+        """See :py:meth:`KubeConfig.view <kubeconfig.KubeConfig.view>`."""
+        if compact:
+            # As with KubeConfig, from a view that no cache keeps.
+            backend = self._backend
+            kwargs = {'cached': False} if isinstance(backend, native.NativeBackend) else {}
+            value = await self._call_on(backend, 'view', raw=raw, timeout=timeout, **kwargs)
+            return CompactConfig.from_view(value)
+        if raw:
+            return await self._call('view', raw=True, timeout=timeout)
+        shared = self._view_cache is not None and \
+            not getattr(self._backend, 'in_transaction', False)
+        value = await self._shared_view(timeout=timeout)
+        return copy.deepcopy(value) if shared else value
@@ -0,0 +1,170 @@
+"""
+Reads or changes many kubeconfig files at once.
+
+For example, to point every tenant's ``prod`` cluster at a new API server:
+
+.. code-block:: py
+
+    from kubeconfig.bulk import KubeConfigFleet
+
+    fleet = KubeConfigFleet('/srv/tenants/*/kubeconfig', max_workers=16)
+    for result in fleet.apply('set_cluster', 'prod', server='https://new-api/'):
+        if result.error:
+            print('Failed to update', result.path, result.error)
+
+:py:meth:`KubeConfigFleet.apply` waits for every file before returning its
+results, in the order they finished; :py:meth:`KubeConfigFleet.map` and
+:py:meth:`KubeConfigFleet.view` yield them as each file finishes, so they
+only run as they are iterated over.
+"""
+import collections
+import concurrent.futures
+import glob
+
+from .kubeconfig import KubeConfig
+
+#: The outcome of an operation on one file. ``value`` is whatever the
+#: operation returned, and ``error`` the exception it raised (if any).
+FleetResult = collections.namedtuple('FleetResult', ['path', 'value', 'error'])
+
+_EXECUTORS = {
+    'thread': concurrent.futures.ThreadPoolExecutor,
+    'process': concurrent.futures.ProcessPoolExecutor,
+}
+
+
+def expand_paths(paths):
+    """
+    :param paths: A glob pattern, or a list of paths and/or glob patterns.
+    :rtype: list
+    :return: The matching paths, de-duplicated and in order. Paths without
+        glob characters are kept even if they don't exist (yet).
+    """
+    if isinstance(paths, str):
+        paths = [paths]
+    expanded = []
+    seen = set()
+    for pattern in paths:
+        matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) \
+            else [pattern]
+        for path in matches:
+            if path not in seen:
+                seen.add(path)
+                expanded.append(path)
+    return expanded
+
+
+def _apply(path, backend, method, args, kwargs):
+    conf = KubeConfig(path, backend=backend, cache=False)
+    return getattr(conf, method)(*args, **kwargs)
+
+
+def _map(path, backend, func):
+    return func(KubeConfig(path, backend=backend, cache=False))
+
+
+class KubeConfigFleet(object):
+    """
+    A set of kubeconfig files to operate on in parallel.
+
+    :param paths: A glob pattern, or a list of paths and/or glob patterns
+        (see :py:func:`expand_paths`). Patterns are expanded once, up front.
+    :param str backend: The :py:class:`KubeConfig <kubeconfig.KubeConfig>`
+        backend to use for each file. Defaults to ``'native'``, since forking
+        kubectl once per file is what makes large fleets slow.
+    :param executor: ``'thread'`` (the default) or ``'process'`` to have a
+        pool created for each operation, or an existing
+        :py:class:`concurrent.futures.Executor` to submit work to.
+    :param int max_workers: The pool size, if one is created. Defaults to
+        the pool's own default.
+    """
+
+    def __init__(self, paths, backend='native', executor='thread', max_workers=None):
+        if isinstance(executor, str) and executor not in _EXECUTORS:
+            raise ValueError("Unknown executor: %s" % executor)
+        self.paths = expand_paths(paths)
+        self.backend = backend
+        self.executor = executor
+        self.max_workers = max_workers
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __iter__(self):
+        return iter(self.paths)
+
+    def _run(self, submit):
+        """
+        Submits one job per path, and yields a :py:class:`FleetResult` for
+        each as it completes.
+
+        :param callable submit: Called with an executor and a path, and
+            returns the job's future.
+        """
+        if isinstance(self.executor, str):
+            executor = _EXECUTORS[self.executor](max_workers=self.max_workers)
+            owned = True
+        else:
+            executor, owned = self.executor, False
+        futures = {}
+        try:
+            for path in self.paths:
+                futures[submit(executor, path)] = path
+            for future in concurrent.futures.as_completed(futures):
+                error = future.exception()
+                value = None if error is not None else future.result()
+                yield FleetResult(futures[future], value, error)
+        finally:
+            # If the caller stopped early, don't start anything new.
+            for future in futures:
+                future.cancel()
+            if owned:
+                executor.shutdown(wait=True)
+
+    def apply(self, method, *args, **kwargs):
+        """
+        Calls a :py:class:`KubeConfig <kubeconfig.KubeConfig>` method on
+        every file, and waits for them all to finish.
+
+        :param str method: The method's name, such as ``'set_cluster'``.
+        :param args: Passed on to the method.
+        :param kwargs: Passed on to the method.
+        :rtype: list
+        :return: A :py:class:`FleetResult` per file, in the order they
+            finished.
+        """
+        return list(self._apply(method, args, kwargs))
+
+    def _apply(self, method, args, kwargs):
+        """
+        As for :py:meth:`apply`, but yields each result as its file
+        finishes, so nothing runs until it's iterated over.
+        """
+        if not callable(getattr(KubeConfig, method, None)) or method.startswith('_'):
+            raise AttributeError("KubeConfig has no method %s" % method)
+        return self._run(lambda executor, path: executor.submit(
+            _apply, path, self.backend, method, args, kwargs))
+
+    def map(self, func):
+        """
+        Calls ``func`` with a :py:class:`KubeConfig <kubeconfig.KubeConfig>`
+        for every file. With a process pool, ``func`` must be picklable (a
+        module-level function, for instance).
+
+        :param callable func: Takes a :py:class:`KubeConfig
+            <kubeconfig.KubeConfig>`, and returns whatever should be
+            reported back as the result's ``value``.
+        :rtype: generator
+        :return: A :py:class:`FleetResult` per file, as each finishes.
+        """
+        return self._run(lambda executor, path: executor.submit(
+            _map, path, self.backend, func))
+
+    def view(self):
+        """
+        :rtype: generator
+        :return: A :py:class:`FleetResult` per file, as each finishes, with
+            the file's :py:meth:`view <kubeconfig.KubeConfig.view>` as its
+            ``value``.
+        """
+        return self._apply('view', (), {})
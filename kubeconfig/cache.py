@@ -0,0 +1,373 @@
+"""
+Caching for parsed kubeconfig views and files.
+
+A cached view is keyed on the stat signature of every file it was merged
+from, so it stays valid until one of those files is written to, replaced,
+created, or removed. Beneath that, each file's parsed contents are cached
+separately (see :py:class:`ParseCache`), so that when one of many merged
+files changes, only that one is parsed again. Views can also be kept on
+disk (see :py:class:`SnapshotCache`), for new processes to start from.
+"""
+import collections
+import contextlib
+import hashlib
+import marshal
+import os
+import tempfile
+import threading
+
+from . import tracing
+
+#: Cache statistics, as returned by
+#: :py:meth:`KubeConfig.cache_info <kubeconfig.KubeConfig.cache_info>`.
+CacheInfo = collections.namedtuple('CacheInfo', ['hits', 'misses'])
+
+
+def stat_signature(filenames):
+    """
+    :param list filenames: The files a view is merged from.
+    :rtype: tuple
+    :return: A hashable summary of the files' device, inode, size,
+        modification time, and change time. Missing files are represented
+        by ``None``, so that their creation is noticed too.
+    """
+    signature = []
+    for filename in filenames:
+        try:
+            st = os.stat(filename)
+        except OSError:
+            signature.append((filename, None))
+            continue
+        signature.append((filename, _stat_key(st)))
+    return tuple(signature)
+
+
+def user_cache_dir(*parts):
+    """
+    :rtype: str
+    :return: The path of a directory (which may not exist yet) in the
+        per-user cache: ``$XDG_CACHE_HOME/kubeconfig``, or
+        ``~/.cache/kubeconfig``.
+    """
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache')
+    return os.path.join(base, 'kubeconfig', *parts)
+
+
+def private_dir(dirname):
+    """
+    Creates ``dirname``, if need be, so that only you may use it.
+
+    :raise: PermissionError when it already exists, but isn't yours alone.
+    :rtype: str
+    :return: ``dirname``, for convenience.
+    """
+    os.makedirs(dirname, mode=0o700, exist_ok=True)
+    st = os.lstat(dirname)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise PermissionError('%s is not private to this user' % dirname)
+    return dirname
+
+
+def _stat_key(st):
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+class ViewCache(object):
+    """
+    Holds a single parsed view along with the signature of the files it came
+    from. Safe to share between threads: lookups take no locks, and when
+    several threads miss at once, only one of them builds the view (see
+    :py:meth:`fill`).
+
+    :param Tracer tracer: Told about every hit and miss (see
+        :py:mod:`kubeconfig.tracing`). Defaults to the global tracer.
+    """
+
+    def __init__(self, tracer=None):
+        self.hits = 0
+        self.misses = 0
+        self.tracer = tracer
+        # (signature, view), replaced whole so that readers never see one
+        # without the other.
+        self._entry = None
+        self._building = threading.Lock()
+
+    def _trace(self, hit):
+        tracer = tracing.get_tracer(self.tracer)
+        if tracer.enabled:
+            tracer.on_cache('view', hit)
+
+    def _current(self, signature):
+        entry = self._entry
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+        return None
+
+    def lookup(self, filenames):
+        """
+        :param list filenames: The files the view is merged from.
+        :rtype: tuple
+        :return: A ``(signature, view)`` pair. ``view`` is ``None`` if there
+            is no valid cached copy, in which case the caller should build
+            one and :py:meth:`store` it under ``signature`` (or have
+            :py:meth:`fill` do so).
+        """
+        signature = stat_signature(filenames)
+        value = self._current(signature)
+        if value is not None:
+            self.hits += 1
+            self._trace(True)
+            return signature, value
+        self.misses += 1
+        self._trace(False)
+        return signature, None
+
+    def peek(self, filenames):
+        """
+        Like :py:meth:`lookup`, but a miss isn't counted, and the signature
+        isn't returned. For readers that have a cheaper way of getting at
+        what they need when there's no cached view.
+
+        :param list filenames: The files the view is merged from.
+        :return: The cached view, or ``None``.
+        """
+        if self._entry is None:
+            return None
+        value = self._current(stat_signature(filenames))
+        if value is not None:
+            self.hits += 1
+            self._trace(True)
+        return value
+
+    def store(self, signature, value):
+        """
+        :param tuple signature: As returned by :py:meth:`lookup`.
+        :param value: The freshly built view.
+        """
+        self._entry = (signature, value)
+
+    def fill(self, signature, build):
+        """
+        Builds and stores the view for ``signature`` after a miss, unless
+        another thread has done so in the meantime. Only one thread builds
+        at a time, so a burst of misses (say, on a pool's first use) runs
+        ``build`` once rather than once per thread.
+
+        :param tuple signature: As returned by :py:meth:`lookup`.
+        :param callable build: Called with no arguments to produce the view.
+        :return: The view.
+        """
+        with self._building:
+            value = self._current(signature)
+            if value is None:
+                value = build()
+                self.store(signature, value)
+        return value
+
+    def get(self, filenames, build):
+        """
+        :param list filenames: The files the view is merged from.
+        :param callable build: Called with no arguments to produce the view
+            when there's no valid cached copy.
+        :return: The cached view, or a freshly built one.
+        """
+        signature, value = self.lookup(filenames)
+        if value is None:
+            value = self.fill(signature, build)
+        return value
+
+    def invalidate(self):
+        """Drops the cached view, if there is one."""
+        self._entry = None
+
+    def info(self):
+        """
+        :rtype: CacheInfo
+        """
+        return CacheInfo(self.hits, self.misses)
+
+
+class ParseCache(object):
+    """
+    Holds the parsed contents of recently loaded files. A file is only read
+    again if its stat signature has changed, and only parsed again if its
+    contents have too (so a file that's merely touched, or rewritten as it
+    was, isn't). Safe to share between threads.
+
+    Cached documents are shared by everything that loads the same file, so
+    they must never be changed.
+
+    :param int maxsize: The most files to remember. The least recently used
+        are dropped first.
+    """
+
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        # filename -> (stat key, content digest, parsed document)
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, filename, parse, tracer=None):
+        """
+        :param str filename: The file to load.
+        :param callable parse: Called with the file's contents (as bytes) to
+            parse them, when there's no valid cached copy.
+        :param Tracer tracer: Told about each hit and miss (see
+            :py:mod:`kubeconfig.tracing`). Defaults to the global tracer.
+        :rtype: dict or None
+        :return: The parsed document, or ``None`` if the file doesn't exist.
+        """
+        try:
+            fobj = open(filename, 'rb')
+        except FileNotFoundError:
+            with self._lock:
+                self._entries.pop(filename, None)
+            return None
+        with fobj:
+            key = _stat_key(os.fstat(fobj.fileno()))
+            with self._lock:
+                entry = self._entries.get(filename)
+            if entry is not None and entry[0] == key:
+                hit, digest, doc = True, entry[1], entry[2]
+            else:
+                data = fobj.read()
+                digest = hashlib.sha256(data).digest()
+                if entry is not None and entry[1] == digest:
+                    hit, doc = True, entry[2]
+                else:
+                    hit, doc = False, parse(data)
+        with self._lock:
+            self._entries[filename] = (key, digest, doc)
+            self._entries.move_to_end(filename)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        tracer = tracing.get_tracer(tracer)
+        if tracer.enabled:
+            tracer.on_cache('parse', hit)
+        return doc
+
+    def clear(self):
+        """Forgets every file."""
+        with self._lock:
+            self._entries.clear()
+
+    def info(self):
+        """
+        :rtype: CacheInfo
+        """
+        return CacheInfo(self.hits, self.misses)
+
+
+class SnapshotCache(object):
+    """
+    Keeps views on disk in :py:mod:`marshal` format, so that a new process
+    can load the view an earlier one built in far less time than merging
+    it again takes. A snapshot is used only if the stat signature of the
+    files it was built from still matches (see :py:func:`stat_signature`).
+    Otherwise, it's rebuilt.
+
+    Snapshots are written to a temporary file that then replaces the old
+    one, so readers never see a partial snapshot, and concurrent writers
+    can't corrupt one: the last to finish wins.
+
+    :param str directory: Where to keep snapshots. Defaults to
+        ``views`` in the per-user cache (see :py:func:`user_cache_dir`).
+    :param Tracer tracer: Told about every hit and miss (see
+        :py:mod:`kubeconfig.tracing`). Defaults to the global tracer.
+    """
+
+    # Changed whenever what's stored changes form.
+    _VERSION = 1
+
+    def __init__(self, directory=None, tracer=None):
+        self.directory = directory or user_cache_dir('views')
+        self.tracer = tracer
+        self.hits = 0
+        self.misses = 0
+
+    def filename(self, key):
+        """
+        :param key: What the snapshot is of, such as the backend and files
+            a view is merged from. Anything with a stable ``repr``.
+        :rtype: str
+        :return: The path of the snapshot of ``key``.
+        """
+        digest = hashlib.sha256(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, digest + '.marshal')
+
+    def load(self, key, signature):
+        """
+        :rtype: object or None
+        :return: The snapshot of ``key``, or ``None`` if there isn't one
+            built from files with this ``signature``.
+        """
+        try:
+            with open(self.filename(key), 'rb') as fobj:
+                if os.fstat(fobj.fileno()).st_uid != os.getuid():
+                    return None
+                # Much faster than marshal.load(), which reads in small pieces.
+                version, stored_signature, value = marshal.loads(fobj.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if version != self._VERSION or stored_signature != signature:
+            return None
+        return value
+
+    def store(self, key, signature, value):
+        """
+        Atomically replaces the snapshot of ``key``.
+
+        :param tuple signature: The stat signature of the files ``value``
+            was built from, taken before it was built.
+        :raise: OSError when the snapshot can't be written, and ValueError
+            when ``value`` can't be marshalled.
+        """
+        dirname = private_dir(self.directory)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.snapshot-')
+        try:
+            with os.fdopen(fd, 'wb') as fobj:
+                marshal.dump((self._VERSION, signature, value), fobj)
+            os.replace(tmp_path, self.filename(key))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+
+    def get(self, key, signature, build):
+        """
+        :param callable build: Called with no arguments to produce the
+            value when there's no valid snapshot. What it returns is
+            snapshotted, if it can be: failing to write a snapshot doesn't
+            fail the read.
+        :return: A fresh copy of the snapshot, or the freshly built value.
+        """
+        value = self.load(key, signature)
+        hit = value is not None
+        if not hit:
+            value = build()
+            with contextlib.suppress(OSError, ValueError):
+                self.store(key, signature, value)
+        if hit:
+            self.hits += 1
+        else:
+            self.misses += 1
+        tracer = tracing.get_tracer(self.tracer)
+        if tracer.enabled:
+            tracer.on_cache('snapshot', hit)
+        return value
+
+    def info(self):
+        """
+        :rtype: CacheInfo
+        """
+        return CacheInfo(self.hits, self.misses)
+
+
+#: The :py:class:`ParseCache` shared by every native backend.
+parse_cache = ParseCache()
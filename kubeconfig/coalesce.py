@@ -0,0 +1,166 @@
+"""
+Coalesced writes, for when changes come in bursts.
+
+Every change normally reads, rewrites, and replaces your config's files. A
+:py:class:`KubeConfig <kubeconfig.KubeConfig>` made with
+``write_policy='coalesce'`` instead makes each change to an in-memory copy
+of the config straight away (so that it's checked, and seen by reads, at
+once), and writes them out together once the burst has been going on for
+``write_window`` seconds:
+
+.. code-block:: py
+
+    conf = KubeConfig(write_policy='coalesce')
+    for tenant in tenants:
+        conf.set_context(tenant, cluster='shared', namespace=tenant)
+    # Written together, if they haven't been already.
+    conf.flush()
+
+Changes are written as with :py:meth:`KubeConfig.batch <kubeconfig.KubeConfig.batch>`,
+in-process, whichever backend is in use. They're made again, in order, to
+the files as they are at the time, with the files locked (see
+:py:mod:`kubeconfig.locking`), so that changes made meanwhile by other
+processes are kept. If one no longer applies (say, to a context another
+process has since deleted), none of them are written, and the error is
+raised from the next change or :py:meth:`flush <CoalescingWriter.flush>`.
+Each file is flushed to disk before it's replaced, so once
+:py:meth:`flush <CoalescingWriter.flush>` returns, the changes will survive
+a crash.
+
+Pending changes are written before the interpreter exits.
+"""
+import copy
+import threading
+
+from . import native
+
+
+class CoalescingWriter(object):
+    """
+    Holds changes in memory, and writes them out together. Safe to share
+    between threads.
+
+    :param str path: An explicit kubeconfig path, as for
+        :py:class:`NativeBackend <kubeconfig.native.NativeBackend>`.
+    :param float window: How long, in seconds, changes are held after the
+        first of a burst is made.
+    :param Tracer tracer: See :py:mod:`kubeconfig.tracing`.
+    """
+
+    def __init__(self, path=None, window=0.05, tracer=None):
+        self.path = path
+        self.window = window
+        self.tracer = tracer
+        # Held while changes are made, and while they're written, so that
+        # reads never see the config without changes that have been made.
+        self._lock = threading.Lock()
+        # (backend name, args, kwargs) for each change not yet written.
+        self._changes = []
+        # A (LoadedConfig, working doc) pair with the changes made to it.
+        self._pending = None
+        # The working doc's view, once asked for.
+        self._view = None
+        self._timer = None
+        # Why the last scheduled write failed, until it's raised.
+        self._error = None
+
+    @property
+    def pending(self):
+        """``True`` while there are changes that haven't been written."""
+        return self._pending is not None
+
+    def apply(self, method, *args, **kwargs):
+        """
+        Makes a change in memory, and schedules it to be written.
+
+        :param str method: The name of the
+            :py:class:`NativeBackend <kubeconfig.native.NativeBackend>`
+            method that makes the change.
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            when the change can't be made. Nothing is then scheduled.
+        :return: Whatever the method returns.
+        """
+        # Copied, since it may be some time before they're used again.
+        args, kwargs = copy.deepcopy((args, kwargs))
+        with self._lock:
+            self._raise_error()
+            backend = native.NativeBackend(self.path, tracer=self.tracer)
+            if self._pending is None:
+                loaded = backend.load()
+                doc = loaded.edit()
+            else:
+                loaded, doc = self._pending
+                # So that a change that fails part way leaves no trace.
+                doc = loaded.edit(doc)
+            with backend.applying_to(loaded, doc):
+                result = getattr(backend, method)(*args, **kwargs)
+            self._pending = (loaded, doc)
+            self._view = None
+            self._changes.append((method, args, kwargs))
+            if self._timer is None:
+                # Not a daemon, so that changes still pending at exit are
+                # written.
+                self._timer = threading.Timer(self.window, self._scheduled_write)
+                self._timer.start()
+        return result
+
+    def view(self, raw=False):
+        """
+        :param bool raw: As for
+            :py:meth:`KubeConfig.view <kubeconfig.KubeConfig.view>`.
+        :rtype: dict or None
+        :return: The config with the pending changes made, or ``None`` if
+            there are none. Unless ``raw``, this is shared, and must not be
+            changed.
+        """
+        with self._lock:
+            if self._pending is None:
+                return None
+            if raw:
+                loaded, doc = self._pending
+                return loaded.view(raw=True, doc=doc)
+            if self._view is None:
+                loaded, doc = self._pending
+                self._view = loaded.view(doc=doc)
+            return self._view
+
+    def flush(self):
+        """
+        Writes the pending changes now, rather than waiting.
+
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            when a change no longer applies, or an earlier scheduled write
+            failed.
+        """
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            self._raise_error()
+            self._write()
+
+    def _scheduled_write(self):
+        with self._lock:
+            if self._timer is not threading.current_thread():
+                # flush() got there first.
+                return
+            self._timer = None
+            try:
+                self._write()
+            except Exception as exc:
+                self._error = exc
+
+    def _write(self):
+        changes, self._changes = self._changes, []
+        self._pending = self._view = None
+        if not changes:
+            return
+        backend = native.NativeBackend(self.path, tracer=self.tracer, fsync=True)
+        with backend.transaction():
+            for method, args, kwargs in changes:
+                getattr(backend, method)(*args, **kwargs)
+
+    def _raise_error(self):
+        error, self._error = self._error, None
+        if error is not None:
+            raise error
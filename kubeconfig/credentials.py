@@ -0,0 +1,353 @@
+"""
+Credentials from ``exec`` plugins, cached until they expire.
+
+Users with an ``exec`` section (as used by EKS, GKE, and many others) get
+their token or client certificate by running a helper program, following
+the ``client.authentication.k8s.io`` ``ExecCredential`` protocol. Helpers
+often take hundreds of milliseconds, so what they return is kept until its
+``expirationTimestamp`` (or, if it has none, for the life of the process),
+and concurrent requests for the same credentials run the helper just once:
+
+.. code-block:: py
+
+    creds = conf.resolve_credentials('my-eks-context')
+    headers = {'Authorization': 'Bearer %s' % creds.token}
+
+Pass ``disk_cache=True`` to also keep credentials that expire in a private
+directory (``$XDG_CACHE_HOME/kubeconfig/exec``, by default), so that other
+processes can use them too. Cached files that aren't yours, or that others
+may write to, are ignored.
+"""
+import calendar
+import collections
+import contextlib
+import hashlib
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+
+from . import embedded
+from . import exceptions
+from . import tracing
+from .cache import private_dir, user_cache_dir
+
+#: The ``ExecCredential`` API versions we speak.
+API_VERSIONS = (
+    'client.authentication.k8s.io/v1',
+    'client.authentication.k8s.io/v1beta1',
+    'client.authentication.k8s.io/v1alpha1',
+)
+
+#: Credentials this close to expiring (in seconds) are refreshed early, to
+#: allow for clock skew and for the time taken to use them.
+EXPIRY_MARGIN = 10
+
+#: How long (in seconds) a plugin may run before it's killed. Only one
+#: thread at a time runs any given plugin, so one that hangs would
+#: otherwise hold up every other request for the same credentials.
+PLUGIN_TIMEOUT = 60
+
+#: What a user authenticates with. ``client_certificate`` and
+#: ``client_key`` are PEM-encoded. ``expires`` is when the credentials stop
+#: being valid, in seconds since the epoch, or ``None`` if they don't say.
+Credentials = collections.namedtuple(
+    'Credentials', ['token', 'client_certificate', 'client_key', 'expires'])
+
+# The cluster fields passed to plugins that ask for them (which use the
+# same names as a kubeconfig does).
+_CLUSTER_INFO_FIELDS = ('server', 'tls-server-name', 'insecure-skip-tls-verify',
+                        'certificate-authority-data', 'proxy-url')
+# The cluster extension holding per-cluster plugin configuration.
+_EXEC_EXTENSION = 'client.authentication.k8s.io/exec'
+
+_TIMESTAMP = re.compile(
+    r'^(\d{4})-(\d\d)-(\d\d)[Tt ](\d\d):(\d\d):(\d\d)(?:\.\d+)?'
+    r'(?:[Zz]|([+-])(\d\d):(\d\d))$')
+
+
+def parse_timestamp(value):
+    """
+    :param str value: An RFC 3339 timestamp, such as
+        ``2018-03-05T17:30:20-08:00``.
+    :raise: ValueError when ``value`` isn't one.
+    :rtype: float
+    :return: The time, in seconds since the epoch.
+    """
+    match = _TIMESTAMP.match(value)
+    if match is None:
+        raise ValueError("Not an RFC 3339 timestamp: %s" % value)
+    parts = match.groups()
+    seconds = calendar.timegm(tuple(int(part) for part in parts[:6]))
+    if parts[6] is not None:
+        offset = int(parts[7]) * 3600 + int(parts[8]) * 60
+        seconds -= offset if parts[6] == '+' else -offset
+    return float(seconds)
+
+
+def _cluster_info(cluster):
+    info = {}
+    for field in _CLUSTER_INFO_FIELDS:
+        value = cluster.get(field)
+        if value is not None:
+            info[field] = str(value) if isinstance(value, embedded.EmbeddedData) else value
+    for item in cluster.get('extensions') or ():
+        if item.get('name') == _EXEC_EXTENSION:
+            info['config'] = item.get('extension')
+    return info
+
+
+def _describe(command, user):
+    if user is None:
+        return "exec plugin %s" % command
+    return "exec plugin %s of user %s" % (command, user)
+
+
+def _plugin_env(exec_conf, command, user):
+    env = {}
+    for i, item in enumerate(exec_conf.get('env') or ()):
+        if not isinstance(item, dict) or not item.get('name') or 'value' not in item:
+            raise exceptions.ExecPluginError("%s: env[%d] needs both a name and a value"
+                                             % (_describe(command, user), i))
+        env[item['name']] = str(item['value'])
+    return env
+
+
+def run_plugin(exec_conf, cluster=None, user=None, timeout=None):
+    """
+    Runs an ``exec`` credential plugin, without a terminal.
+
+    :param dict exec_conf: The user's ``exec`` section.
+    :param dict cluster: The body of the cluster the credentials are for,
+        passed to the plugin if its ``provideClusterInfo`` is set.
+    :param str user: The name of the user, for error messages.
+    :param float timeout: How long (in seconds) the plugin may run before
+        it's killed. Defaults to :py:data:`PLUGIN_TIMEOUT`.
+    :raise: :py:exc:`ExecPluginError <kubeconfig.exceptions.ExecPluginError>`
+        when the plugin is misconfigured, can't be run, fails, times out,
+        or returns something other than an ``ExecCredential`` of its
+        ``apiVersion``.
+    :rtype: Credentials
+    """
+    import subprocess
+
+    command = exec_conf.get('command')
+    api_version = exec_conf.get('apiVersion')
+    if not command:
+        raise exceptions.ExecPluginError("exec plugin: no command given")
+    if api_version not in API_VERSIONS:
+        raise exceptions.ExecPluginError(
+            "exec plugin: unsupported apiVersion %r" % api_version)
+    if exec_conf.get('interactiveMode') == 'Always':
+        raise exceptions.ExecPluginError(
+            "exec plugin %s needs a terminal, which isn't available" % command)
+
+    spec = {'interactive': False}
+    if exec_conf.get('provideClusterInfo') and cluster is not None:
+        spec['cluster'] = _cluster_info(cluster)
+    env = dict(os.environ)
+    env.update(_plugin_env(exec_conf, command, user))
+    env['KUBERNETES_EXEC_INFO'] = json.dumps(
+        {'apiVersion': api_version, 'kind': 'ExecCredential', 'spec': spec})
+    try:
+        proc = subprocess.run(
+            [command] + list(exec_conf.get('args') or ()), env=env,
+            stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+            universal_newlines=True,
+            timeout=PLUGIN_TIMEOUT if timeout is None else timeout)
+    except subprocess.TimeoutExpired as exc:
+        raise exceptions.ExecPluginError("%s timed out after %g seconds"
+                                         % (_describe(command, user), exc.timeout))
+    except OSError as exc:
+        message = "exec plugin %s could not be run: %s" % (command, exc)
+        if exec_conf.get('installHint'):
+            message += '\n' + exec_conf['installHint']
+        raise exceptions.ExecPluginError(message)
+    if proc.returncode:
+        raise exceptions.ExecPluginError("exec plugin %s exited %d: %s" % (
+            command, proc.returncode, proc.stderr.strip()))
+
+    try:
+        response = json.loads(proc.stdout)
+        if response.get('kind') != 'ExecCredential':
+            raise ValueError("kind is %r, not 'ExecCredential'" % response.get('kind'))
+        if response.get('apiVersion') != api_version:
+            raise ValueError("apiVersion is %r, not %r" % (response.get('apiVersion'), api_version))
+        status = response.get('status') or {}
+        expires = status.get('expirationTimestamp')
+        credentials = Credentials(
+            status.get('token'), status.get('clientCertificateData'),
+            status.get('clientKeyData'), parse_timestamp(expires) if expires else None)
+    except (ValueError, AttributeError) as exc:
+        raise exceptions.ExecPluginError(
+            "exec plugin %s returned an invalid ExecCredential: %s" % (command, exc))
+    if not credentials.token and not (credentials.client_certificate and credentials.client_key):
+        raise exceptions.ExecPluginError(
+            "exec plugin %s returned neither a token nor a client certificate and key" % command)
+    return credentials
+
+
+def default_cache_dir():
+    """
+    :rtype: str
+    :return: Where credentials are cached on disk, unless told otherwise.
+    """
+    return user_cache_dir('exec')
+
+
+class CredentialCache(object):
+    """
+    Holds plugins' credentials until they expire, and makes sure that only
+    one thread at a time runs any given plugin. Safe to share between
+    threads.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        # key -> Credentials
+        self._entries = {}
+        # key -> [the lock held while refreshing it, how many threads are
+        # refreshing it or waiting to]
+        self._refreshing = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(exec_conf, cluster=None):
+        """
+        :rtype: str
+        :return: What credentials from this plugin are cached under: a
+            digest of its configuration, and of the cluster info it's
+            given, if any.
+        """
+        cluster_info = None
+        if exec_conf.get('provideClusterInfo') and cluster is not None:
+            cluster_info = _cluster_info(cluster)
+        data = json.dumps([exec_conf, cluster_info], sort_keys=True, default=str)
+        return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+    def get(self, exec_conf, cluster=None, directory=None, tracer=None, user=None):
+        """
+        :param dict exec_conf: The user's ``exec`` section.
+        :param dict cluster: The body of the cluster the credentials are
+            for.
+        :param str directory: If given, credentials that expire are also
+            kept in (and looked for in) this directory.
+        :param Tracer tracer: Told about each hit and miss (see
+            :py:mod:`kubeconfig.tracing`). Defaults to the global tracer.
+        :param str user: The name of the user, for error messages.
+        :raise: :py:exc:`ExecPluginError <kubeconfig.exceptions.ExecPluginError>`
+            as with :py:func:`run_plugin`.
+        :rtype: Credentials
+        """
+        key = self.key(exec_conf, cluster)
+        credentials = self._lookup(key, directory)
+        hit = credentials is not None
+        if not hit:
+            with self._lock:
+                refreshing = self._refreshing.setdefault(key, [threading.Lock(), 0])
+                refreshing[1] += 1
+            try:
+                with refreshing[0]:
+                    # Another thread may have refreshed them while we waited.
+                    credentials = self._lookup(key, directory)
+                    hit = credentials is not None
+                    if not hit:
+                        credentials = run_plugin(exec_conf, cluster, user=user)
+                        with self._lock:
+                            self._entries[key] = credentials
+                        if directory is not None and credentials.expires is not None:
+                            self._save(key, credentials, directory)
+            finally:
+                # Keep a lock per key only while it's needed, rather than
+                # one for every plugin configuration ever seen.
+                with self._lock:
+                    refreshing[1] -= 1
+                    if not refreshing[1]:
+                        del self._refreshing[key]
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        tracer = tracing.get_tracer(tracer)
+        if tracer.enabled:
+            tracer.on_cache('credentials', hit)
+        return credentials
+
+    def _lookup(self, key, directory):
+        with self._lock:
+            credentials = self._entries.get(key)
+        if credentials is None and directory is not None:
+            credentials = self._load(key, directory)
+            if credentials is not None:
+                with self._lock:
+                    self._entries[key] = credentials
+        if credentials is None or not _fresh(credentials):
+            return None
+        return credentials
+
+    @staticmethod
+    def _load(key, directory):
+        try:
+            fd = os.open(os.path.join(directory, key + '.json'),
+                         os.O_RDONLY | getattr(os, 'O_NOFOLLOW', 0))
+        except OSError:
+            return None
+        with os.fdopen(fd) as fobj:
+            # As for the directory (see private_dir): ignore credentials that
+            # someone else wrote, or could have.
+            st = os.fstat(fobj.fileno())
+            if st.st_uid != os.getuid() or st.st_mode & 0o022:
+                return None
+            try:
+                return Credentials(**json.load(fobj))
+            except (OSError, ValueError, TypeError):
+                return None
+
+    @staticmethod
+    def _save(key, credentials, directory):
+        dirname = private_dir(directory)
+        fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.exec-')
+        try:
+            with os.fdopen(fd, 'w') as fobj:
+                json.dump(credentials._asdict(), fobj)
+            os.replace(tmp_path, os.path.join(dirname, key + '.json'))
+        except BaseException:
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+            raise
+
+    def clear(self):
+        """Forgets every plugin's credentials (but not those on disk)."""
+        with self._lock:
+            self._entries.clear()
+
+
+def _fresh(credentials):
+    return credentials.expires is None or credentials.expires - EXPIRY_MARGIN > time.time()
+
+
+#: The cache shared by every :py:class:`KubeConfig <kubeconfig.KubeConfig>`.
+credential_cache = CredentialCache()
+
+
+def static_credentials(user):
+    """
+    :param dict user: The body of a user without an ``exec`` section, from a
+        raw view.
+    :rtype: Credentials
+    :return: The user's token, and client certificate and key, as given in
+        the config. Files referred to aren't read.
+    """
+    def _pem(value):
+        if not value:
+            return None
+        if not isinstance(value, embedded.EmbeddedData):
+            value = embedded.EmbeddedData(value)
+        return value.decode().decode('ascii')
+
+    return Credentials(user.get('token'), _pem(user.get('client-certificate-data')),
+                       _pem(user.get('client-key-data')), None)
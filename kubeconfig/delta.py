@@ -0,0 +1,172 @@
+"""
+Changesets: the differences between two configs, in a form that's cheap to
+send and can be applied to a third.
+
+Rather than copying a whole config to every host that needs it, send each
+one just what changed:
+
+.. code-block:: py
+
+    import kubeconfig
+    from kubeconfig import delta
+
+    changeset = kubeconfig.diff('previous.kubeconfig', 'current.kubeconfig')
+    payload = delta.dumps(changeset)
+
+    # Then, on each host:
+    kubeconfig.KubeConfig().apply_delta(payload)
+
+A changeset is a dict with (only) the parts of the config that differ. The
+``clusters``, ``contexts``, ``users``, and ``extensions`` sections each map
+entry names to a patch for the entry's body, or to ``None`` if the entry
+was removed. ``current-context`` is the new current context's name, and
+``preferences`` is a patch for the preferences:
+
+.. code-block:: py
+
+    {
+        'clusters': {'staging': {'server': 'https://staging:6443'}, 'old': None},
+        'current-context': 'staging',
+    }
+
+Patches are JSON merge patches (RFC 7386): a mapping's keys are changed
+one by one, with ``None`` removing a key, and any other value replaces what
+was there. Applying a changeset only touches the entries it names, so
+changes the target has of its own are kept, and a new entry is created from
+its patch.
+"""
+import os
+
+from . import native
+
+
+def _load(config):
+    """
+    :rtype: dict
+    :return: ``config`` in internal form. Its entry bodies may be shared.
+    """
+    if config is None:
+        return native.empty_config()
+    if isinstance(config, dict):
+        return native.from_v1(config)
+    if isinstance(config, (str, bytes, os.PathLike)):
+        doc = native.load_file(os.fsdecode(config))
+        return native.empty_config() if doc is None else doc
+    return native.from_v1(config.view(raw=True))
+
+
+def _plain(value):
+    """
+    :return: A copy of ``value`` fit to serialize, with
+        :py:class:`EmbeddedData <kubeconfig.embedded.EmbeddedData>` handles
+        swapped for their encoded strings, and ``None`` values (which a
+        patch can't hold) left out.
+    """
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items() if item is not None}
+    if isinstance(value, list):
+        return [_plain(item) for item in value]
+    encoded = getattr(value, 'encoded', None)
+    return value if encoded is None else encoded
+
+
+def _patch(old, new):
+    """
+    :rtype: dict
+    :return: The merge patch that turns ``old`` into ``new``, both of which
+        are mappings. It's empty if they don't differ.
+    """
+    patch = {}
+    for key, value in new.items():
+        if value is None:
+            continue
+        before = old.get(key)
+        if before is value or before == value:
+            continue
+        if isinstance(before, dict) and isinstance(value, dict):
+            nested = _patch(before, value)
+            if nested:
+                patch[key] = nested
+        else:
+            patch[key] = _plain(value)
+    for key, value in old.items():
+        if value is not None and new.get(key) is None:
+            patch[key] = None
+    return patch
+
+
+def diff(old, new):
+    """
+    Finds the changes that turn one config into another.
+
+    Either config may be given as a dict in the same form
+    :py:meth:`KubeConfig.view <kubeconfig.KubeConfig.view>` returns, the path
+    of a kubeconfig file (which is read as it is, without resolving relative
+    file references), a :py:class:`KubeConfig <kubeconfig.KubeConfig>`
+    (which is compared as its raw view presents it), or ``None`` for an
+    empty config. A file that doesn't exist is taken to be empty.
+
+    :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+        when either config can't be read.
+    :rtype: dict
+    :return: The changeset, sharing nothing with either config. It's empty
+        if they're the same.
+    """
+    old, new = _load(old), _load(new)
+    changeset = {}
+    for section, _ in native.NAMED_SECTIONS:
+        before, after = old[section], new[section]
+        patches = {}
+        for name, body in after.items():
+            if name not in before:
+                patches[name] = _plain(body)
+                continue
+            previous = before[name]
+            if previous is body or previous == body:
+                continue
+            if isinstance(previous, dict) and isinstance(body, dict):
+                patch = _patch(previous, body)
+                if patch:
+                    patches[name] = patch
+            else:
+                patches[name] = _plain(body)
+        for name in before:
+            if name not in after:
+                patches[name] = None
+        if patches:
+            changeset[section] = patches
+    if old['current-context'] != new['current-context']:
+        changeset['current-context'] = new['current-context']
+    preferences = _patch(old['preferences'], new['preferences'])
+    if preferences:
+        changeset['preferences'] = preferences
+    return changeset
+
+
+def dumps(changeset):
+    """
+    :param dict changeset: A changeset, as made by :py:func:`diff`.
+    :rtype: str
+    :return: The changeset as compact JSON, with keys in a fixed order, so
+        that the same changes always give the same string.
+    """
+    # Imported here, as most callers never serialize a changeset.
+    import json
+
+    return json.dumps(changeset, separators=(',', ':'), sort_keys=True)
+
+
+def loads(data):
+    """
+    :param data: A changeset serialized by :py:func:`dumps`, as a
+        :py:class:`str` or :py:class:`bytes`.
+    :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+        when ``data`` isn't valid JSON.
+    :rtype: dict
+    """
+    import json
+
+    try:
+        return json.loads(data)
+    except ValueError as exc:
+        raise native.kubectl_error('invalid changeset: %s' % exc)
@@ -0,0 +1,263 @@
+"""
+Lazy handles for embedded certificate and key data.
+
+The ``certificate-authority-data``, ``client-certificate-data``, and
+``client-key-data`` fields usually make up most of a kubeconfig file, but
+are rarely looked at. The native backend doesn't parse them at all: they
+are cut out of the file before it's handed to the YAML parser, and stand in
+the parsed config as :py:class:`EmbeddedData` handles onto the bytes that
+were read from disk. Nothing is copied or decoded until it's asked for.
+
+Handles are what you'll find in a raw view:
+
+.. code-block:: py
+
+    view = conf.view(raw=True)
+    ca = view['clusters'][0]['cluster']['certificate-authority-data']
+    pem = ca.decode()             # The decoded PEM, as bytes.
+    path = ca.write_temp_file()   # Or a private file holding it.
+
+Use :py:func:`materialize` to swap them for plain strings, before
+serializing a view, for instance.
+"""
+import base64
+import hashlib
+import os
+import re
+import tempfile
+import threading
+
+from .cache import private_dir
+
+#: The fields whose values are embedded, base64-encoded data.
+DATA_FIELDS = ('certificate-authority-data', 'client-certificate-data', 'client-key-data')
+
+
+class EmbeddedData(object):
+    """
+    A base64-encoded value, decoded only on request. Handles are immutable,
+    compare equal to each other and to strings with the same encoded value,
+    and are shared rather than copied by :py:func:`copy.deepcopy`.
+
+    :param buffer: The encoded value, as a :py:class:`str`, or any bytes-like
+        object (such as a :py:class:`memoryview` into a larger buffer).
+    """
+
+    __slots__ = ('_buffer',)
+
+    def __init__(self, buffer):
+        if isinstance(buffer, str):
+            buffer = buffer.encode('ascii')
+        self._buffer = buffer
+
+    @property
+    def encoded(self):
+        """
+        :rtype: str
+        :return: The value as it appears in the config.
+        """
+        return bytes(self._buffer).decode('ascii')
+
+    def decode(self):
+        """
+        :raise: :py:exc:`binascii.Error` when the value isn't valid base64.
+        :rtype: bytes
+        :return: The decoded data (typically a PEM-encoded certificate or
+            key).
+        """
+        return base64.b64decode(self._buffer)
+
+    def digest(self):
+        """
+        :rtype: str
+        :return: The SHA-256 hex digest of the encoded value.
+        """
+        return hashlib.sha256(self._buffer).hexdigest()
+
+    def write_temp_file(self):
+        """
+        Writes the decoded data to a file readable only by you, in a
+        per-user directory under the system's temporary directory. The file
+        is written once per distinct value, and re-used after that.
+
+        :rtype: str
+        :return: The file's path.
+        """
+        return _write_temp_file(self)
+
+    def __str__(self):
+        return self.encoded
+
+    def __len__(self):
+        return len(self._buffer)
+
+    def __bool__(self):
+        return len(self._buffer) > 0
+
+    def __eq__(self, other):
+        if isinstance(other, EmbeddedData):
+            return self._buffer == other._buffer
+        if isinstance(other, str):
+            return self.encoded == other
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    def __hash__(self):
+        return hash(self.encoded)
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __reduce__(self):
+        return (EmbeddedData, (self.encoded,))
+
+    def __repr__(self):
+        return '<EmbeddedData: %d bytes>' % len(self)
+
+
+# A data field whose value is a plain scalar on the same line, the way
+# kubectl (and most anything else) writes them. Short values are left to the
+# parser, in case they're something other than a string to YAML (``null``,
+# say, or a number).
+_DATA_LINE = re.compile(
+    br'^([ \t]*(?:' + b'|'.join(re.escape(f.encode('ascii')) for f in DATA_FIELDS) +
+    br')[ \t]*:[ \t]+)([A-Za-z0-9+/]{16,}={0,2})[ \t]*(\r?)$', re.MULTILINE)
+_PLACEHOLDER = '__kubeconfig_embedded_data_%d__'
+
+
+def extract(data):
+    """
+    Cuts the data fields' values out of a kubeconfig file's contents,
+    leaving short placeholders in their place.
+
+    :param bytes data: The file's contents.
+    :rtype: tuple
+    :return: ``(stripped, handles)``, where ``stripped`` is the remaining
+        document, and ``handles`` maps each placeholder to an
+        :py:class:`EmbeddedData` viewing the value it replaced within
+        ``data``.
+    """
+    handles = {}
+    if not isinstance(data, bytes):
+        return data, handles
+    view = memoryview(data)
+
+    def _replace(match):
+        placeholder = _PLACEHOLDER % len(handles)
+        handles[placeholder] = EmbeddedData(view[match.start(2):match.end(2)])
+        return match.group(1) + placeholder.encode('ascii') + match.group(3)
+
+    return _DATA_LINE.sub(_replace, data), handles
+
+
+def restore(bodies, handles):
+    """
+    Puts the handles from :py:func:`extract` back in place of their
+    placeholders, and wraps any data fields that weren't extracted (quoted
+    values, JSON files, and so on) in handles of their own.
+
+    :param iterable bodies: The cluster and user bodies of the parsed,
+        stripped document.
+    :param dict handles: As returned by :py:func:`extract`.
+    :rtype: bool
+    :return: ``True`` if every placeholder was found in a data field. If
+        not, one was caught up in something else (a block scalar, say), and
+        the document should be parsed again without extracting anything.
+    """
+    restored = 0
+    for body in bodies:
+        if not isinstance(body, dict):
+            continue
+        for field in DATA_FIELDS:
+            value = body.get(field)
+            if not isinstance(value, str) or not value:
+                continue
+            handle = handles.get(value)
+            if handle is not None:
+                restored += 1
+            else:
+                handle = EmbeddedData(value)
+            body[field] = handle
+    return restored == len(handles)
+
+
+def materialize(view):
+    """
+    Swaps every :py:class:`EmbeddedData` handle in a view for its encoded
+    string, so that it may be serialized.
+
+    :param dict view: A view, as returned by
+        :py:meth:`KubeConfig.view <kubeconfig.KubeConfig.view>`. It's changed
+        in place.
+    :rtype: dict
+    :return: ``view``, for convenience.
+    """
+    for section in ('clusters', 'users'):
+        for item in view.get(section) or ():
+            body = item.get(section[:-1])
+            if not isinstance(body, dict):
+                continue
+            for field in DATA_FIELDS:
+                if isinstance(body.get(field), EmbeddedData):
+                    body[field] = body[field].encoded
+    return view
+
+
+def wrap(view):
+    """
+    The opposite of :py:func:`materialize`: swaps the data fields' strings
+    in a view for :py:class:`EmbeddedData` handles, in place.
+
+    :rtype: dict
+    :return: ``view``, for convenience.
+    """
+    for section in ('clusters', 'users'):
+        for item in view.get(section) or ():
+            body = item.get(section[:-1])
+            if isinstance(body, dict):
+                restore([body], {})
+    return view
+
+
+_temp_files = {}
+_temp_files_lock = threading.Lock()
+
+
+def temp_dir():
+    """
+    :raise: PermissionError when the directory exists, but isn't yours
+        alone.
+    :rtype: str
+    :return: A per-user directory, under the system's temporary directory,
+        that only you may use.
+    """
+    return private_dir(os.path.join(tempfile.gettempdir(), 'kubeconfig-%d' % os.getuid()))
+
+
+def _write_temp_file(handle):
+    digest = handle.digest()
+    with _temp_files_lock:
+        path = _temp_files.get(digest)
+        if path is not None and os.path.exists(path):
+            return path
+        path = os.path.join(temp_dir(), digest + '.pem')
+        if not os.path.exists(path):
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.pem-')
+            try:
+                with os.fdopen(fd, 'wb') as fobj:
+                    fobj.write(handle.decode())
+                os.replace(tmp_path, path)
+            except BaseException:
+                try:
+                    os.unlink(tmp_path)
+                except OSError:
+                    pass
+                raise
+        _temp_files[digest] = path
+        return path
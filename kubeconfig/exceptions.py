@@ -17,3 +17,12 @@ class KubectlCommandError(KubeConfigError):
     def __init__(self, message):
         self.message = message
         super().__init__(message)
+
+
+class ExecPluginError(KubeConfigError):
+    """
+    Raised when a user's ``exec`` credential plugin can't be run, fails, or
+    returns something other than an ``ExecCredential``.
+    """
+
+    pass
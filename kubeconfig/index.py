@@ -0,0 +1,145 @@
+"""
+Name-keyed indexes over a parsed kubeconfig view.
+
+A :py:class:`ConfigIndex` is built in a single pass over a view, after which
+looking up a cluster, context, or user by name (or finding the contexts that
+refer to a given cluster, user, or API server) takes constant time.
+"""
+import collections
+import copy
+
+#: A context joined with the cluster and user it refers to. ``context``,
+#: ``cluster``, and ``user`` are entry bodies, as found under the
+#: ``context``, ``cluster``, and ``user`` keys in a view. ``cluster`` and
+#: ``user`` are ``None`` if the context refers to one that doesn't exist.
+ResolvedContext = collections.namedtuple(
+    'ResolvedContext', ['name', 'context', 'cluster', 'user'])
+
+
+# The sections that are indexed by name.
+_SECTIONS = ('clusters', 'contexts', 'users')
+
+
+def _copy(body):
+    return None if body is None else copy.deepcopy(body)
+
+
+class ConfigIndex(object):
+    """
+    :param dict view: A parsed view, as returned by
+        :py:meth:`KubeConfig.view <kubeconfig.KubeConfig.view>`. The index
+        keeps references into it, so it must not be changed afterwards.
+
+    Entry bodies are copied on the way out, so the index itself can't be
+    changed through what it returns.
+    """
+
+    def __init__(self, view):
+        self._view = view
+        self.clusters = self._by_name(view, 'clusters', 'cluster')
+        self.contexts = self._by_name(view, 'contexts', 'context')
+        self.users = self._by_name(view, 'users', 'user')
+
+        self._contexts_by_cluster = collections.defaultdict(list)
+        self._contexts_by_user = collections.defaultdict(list)
+        for name, context in self.contexts.items():
+            if context.get('cluster'):
+                self._contexts_by_cluster[context['cluster']].append(name)
+            if context.get('user'):
+                self._contexts_by_user[context['user']].append(name)
+
+        self._clusters_by_server = collections.defaultdict(list)
+        for name, cluster in self.clusters.items():
+            if cluster.get('server'):
+                self._clusters_by_server[cluster['server']].append(name)
+
+    @staticmethod
+    def _by_name(view, section, body_key):
+        return {item['name']: item.get(body_key) or {} for item in view.get(section) or []}
+
+    def get_cluster(self, name):
+        """
+        :rtype: dict or None
+        :return: The named cluster's body, or ``None`` if there isn't one.
+        """
+        return _copy(self.clusters.get(name))
+
+    def get_context(self, name):
+        """
+        :rtype: dict or None
+        :return: The named context's body, or ``None`` if there isn't one.
+        """
+        return _copy(self.contexts.get(name))
+
+    def get_user(self, name):
+        """
+        :rtype: dict or None
+        :return: The named user's body, or ``None`` if there isn't one.
+        """
+        return _copy(self.users.get(name))
+
+    def resolve(self, name):
+        """
+        :rtype: ResolvedContext or None
+        :return: The named context along with its cluster and user, or
+            ``None`` if there is no such context.
+        """
+        context = self.contexts.get(name)
+        if context is None:
+            return None
+        return ResolvedContext(
+            name, _copy(context),
+            self.get_cluster(context.get('cluster')),
+            self.get_user(context.get('user')))
+
+    def lookup(self, keys, default=None):
+        """
+        :param tuple keys: A compiled property path, as returned by
+            :py:func:`compile_property_path <kubeconfig.native.compile_property_path>`.
+            Named entries are found through the index, rather than by
+            scanning their section.
+        :return: A copy of the value the path addresses, or ``default`` if
+            there's nothing there.
+        """
+        if len(keys) > 1 and keys[0] in _SECTIONS:
+            node = getattr(self, keys[0]).get(keys[1])
+            rest = keys[2:]
+        else:
+            node = self._view.get(keys[0])
+            rest = keys[1:]
+        for key in rest:
+            if not isinstance(node, dict):
+                return default
+            node = node.get(key)
+        return default if node is None else _copy(node)
+
+    def contexts_by_cluster(self, name):
+        """
+        :rtype: list
+        :return: The names of the contexts that use the named cluster.
+        """
+        return list(self._contexts_by_cluster.get(name, ()))
+
+    def contexts_by_user(self, name):
+        """
+        :rtype: list
+        :return: The names of the contexts that use the named user.
+        """
+        return list(self._contexts_by_user.get(name, ()))
+
+    def clusters_by_server(self, server):
+        """
+        :rtype: list
+        :return: The names of the clusters whose ``server`` is ``server``.
+        """
+        return list(self._clusters_by_server.get(server, ()))
+
+    def contexts_by_server(self, server):
+        """
+        :rtype: list
+        :return: The names of the contexts whose cluster's ``server`` is
+            ``server``.
+        """
+        return [context
+                for cluster in self._clusters_by_server.get(server, ())
+                for context in self._contexts_by_cluster.get(cluster, ())]
@@ -15,10 +15,50 @@ For example:
     # Check to see our changes.
     print(conf.view())
 """
-import yaml
+import contextlib
+import copy
+import functools
+import os
+import threading
+
+from . import delta
+from . import exceptions
+from . import kubectl
+from . import native
+from .cache import CacheInfo, SnapshotCache, ViewCache, stat_signature
+from .coalesce import CoalescingWriter
+from .index import ConfigIndex
+from .model import CompactConfig
+from .overrides import ConfigOverride
 
+#: The backends a :py:class:`KubeConfig` may be constructed with.
+BACKENDS = {
+    'kubectl': kubectl.KubectlBackend,
+    'native': native.NativeBackend,
+}
 
-from . import kubectl
+#: The write policies a :py:class:`KubeConfig` may be constructed with.
+WRITE_POLICIES = ('immediate', 'coalesce')
+
+
+def _writes(method):
+    """
+    Marks a :py:class:`KubeConfig` method as one that changes the config,
+    so that any cached view is dropped once it has run. With coalesced
+    writes, the backend method of the same name is handed to the
+    :py:class:`CoalescingWriter <kubeconfig.coalesce.CoalescingWriter>`
+    instead (outside of a batch).
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._coalescer is not None and not self._in_batch():
+            self._coalescer.apply(method.__name__, *args, **kwargs)
+            return
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            self._invalidate_cache()
+    return wrapper
 
 
 class KubeConfig(object):
@@ -33,33 +73,204 @@ class KubeConfig(object):
     :param str path: If you'd like to work against a specific kubeconfig
         file instead of using your currently configured (or default),
         pass the full path in.
+    :param str backend: How the config is read and written. ``'kubectl'``
+        (the default) runs ``kubectl config`` sub-commands, while
+        ``'native'`` does the same work in-process without forking
+        ``kubectl``, following the same merging and write-back rules.
+    :param bool cache: If ``True`` (the default), the parsed result of
+        :py:meth:`view` is kept around and re-used until one of the files it
+        was merged from changes on disk (as judged by its inode, size, and
+        modification time), or until this instance changes the config.
+    :param Tracer tracer: Receives timings for this instance's kubectl
+        invocations, parsing, writes, and cache lookups. Defaults to the
+        tracer installed with :py:func:`kubeconfig.tracing.set_tracer`.
+    :param snapshot: If ``True``, views are also kept on disk, in the
+        per-user cache directory, so that other processes (or later runs)
+        can load them rather than building them again, for as long as your
+        config's files don't change. See
+        :py:class:`SnapshotCache <kubeconfig.cache.SnapshotCache>`. Pass a
+        directory's path to keep them there instead.
+    :param str write_policy: ``'immediate'`` (the default) writes each
+        change as it's made. ``'coalesce'`` holds bursts of changes in
+        memory, and writes them together; see :py:mod:`kubeconfig.coalesce`
+        and :py:meth:`flush`.
+    :param float write_window: With coalesced writes, how long (in seconds)
+        a burst of changes is held before it's written.
+
+    An instance may be shared between threads. Reads are served from the
+    cached view without locking, while changes take turns, with each other
+    and with those made by other processes (see
+    :py:mod:`kubeconfig.locking`), so that none are lost.
     """
 
-    def __init__(self, path=None):
+    def __init__(self, path=None, backend='kubectl', cache=True, tracer=None,
+                 snapshot=False, write_policy='immediate', write_window=0.05):
+        if backend not in BACKENDS:
+            raise ValueError("Unknown backend: %s" % backend)
+        if write_policy not in WRITE_POLICIES:
+            raise ValueError("Unknown write policy: %s" % write_policy)
         self.path = path
+        self.backend = backend
+        self.tracer = tracer
+        self._base_backend = BACKENDS[backend](path, tracer=tracer)
+        # Holds the backend of the batch() the current thread is in, if any.
+        self._local = threading.local()
+        self._view_cache = ViewCache(tracer=tracer) if cache else None
+        self._snapshots = None
+        if snapshot:
+            self._snapshots = SnapshotCache(
+                None if snapshot is True else snapshot, tracer=tracer)
+        self._coalescer = None
+        if write_policy == 'coalesce':
+            self._coalescer = CoalescingWriter(path, window=write_window, tracer=tracer)
+        # The most recent view, and its index.
+        self._indexed = None
+
+    @property
+    def _backend(self):
+        return getattr(self._local, 'backend', None) or self._base_backend
+
+    def _in_batch(self):
+        return getattr(self._local, 'backend', None) is not None
+
+    def _pending_view(self, raw=False):
+        """
+        :rtype: dict or None
+        :return: The view with coalesced changes that haven't been written
+            yet made to it, or ``None`` if there are none (or the current
+            thread is in a batch, which sees its own changes instead).
+        """
+        if self._coalescer is None or self._in_batch():
+            return None
+        return self._coalescer.view(raw=raw)
+
+    def cache_info(self):
+        """
+        :rtype: CacheInfo
+        :return: A ``(hits, misses)`` named tuple for the :py:meth:`view`
+            cache. Both are zero if caching is disabled.
+        """
+        if self._view_cache is None:
+            return CacheInfo(0, 0)
+        return self._view_cache.info()
+
+    def cache_clear(self):
+        """
+        Drops any cached view, so that the next read goes back to the files.
+        """
+        self._invalidate_cache()
 
-    def _bool_to_cli_str(self, bool_arg):
+    def _shared_view(self):
         """
-        :param bool bool_arg: A boolean value.
-        :rtype: str
-        :return: The CLI form of the boolean. IE: 'false', 'true'.
+        :rtype: dict
+        :return: The current view, which may be the cached copy itself and
+            so must not be changed.
+        """
+        if getattr(self._backend, 'in_transaction', False):
+            return self._backend.view()
+        view = self._pending_view()
+        if view is not None:
+            return view
+        if self._view_cache is None:
+            return self._load_view()
+        sources = native.loading_precedence(self.path)
+        signature, view = self._view_cache.lookup(sources)
+        if view is None:
+            view = self._view_cache.fill(
+                signature, lambda: self._load_view(sources, signature))
+        return view
+
+    def _uncached_view(self, raw=False):
+        """
+        :rtype: dict
+        :return: A new view, that's neither taken from nor kept in any cache.
+        """
+        view = self._pending_view(raw=raw)
+        if view is not None:
+            return view
+        if isinstance(self._backend, native.NativeBackend):
+            return self._backend.view(raw=raw, cached=False)
+        return self._backend.view(raw=raw)
+
+    def _load_view(self, sources=None, signature=None):
+        """
+        :rtype: dict
+        :return: A new view, from a snapshot if there's a valid one.
         """
-        if not isinstance(bool_arg, bool):
-            raise ValueError("Not a bool: %s", bool_arg)
-        return repr(bool_arg).lower()
+        if self._snapshots is None:
+            return self._backend.view()
+        if sources is None:
+            sources = native.loading_precedence(self.path)
+        if signature is None:
+            signature = stat_signature(sources)
+        return self._snapshots.get(
+            (self.backend, tuple(os.path.abspath(source) for source in sources)),
+            signature, self._backend.view)
+
+    def _invalidate_cache(self):
+        if self._view_cache is not None:
+            self._view_cache.invalidate()
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Groups several changes into a single read and write of your config.
+        Changes made within the block are applied to an in-memory copy of
+        the config, and written out in one go when the block exits. If
+        anything within the block raises, none of the changes are written.
+
+        .. code-block:: py
+
+            with conf.batch():
+                conf.set_cluster('my-cluster', server='https://my-k8s-api-server/')
+                conf.set_credentials('my-user', token='super-secret-token')
+                conf.set_context('my-context', cluster='my-cluster', user='my-user')
+                conf.use_context('my-context')
+
+        .. note:: Batched changes are always applied in-process, as with
+            the ``'native'`` backend, since ``kubectl`` has no way of
+            deferring its writes.
 
-    def _run_kubectl_config(self, *args):
+        A batch belongs to the thread that opened it; other threads using
+        this instance carry on as if it weren't there, and wait for it to
+        complete before making changes of their own. Any coalesced changes
+        are written before it begins.
+
+        :return: This :py:class:`KubeConfig`, for convenience.
+        """
+        if self._in_batch():
+            # Nested batches join the outermost one.
+            yield self
+            return
+        self.flush()
+        backend = native.NativeBackend(self.path, tracer=self.tracer)
+        with backend.transaction():
+            self._local.backend = backend
+            try:
+                yield self
+            finally:
+                self._local.backend = None
+                self._invalidate_cache()
+
+    #: An alias for :py:meth:`batch`.
+    transaction = batch
+
+    def flush(self):
         """
-        This convenience method is for invoking kubectl sub-commands and
-        retrieving the resulting stdout/stderr.
+        With coalesced writes, writes any pending changes now, rather than
+        once their window is up. Otherwise (or from within a batch), does
+        nothing.
 
         :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
-            when kubectl exits with an error.
-        :rtype: str
-        :return: A combination of stdout+stderr for the given kubectl command.
+            when a pending change no longer applies to the config on disk, or
+            the last scheduled write failed. See :py:mod:`kubeconfig.coalesce`.
         """
-        subcmd_args = ['config'] + list(args)
-        return kubectl.run(kubeconfig=self.path, subcmd_args=subcmd_args)
+        if self._coalescer is None or self._in_batch():
+            return
+        try:
+            self._coalescer.flush()
+        finally:
+            self._invalidate_cache()
 
     def current_context(self):
         """
@@ -67,9 +278,378 @@ class KubeConfig(object):
         :return: Your config's currently selected context (``current-context``),
             or ``None`` if not set.
         """
-        current_context = self.view().get('current-context')
-        return current_context if current_context else None
+        if getattr(self._backend, 'in_transaction', False):
+            current_context = self._backend.view().get('current-context')
+            return current_context if current_context else None
+        view = self._pending_view()
+        if view is not None:
+            return view.get('current-context') or None
+        sources = native.loading_precedence(self.path)
+        if self._view_cache is not None:
+            view = self._view_cache.peek(sources)
+            if view is not None:
+                return view.get('current-context') or None
+        # Rather than merging a full view, take the first non-empty value in
+        # precedence order, without parsing more than we have to.
+        for filename in sources:
+            current_context = native.scan_current_context(filename)
+            if current_context:
+                return current_context
+        return None
+
+    def watch(self, callback=None, interval=1.0, debounce=0.1):
+        """
+        Starts watching your config's files (the explicit ``path``, or every
+        file in ``KUBECONFIG``, or ``~/.kube/config``) in a background
+        thread. Whenever they change, they're reloaded and compared with
+        what was there before, and each subscriber is called with the
+        differences.
+
+        .. code-block:: py
+
+            def on_change(events):
+                for event in events:
+                    if (event.section, event.field) == ('clusters', 'server'):
+                        print(event.name, 'moved to', event.new)
+
+            watcher = conf.watch(on_change)
+            ...
+            watcher.stop()
+
+        :param callable callback: A first subscriber, called with a list of
+            :py:class:`ChangeEvent <kubeconfig.watch.ChangeEvent>`\\ s. More
+            may be added with
+            :py:meth:`subscribe <kubeconfig.watch.ConfigWatcher.subscribe>`.
+        :param float interval: How often, in seconds, to check for changes
+            where inotify isn't available.
+        :param float debounce: How long, in seconds, to wait for a burst of
+            changes to finish before reloading.
+        :rtype: ConfigWatcher
+        :return: The running watcher, which may also be used as a context
+            manager that stops it on exit.
+        """
+        # Imported here, as it brings in ctypes and subprocess, and is rarely
+        # needed.
+        from .watch import ConfigWatcher
+
+        watcher = ConfigWatcher(self.path, interval=interval, debounce=debounce,
+                                tracer=self.tracer)
+        if callback is not None:
+            watcher.subscribe(callback)
+        return watcher.start()
+
+    def export(self, context=None, flatten=True):
+        """
+        Builds a stand-alone config holding just one context, along with the
+        cluster and user it refers to, like
+        ``kubectl config view --minify --flatten --raw``.
+
+        :param str context: The context to export. Defaults to the current
+            context.
+        :param bool flatten: If ``True`` (the default), certificate and key
+            files are read and embedded, so that the result doesn't depend
+            on any other files.
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            when there is no such context, or a file to be embedded can't be
+            read.
+        :rtype: dict
+        :return: The config, in the same form :py:meth:`view` returns
+            (including secrets, as plain strings).
+        """
+        view = self.view(raw=True)
+        if context is None:
+            context = view.get('current-context')
+        return native.minify(ConfigIndex(view), context, flatten=flatten)
+
+    def export_many(self, contexts=None, flatten=True, directory=None):
+        """
+        :py:meth:`export`\\ s many contexts at once, reading and indexing your
+        config only once, and reading each file to be embedded only once.
+
+        :param list contexts: The contexts to export. Defaults to all of
+            them.
+        :param bool flatten: As with :py:meth:`export`.
+        :param str directory: If given, each config is written (privately,
+            and atomically) to a file in this directory named after its
+            context, as ``<context>.kubeconfig``, with any ``/`` in the name
+            replaced by ``_``. The directory is created if need be.
+        :raise: :py:exc:`ValueError` if two of the contexts would be written
+            to the same file (say, ``a/b`` and ``a_b``), before anything is
+            written.
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            as with :py:meth:`export`. Configs written before the error
+            are left in place.
+        :rtype: dict
+        :return: A dict of context name to its config or, if ``directory``
+            was given, the path of the file it was written to.
+        """
+        index = ConfigIndex(self.view(raw=True))
+        if contexts is None:
+            contexts = sorted(index.contexts)
+        filenames = {}
+        if directory is not None:
+            written_by = {}
+            for context in contexts:
+                filename = os.path.join(directory, '%s.kubeconfig' % context.replace('/', '_'))
+                other = written_by.setdefault(filename, context)
+                if other != context:
+                    raise ValueError("Contexts %s and %s would both be written to %s"
+                                     % (other, context, filename))
+                filenames[context] = filename
+        read = functools.lru_cache(maxsize=None)(native.read_embedded)
+        exported = {}
+        for context in contexts:
+            config = native.minify(index, context, flatten=flatten, read=read)
+            if directory is None:
+                exported[context] = config
+                continue
+            filename = filenames[context]
+            native.write_file(filename, native.from_v1(config), tracer=self.tracer)
+            exported[context] = filename
+        return exported
+
+    def index(self):
+        """
+        :rtype: ConfigIndex
+        :return: Name-keyed indexes over the current view, including reverse
+            lookups such as
+            :py:meth:`contexts_by_server <kubeconfig.index.ConfigIndex.contexts_by_server>`.
+            The index is built once per parsed view, so with caching enabled,
+            it is only rebuilt when your config changes.
+        """
+        return self._index_of_view()[1]
+
+    def _index_of_view(self):
+        """
+        :rtype: tuple
+        :return: The current view (as for :py:meth:`_shared_view`) and its
+            index.
+        """
+        view = self._shared_view()
+        indexed = self._indexed
+        if indexed is None or indexed[0] is not view:
+            indexed = self._indexed = (view, ConfigIndex(view))
+        return indexed
+
+    def get_cluster(self, name):
+        """
+        :param str name: The name of the cluster to look up.
+        :rtype: dict or None
+        :return: The cluster's settings (``server``, etc.), or ``None`` if
+            there's no such cluster.
+        """
+        return self.index().get_cluster(name)
+
+    def get_context(self, name):
+        """
+        :param str name: The name of the context to look up.
+        :rtype: dict or None
+        :return: The context's settings (``cluster``, ``user``, and
+            ``namespace``), or ``None`` if there's no such context.
+        """
+        return self.index().get_context(name)
+
+    def get_user(self, name):
+        """
+        :param str name: The name of the user to look up.
+        :rtype: dict or None
+        :return: The user's settings, or ``None`` if there's no such user.
+        """
+        return self.index().get_user(name)
+
+    def get(self, path, default=None):
+        """
+        Reads a single setting, addressed the same way as for :py:meth:`set`
+        and :py:meth:`unset`.
 
+        .. code-block:: py
+
+            conf.get('contexts.prod.namespace')
+            conf.get('clusters.10.0.0.1.server')
+            conf.get('current-context')
+
+        Parsed paths are remembered, and named entries are found through
+        :py:meth:`index`, so repeated reads against an unchanged config are
+        cheap.
+
+        :param str path: A property path.
+        :param default: Returned when there's nothing at ``path``.
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            when the path doesn't address anything in a config.
+        :return: A copy of the value, as found in :py:meth:`view` (so secrets
+            are redacted).
+        """
+        return self.index().lookup(native.compile_property_path(path), default)
+
+    def get_many(self, paths, default=None):
+        """
+        :py:meth:`get`\\ s several settings at once, all from the same view.
+
+        :param iterable paths: Property paths.
+        :param default: Used for any path with nothing there.
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            when a path doesn't address anything in a config.
+        :rtype: dict
+        :return: A dict of path to value.
+        """
+        index = self.index()
+        return {path: index.lookup(native.compile_property_path(path), default)
+                for path in paths}
+
+    def resolve(self, context_name=None):
+        """
+        :param str context_name: The name of the context to resolve. Defaults
+            to the current context.
+        :rtype: ResolvedContext or None
+        :return: The context joined with the cluster and user it refers to,
+            or ``None`` if there's no such context.
+        """
+        view, index = self._index_of_view()
+        if context_name is None:
+            context_name = view.get('current-context')
+        return index.resolve(context_name)
+
+    def overrides(self, context=None, namespace=None, cluster=None, user=None):
+        """
+        Pins the context to use (and, optionally, its namespace, cluster, or
+        user) in memory, for the returned object alone, like kubectl's
+        ``--context``, ``--namespace``, ``--cluster``, and ``--user`` flags.
+        Unlike :py:meth:`use_context`, nothing is written, so this is safe
+        to do from many threads at once. See :py:mod:`kubeconfig.overrides`.
+
+        :param str context: The context to use. Defaults to the current
+            context.
+        :param str namespace: The namespace to use in place of the context's.
+        :param str cluster: The cluster to use in place of the context's.
+        :param str user: The user to use in place of the context's.
+        :rtype: ConfigOverride
+        """
+        return ConfigOverride(self, context=context, namespace=namespace,
+                              cluster=cluster, user=user)
+
+    def with_context(self, name, namespace=None):
+        """
+        A shortcut for :py:meth:`overrides`, for the common case.
+
+        .. code-block:: py
+
+            prod = conf.with_context('prod')
+            path = prod.kubeconfig_path()  # For kubectl --kubeconfig.
+
+        :param str name: The context to use.
+        :param str namespace: The namespace to use in place of the context's.
+        :rtype: ConfigOverride
+        """
+        return self.overrides(context=name, namespace=namespace)
+
+    def resolve_credentials(self, context_name=None, disk_cache=False):
+        """
+        Finds what a context's user authenticates with. For a user with an
+        ``exec`` section, that means running its credential plugin, unless
+        what it returned last time hasn't yet expired. See
+        :py:mod:`kubeconfig.credentials`.
+
+        .. code-block:: py
+
+            creds = conf.resolve_credentials()
+            headers = {'Authorization': 'Bearer %s' % creds.token}
+
+        :param str context_name: The name of the context. Defaults to the
+            current context.
+        :param disk_cache: If ``True``, credentials that expire are also
+            cached on disk, in a private directory, for other processes to
+            use. Pass a directory's path to use it instead of the default.
+        :raise: :py:exc:`KubeConfigError <kubeconfig.exceptions.KubeConfigError>`
+            when there's no such context, or it has no user.
+        :raise: :py:exc:`ExecPluginError <kubeconfig.exceptions.ExecPluginError>`
+            when the user's plugin fails.
+        :rtype: Credentials
+        :return: A ``(token, client_certificate, client_key, expires)``
+            named tuple. Users without an ``exec`` section get the token and
+            embedded client certificate and key from your config, if any.
+        """
+        resolved = self.resolve(context_name)
+        if resolved is None:
+            raise exceptions.KubeConfigError("No such context: %s" % context_name)
+        return self._resolve_credentials(resolved, disk_cache)
+
+    def _resolve_credentials(self, resolved, disk_cache=False):
+        """
+        :py:meth:`resolve_credentials`, for a context that has already been
+        resolved.
+
+        :param ResolvedContext resolved: The context, with its cluster and
+            user.
+        """
+        # Imported here, since most callers never need it.
+        from . import credentials
+
+        if resolved.user is None:
+            raise exceptions.KubeConfigError("Context %s has no user" % resolved.name)
+        exec_conf = resolved.user.get('exec')
+        if not exec_conf:
+            # The view behind the index has had its secrets redacted.
+            user = ConfigIndex(self.view(raw=True)).get_user(resolved.context.get('user'))
+            return credentials.static_credentials(user)
+
+        cluster = resolved.cluster
+        if exec_conf.get('provideClusterInfo') and cluster is not None:
+            cluster = ConfigIndex(self.view(raw=True)).get_cluster(resolved.context['cluster'])
+        if disk_cache is True:
+            disk_cache = credentials.default_cache_dir()
+        return credentials.credential_cache.get(
+            exec_conf, cluster, directory=disk_cache or None, tracer=self.tracer,
+            user=resolved.context.get('user'))
+
+    def validate(self):
+        """
+        Checks your config for dangling references (contexts that refer to
+        clusters or users that don't exist, and a current context that
+        doesn't), clusters and users no context refers to, entries hidden by
+        one of the same name in an earlier file, and certificate, key, and
+        token files that don't exist. This always runs in-process, in one
+        pass over the merged config. Any coalesced changes are written
+        first; within a batch, the batch's changes are checked.
+
+        .. code-block:: py
+
+            errors = [f for f in conf.validate() if f.severity == 'error']
+
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            when your config can't be parsed.
+        :rtype: list
+        :return: A :py:class:`Finding <kubeconfig.lint.Finding>` for each
+            problem found.
+        """
+        backend = self._backend
+        if not getattr(backend, 'in_transaction', False):
+            self.flush()
+            backend = native.NativeBackend(self.path, tracer=self.tracer)
+        return backend.validate()
+
+    def apply_delta(self, changeset):
+        """
+        Applies a changeset, as made by
+        :py:func:`kubeconfig.diff <kubeconfig.delta.diff>`, with a single
+        read and write (this always runs in-process, as with
+        :py:meth:`batch`, and is never coalesced). Only the entries the
+        changeset names are touched.
+
+        .. code-block:: py
+
+            conf.apply_delta(kubeconfig.diff(old, new))
+
+        :param changeset: The changeset, or the string
+            :py:func:`kubeconfig.delta.dumps` serialized it to.
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            when the changeset isn't valid. Nothing is changed.
+        """
+        if isinstance(changeset, (str, bytes)):
+            changeset = delta.loads(changeset)
+        with self.batch():
+            self._backend.apply_delta(changeset)
+
+    @_writes
     def delete_cluster(self, name):
         """
         Deletes a cluster entry from your config.
@@ -78,8 +658,9 @@ class KubeConfig(object):
         :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
             when an invalid cluster name is specified.
         """
-        self._run_kubectl_config('delete-cluster', name)
+        self._backend.delete_cluster(name)
 
+    @_writes
     def delete_context(self, name):
         """
         Deletes a context entry from your config.
@@ -88,8 +669,51 @@ class KubeConfig(object):
         :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>` 
             when an invalid context name is specified.
         """
-        self._run_kubectl_config('delete-context', name)
+        self._backend.delete_context(name)
+
+    @_writes
+    def delete_user(self, name):
+        """
+        Deletes a user entry from your config.
+
+        :param str name: The name of the user to delete from your config.
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            when an invalid user name is specified.
+        """
+        self._backend.delete_user(name)
 
+    def merge(self, fragment, strategy='overwrite'):
+        """
+        Merges the clusters, contexts, users, extensions, and preferences of
+        another config into yours, with a single read and write (this always
+        runs in-process, as with :py:meth:`batch`, and is never coalesced).
+        Your current context is left as it is.
+
+        .. code-block:: py
+
+            renames = conf.merge('new-cluster.kubeconfig', strategy='rename')
+
+        :param fragment: The config to merge in, as a dict in the same form
+            :py:meth:`view` returns (with ``raw=True``, since the placeholders
+            a redacted view holds are refused), or the path of a kubeconfig
+            file.
+        :param str strategy: What to do when both configs have an entry (or
+            preference) of the same name. ``'overwrite'`` (the default)
+            replaces yours. ``'keep-existing'`` keeps yours, and ignores the
+            incoming one. ``'rename'`` adds the incoming entry under a new
+            name (``name-1``, ``name-2``, and so on), updating the incoming
+            contexts that refer to it; preferences are kept as with
+            ``'keep-existing'``. Identical entries are never renamed.
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            when the fragment isn't a valid config, or holds redacted secrets.
+        :rtype: dict
+        :return: The entries that were renamed, as a dict of section name
+            (``'clusters'``, etc.) to a dict of old name to new name.
+        """
+        with self.batch():
+            return self._backend.merge(fragment, strategy)
+
+    @_writes
     def rename_context(self, old_name, new_name):
         """
         Changes the name of a context in your config.
@@ -99,8 +723,9 @@ class KubeConfig(object):
         :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
             when an invalid context name is specified for old or new.
         """
-        self._run_kubectl_config('rename-context', old_name, new_name)
+        self._backend.rename_context(old_name, new_name)
 
+    @_writes
     def set(self, name, value):
         """
         Sets an individual value in your config.
@@ -110,8 +735,9 @@ class KubeConfig(object):
         :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
             when an invalid name is specified.
         """
-        self._run_kubectl_config('set', name, value)
+        self._backend.set(name, value)
 
+    @_writes
     def set_cluster(self, name, certificate_authority=None, embed_certs=None,
                     insecure_skip_tls_verify=None, server=None):
         """
@@ -130,18 +756,12 @@ class KubeConfig(object):
             cert validation against the cluster's API server.
         :param str server: Full URI to the cluster's API server.
         """
-        flags = []
-        if certificate_authority is not None:
-            flags += ['--certificate-authority=%s' % certificate_authority]
-        if embed_certs is not None:
-            flags += ['--embed-certs=%s' % self._bool_to_cli_str(embed_certs)]
-        if insecure_skip_tls_verify is not None:
-            flags += ['--insecure-skip-tls-verify=%s' %
-                      self._bool_to_cli_str(insecure_skip_tls_verify)]
-        if server is not None:
-            flags += ['--server=%s' % server]
-        self._run_kubectl_config('set-cluster', name, *flags)
+        self._backend.set_cluster(
+            name, certificate_authority=certificate_authority,
+            embed_certs=embed_certs,
+            insecure_skip_tls_verify=insecure_skip_tls_verify, server=server)
 
+    @_writes
     def set_context(self, name, cluster=None, namespace=None, user=None):
         """
         Creates or updates a context entry in your config. In the case where
@@ -153,15 +773,10 @@ class KubeConfig(object):
         :param str namespace: Sets the default namespace for the context.
         :param str user: The user to authenticate as for the context.
         """
-        flags = []
-        if cluster is not None:
-            flags += ['--cluster=%s' % cluster]
-        if namespace is not None:
-            flags += ['--namespace=%s' % namespace]
-        if user is not None:
-            flags += ['--user=%s' % user]
-        self._run_kubectl_config('set-context', name, *flags)
+        self._backend.set_context(
+            name, cluster=cluster, namespace=namespace, user=user)
 
+    @_writes
     def set_credentials(self, name, auth_provider=None, auth_provider_args=None,
                         client_certificate=None, client_key=None,
                         embed_certs=None, password=None, token=None,
@@ -188,27 +803,14 @@ class KubeConfig(object):
         :param str password: Your user's password (if using basic auth).
         :param str token: Your private token (if using token auth).
         """
-        flags = []
-        if auth_provider is not None:
-            flags += ['--auth-provider=%s' % auth_provider]
-        if auth_provider_args is not None:
-            arg_pairs = ["%s=%s" % (k, v) for k, v in auth_provider_args.items()]
-            for arg_pair in arg_pairs:
-                flags += ['--auth-provider-arg=%s' % arg_pair]
-        if client_certificate is not None:
-            flags += ['--client-certificate=%s' % client_certificate]
-        if client_key is not None:
-            flags += ['--client-key=%s' % client_key]
-        if embed_certs is not None:
-            flags += ['--embed-certs=%s' % self._bool_to_cli_str(embed_certs)]
-        if password is not None:
-            flags += ['--password=%s' % password]
-        if token is not None:
-            flags += ['--token=%s' % token]
-        if username is not None:
-            flags += ['--username=%s' % username]
-        self._run_kubectl_config('set-credentials', name, *flags)
-
+        self._backend.set_credentials(
+            name, auth_provider=auth_provider,
+            auth_provider_args=auth_provider_args,
+            client_certificate=client_certificate, client_key=client_key,
+            embed_certs=embed_certs, password=password, token=token,
+            username=username)
+
+    @_writes
     def unset(self, name):
         """
         Unsets an individual value in your kubeconfig file.
@@ -217,8 +819,9 @@ class KubeConfig(object):
         :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
             when an invalid name is specified.
         """
-        self._run_kubectl_config('unset', name)
+        self._backend.unset(name)
 
+    @_writes
     def use_context(self, name):
         """
         Changes your default/active context.
@@ -227,13 +830,33 @@ class KubeConfig(object):
         :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
             when an invalid context name is specified.
         """
-        self._run_kubectl_config('use-context', name)
+        self._backend.use_context(name)
 
-    def view(self):
+    def view(self, compact=False, raw=False):
         """
+        :param bool compact: If ``True``, return a
+            :py:class:`CompactConfig <kubeconfig.model.CompactConfig>`, which
+            takes less memory for large configs, instead of a dict. It's
+            built from a view of its own, which is then dropped, so neither
+            the view cache nor the parse cache keeps the dict form around;
+            the files are parsed afresh each time instead.
+        :param bool raw: If ``True``, include certificate data and tokens
+            rather than kubectl's ``DATA+OMITTED`` and ``REDACTED``
+            placeholders (like ``kubectl config view --raw``). Certificate
+            and key data is given as
+            :py:class:`EmbeddedData <kubeconfig.embedded.EmbeddedData>`
+            handles, which are only decoded when asked to be. Raw views
+            aren't cached.
         :rtype: dict
         :return: A dict representing your full kubeconfig file, after all
             merging has been done.
         """
-        conf_doc_str = self._run_kubectl_config('view')
-        return yaml.safe_load(conf_doc_str)
+        if compact:
+            return CompactConfig.from_view(self._uncached_view(raw=raw))
+        if raw:
+            return self._pending_view(raw=True) or self._backend.view(raw=True)
+        if getattr(self._backend, 'in_transaction', False):
+            return self._backend.view()
+        if self._view_cache is None and self._pending_view() is None:
+            return self._load_view()
+        return copy.deepcopy(self._shared_view())
@@ -1,28 +1,228 @@
-import subprocess
-
-import distutils.spawn
+import functools
+import os
+import shutil
+import time
 
+from . import embedded
 from . import exceptions
+from . import locking
+from . import native
+from . import tracing
+
 
+@functools.lru_cache(maxsize=8)
+def _which(path_env):
+    return shutil.which('kubectl', path=path_env)
 
-def run(kubeconfig=None, subcmd_args=None):
+
+def find_kubectl():
+    """
+    Looks kubectl up on the path. The result is remembered for as long as
+    ``PATH`` stays the same, so that the path is only searched once.
+
+    :raise: KubectlNotFoundError when kubectl isn't on the path.
+    :rtype: str
+    :return: kubectl's full path.
+    """
+    executable = _which(os.environ.get('PATH', os.defpath))
+    if executable is None:
+        raise exceptions.KubectlNotFoundError
+    return executable
+
+
+def build_args(kubeconfig=None, subcmd_args=None):
     """
     :param kubeconfig:
     :param subcmd_args:
-    :raise: KubectlCommandError when kubectl exits with an error.
-    :rtype: bytes
+    :raise: KubectlNotFoundError when kubectl isn't on the path.
+    :rtype: list
+    :return: The full kubectl command line.
     """
-    if not distutils.spawn.find_executable("kubectl"):
-        raise exceptions.KubectlNotFoundError
+    find_kubectl()
 
     args = ["kubectl"]
     if kubeconfig:
         args += ["--kubeconfig", kubeconfig]
     if subcmd_args:
         args += subcmd_args
-    proc = subprocess.run(
-        args, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
-        universal_newlines=True)
+    return args
+
+
+def run(kubeconfig=None, subcmd_args=None, tracer=None):
+    """
+    :param kubeconfig:
+    :param subcmd_args:
+    :param Tracer tracer: Told about the invocation (see
+        :py:mod:`kubeconfig.tracing`). Defaults to the global tracer.
+    :raise: KubectlCommandError when kubectl exits with an error.
+    :rtype: bytes
+    """
+    # Imported here rather than at the top, as it's only needed once kubectl
+    # is actually run.
+    import subprocess
+
+    args = build_args(kubeconfig=kubeconfig, subcmd_args=subcmd_args)
+    start = time.perf_counter()
+    try:
+        proc = subprocess.run(
+            args, executable=find_kubectl(), stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT, universal_newlines=True)
+    except FileNotFoundError:
+        # It's gone since it was looked up.
+        _which.cache_clear()
+        raise exceptions.KubectlNotFoundError
+    trace_invocation(tracer, args, start, proc.returncode, len(proc.stdout))
     if proc.returncode:
         raise exceptions.KubectlCommandError(proc.stdout)
     return proc.stdout.strip()
+
+
+def trace_invocation(tracer, args, start, returncode, output_size):
+    """
+    Reports a finished kubectl invocation to ``tracer`` (or the global
+    tracer), with any secrets in ``args`` redacted.
+
+    :param float start: When the invocation began, per
+        :py:func:`time.perf_counter`.
+    """
+    tracer = tracing.get_tracer(tracer)
+    if tracer.enabled:
+        tracer.on_kubectl(tracing.redact_argv(args), time.perf_counter() - start,
+                          returncode, output_size)
+
+
+class KubectlBackend(object):
+    """
+    Carries out :py:class:`KubeConfig <kubeconfig.KubeConfig>` operations by
+    invoking ``kubectl config`` sub-commands.
+
+    :param str path: An explicit kubeconfig path, passed to kubectl as
+        ``--kubeconfig``.
+    :param Tracer tracer: See :py:mod:`kubeconfig.tracing`.
+    """
+
+    def __init__(self, path=None, tracer=None):
+        self.path = path
+        self.tracer = tracer
+
+    def _bool_to_cli_str(self, bool_arg):
+        """
+        :param bool bool_arg: A boolean value.
+        :rtype: str
+        :return: The CLI form of the boolean. IE: 'false', 'true'.
+        """
+        if not isinstance(bool_arg, bool):
+            raise ValueError("Not a bool: %s", bool_arg)
+        return repr(bool_arg).lower()
+
+    def _run_kubectl_config(self, *args):
+        """
+        This convenience method is for invoking kubectl sub-commands and
+        retrieving the resulting stdout/stderr.
+
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            when kubectl exits with an error.
+        :rtype: str
+        :return: A combination of stdout+stderr for the given kubectl command.
+        """
+        subcmd_args = ['config'] + list(args)
+        if args[0] == 'view':
+            return run(kubeconfig=self.path, subcmd_args=subcmd_args, tracer=self.tracer)
+        # Changes take turns with every other writer through this package.
+        # Concurrent kubectl writes would otherwise fail on kubectl's own
+        # lock file, or lose each other's changes.
+        with locking.locked(native.loading_precedence(self.path)):
+            return run(kubeconfig=self.path, subcmd_args=subcmd_args, tracer=self.tracer)
+
+    def delete_cluster(self, name):
+        return self._run_kubectl_config('delete-cluster', name)
+
+    def delete_context(self, name):
+        return self._run_kubectl_config('delete-context', name)
+
+    def delete_user(self, name):
+        return self._run_kubectl_config('delete-user', name)
+
+    def rename_context(self, old_name, new_name):
+        return self._run_kubectl_config('rename-context', old_name, new_name)
+
+    def set(self, name, value):
+        return self._run_kubectl_config('set', name, value)
+
+    def set_cluster(self, name, certificate_authority=None, embed_certs=None,
+                    insecure_skip_tls_verify=None, server=None):
+        flags = []
+        if certificate_authority is not None:
+            flags += ['--certificate-authority=%s' % certificate_authority]
+        if embed_certs is not None:
+            flags += ['--embed-certs=%s' % self._bool_to_cli_str(embed_certs)]
+        if insecure_skip_tls_verify is not None:
+            flags += ['--insecure-skip-tls-verify=%s' %
+                      self._bool_to_cli_str(insecure_skip_tls_verify)]
+        if server is not None:
+            flags += ['--server=%s' % server]
+        return self._run_kubectl_config('set-cluster', name, *flags)
+
+    def set_context(self, name, cluster=None, namespace=None, user=None):
+        flags = []
+        if cluster is not None:
+            flags += ['--cluster=%s' % cluster]
+        if namespace is not None:
+            flags += ['--namespace=%s' % namespace]
+        if user is not None:
+            flags += ['--user=%s' % user]
+        return self._run_kubectl_config('set-context', name, *flags)
+
+    def set_credentials(self, name, auth_provider=None, auth_provider_args=None,
+                        client_certificate=None, client_key=None,
+                        embed_certs=None, password=None, token=None,
+                        username=None):
+        flags = []
+        if auth_provider is not None:
+            flags += ['--auth-provider=%s' % auth_provider]
+        if auth_provider_args is not None:
+            arg_pairs = ["%s=%s" % (k, v) for k, v in auth_provider_args.items()]
+            for arg_pair in arg_pairs:
+                flags += ['--auth-provider-arg=%s' % arg_pair]
+        if client_certificate is not None:
+            flags += ['--client-certificate=%s' % client_certificate]
+        if client_key is not None:
+            flags += ['--client-key=%s' % client_key]
+        if embed_certs is not None:
+            flags += ['--embed-certs=%s' % self._bool_to_cli_str(embed_certs)]
+        if password is not None:
+            flags += ['--password=%s' % password]
+        if token is not None:
+            flags += ['--token=%s' % token]
+        if username is not None:
+            flags += ['--username=%s' % username]
+        return self._run_kubectl_config('set-credentials', name, *flags)
+
+    def unset(self, name):
+        return self._run_kubectl_config('unset', name)
+
+    def use_context(self, name):
+        return self._run_kubectl_config('use-context', name)
+
+    def _view_args(self, raw=False):
+        # JSON output parses far faster than YAML, and describes the same
+        # document.
+        args = ['view', '--output=json']
+        if raw:
+            args += ['--raw']
+        return args
+
+    def _parse_view(self, conf_doc_str, raw=False):
+        import json
+
+        start = time.perf_counter()
+        view = json.loads(conf_doc_str)
+        tracer = tracing.get_tracer(self.tracer)
+        if tracer.enabled:
+            tracer.on_parse('kubectl', time.perf_counter() - start, len(conf_doc_str))
+        # Match the native backend, so that raw views look the same either way.
+        return embedded.wrap(view) if raw else view
+
+    def view(self, raw=False):
+        conf_doc_str = self._run_kubectl_config(*self._view_args(raw))
+        return self._parse_view(conf_doc_str, raw)
@@ -0,0 +1,168 @@
+"""
+Checks configs for the mistakes that kubectl only trips over once it's too
+late: contexts that refer to clusters or users that don't exist, clusters
+and users that nothing refers to, entries hidden by an entry of the same
+name in an earlier file, and certificate, key, and token files that aren't
+there.
+
+.. code-block:: py
+
+    for finding in conf.validate():
+        print(finding.severity, finding.message)
+
+Everything is checked in one pass over the merged config, with name-keyed
+lookups throughout, so it takes time in proportion to the config's size
+however many entries refer to each other.
+
+To check many files at once, from CI say, use ``python -m kubeconfig lint``,
+which checks each file (as the only file in its config) in parallel:
+
+.. code-block:: console
+
+    $ python -m kubeconfig lint 'tenants/**/kubeconfig'
+    tenants/a/kubeconfig: error: contexts "a": refers to the missing user "b" [missing-user]
+
+It exits with 1 if any errors were found (or any warnings, with
+``--strict``), a file couldn't be read, or a pattern matched no files. See
+``--help`` for its options.
+"""
+import collections
+import os
+
+from . import native
+from .bulk import KubeConfigFleet
+
+#: One problem with a config.
+#:
+#: ``severity`` is ``'error'`` for something that will make kubectl fail
+#: (or a connection fail) when it's used, or ``'warning'`` for something
+#: that's merely suspect. ``code`` says what kind of problem it is (one of
+#: :py:data:`CODES`), and ``message`` describes it. ``section`` and
+#: ``name`` identify the entry at fault (``section`` is
+#: ``'current-context'``, and ``name`` ``None``, for the current context),
+#: ``field`` the key within its body (or ``None``), and ``file`` the file
+#: it's in.
+Finding = collections.namedtuple(
+    'Finding', ['severity', 'code', 'section', 'name', 'field', 'file', 'message'])
+
+#: Every finding's ``code``, with its severity.
+CODES = collections.OrderedDict([
+    ('duplicate-name', 'warning'),
+    ('missing-cluster', 'error'),
+    ('missing-user', 'error'),
+    ('missing-current-context', 'error'),
+    ('unused-cluster', 'warning'),
+    ('unused-user', 'warning'),
+    ('missing-file', 'error'),
+])
+
+# The body keys that name files, for the sections that have them.
+_FILE_FIELDS = {
+    'clusters': ('certificate-authority',),
+    'users': ('client-certificate', 'client-key', 'tokenFile'),
+}
+
+
+def _finding(code, section, name, field, filename, message):
+    return Finding(CODES[code], code, section, name, field, filename, message)
+
+
+def check(loaded, doc=None):
+    """
+    Checks a loaded config.
+
+    :param LoadedConfig loaded: The config, as loaded by
+        :py:meth:`NativeBackend.load <kubeconfig.native.NativeBackend.load>`.
+    :param dict doc: A working copy of it (see
+        :py:meth:`LoadedConfig.edit <kubeconfig.native.LoadedConfig.edit>`)
+        to check instead of the merged config as loaded.
+    :rtype: list
+    :return: The :py:class:`Finding`\\ s, for each file's entries in turn.
+    """
+    if doc is None:
+        doc = loaded.merged
+    findings = []
+
+    for section, _ in native.NAMED_SECTIONS:
+        entries = doc[section]
+        for filename, file_doc in loaded.files:
+            if file_doc is None:
+                continue
+            for name in file_doc[section]:
+                origin = loaded.origins[section].get(name)
+                if origin != filename and name in entries:
+                    findings.append(_finding(
+                        'duplicate-name', section, name, None, filename,
+                        '%s "%s": ignored, since %s defines it first'
+                        % (section, name, origin)))
+
+    used = {'clusters': set(), 'users': set()}
+    for name, context in doc['contexts'].items():
+        if not isinstance(context, dict):
+            continue
+        for field, section in (('cluster', 'clusters'), ('user', 'users')):
+            target = context.get(field)
+            if not target:
+                continue
+            used[section].add(target)
+            if target not in doc[section]:
+                findings.append(_finding(
+                    'missing-' + field, 'contexts', name, field,
+                    loaded.origin('contexts', name),
+                    'contexts "%s": refers to the missing %s "%s"' % (name, field, target)))
+
+    current_context = doc['current-context']
+    if current_context and current_context not in doc['contexts']:
+        findings.append(_finding(
+            'missing-current-context', 'current-context', None, None,
+            native.current_context_file(loaded, native.default_filename(loaded.path)),
+            'current-context: refers to the missing context "%s"' % current_context))
+
+    # Many entries usually share a CA file.
+    exists = {}
+    for section, body_key in (('clusters', 'cluster'), ('users', 'user')):
+        for name, body in doc[section].items():
+            origin = loaded.origin(section, name)
+            if name not in used[section]:
+                findings.append(_finding(
+                    'unused-' + body_key, section, name, None, origin,
+                    '%s "%s": no context refers to it' % (section, name)))
+            if not isinstance(body, dict):
+                continue
+            for field in _FILE_FIELDS[section]:
+                value = body.get(field)
+                if not value or not isinstance(value, str):
+                    continue
+                path = os.path.join(os.path.dirname(origin), value)
+                if path not in exists:
+                    exists[path] = os.path.exists(path)
+                if not exists[path]:
+                    findings.append(_finding(
+                        'missing-file', section, name, field, origin,
+                        '%s "%s": %s "%s" doesn\'t exist' % (section, name, field, value)))
+    return findings
+
+
+def _validate(conf):
+    if not os.path.exists(conf.path):
+        raise native.kubectl_error('cannot lint "%s": no such file' % conf.path)
+    return conf.validate()
+
+
+def lint(paths, executor='process', max_workers=None):
+    """
+    Checks many files in parallel, each as the only file in its config.
+
+    :param paths: A glob pattern, or a list of paths and/or glob patterns,
+        as for :py:class:`KubeConfigFleet <kubeconfig.bulk.KubeConfigFleet>`.
+    :param executor: As for
+        :py:class:`KubeConfigFleet <kubeconfig.bulk.KubeConfigFleet>`, but a
+        process pool by default, since checking is mostly parsing.
+    :param int max_workers: The pool size, if one is created.
+    :rtype: generator
+    :return: A :py:class:`FleetResult <kubeconfig.bulk.FleetResult>` per
+        file, as each finishes, with the file's findings as its ``value``.
+        A file that's missing or can't be parsed has an ``error`` instead.
+    """
+    fleet = KubeConfigFleet(paths, executor=executor, max_workers=max_workers)
+    return fleet.map(_validate)
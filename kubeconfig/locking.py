@@ -0,0 +1,154 @@
+"""
+Locks that make changing a config a single atomic read-modify-write, both
+between threads and between processes.
+
+Every change is made by reading the config's files, changing them in
+memory, and writing them back, so two writers working at once would each
+lose the other's changes. Changes made through
+:py:class:`KubeConfig <kubeconfig.KubeConfig>` and
+:py:class:`AsyncKubeConfig <kubeconfig.aio.AsyncKubeConfig>` (with either
+backend, in any process) hold :py:func:`locked` around the whole cycle,
+and so take turns.
+
+Files are locked apart, so writers to different files (say, a
+:py:class:`KubeConfigFleet <kubeconfig.bulk.KubeConfigFleet>` changing a
+directory full of them) seldom wait on each other. Files are written by
+replacing them, which would leave a lock held on the file itself behind on
+the old copy, so an advisory ``flock(2)`` is held on one of a fixed set of
+:py:data:`STRIPES` lock files in your cache directory (see
+:py:func:`lock_file`) instead; the files that share one take turns, too.
+Symlinks are followed, so a file and a link to it share a lock. kubectl doesn't take part in this
+(it keeps its own lock files while it writes), nor does anything else
+that edits the files directly, nor do processes running as other users.
+
+Readers never wait on these locks: a file is always replaced whole, so it
+can be read at any time.
+"""
+import contextlib
+import hashlib
+import os
+import threading
+
+from .cache import private_dir, user_cache_dir
+
+try:
+    import fcntl
+except ImportError:
+    # Without flock (on Windows), threads still take turns, but processes
+    # don't.
+    fcntl = None
+
+#: How many lock files there are. Each file's lock is one of them, so that
+#: however many files are written, the lock files don't pile up.
+STRIPES = 1024
+
+# lock file -> the lock this process's threads take turns on, before taking
+# its flock. A thread blocked here holds no descriptor.
+_locks = {}
+_locks_lock = threading.Lock()
+
+
+def lock_key(filename):
+    """
+    :param str filename: A file that's about to be written.
+    :rtype: str
+    :return: What its lock is keyed on: the file's real path, with any
+        symlinks resolved.
+    """
+    return os.path.realpath(filename)
+
+
+def lock_file(filename):
+    """
+    :param str filename: A file that's about to be written.
+    :rtype: str
+    :return: The lock file that's held to write it: one of
+        :py:data:`STRIPES`, chosen by a digest of its :py:func:`lock_key`.
+        Lock files are left behind afterwards; they're empty.
+    """
+    digest = hashlib.sha256(lock_key(filename).encode('utf-8', 'surrogateescape'))
+    stripe = int(digest.hexdigest(), 16) % STRIPES
+    return os.path.join(user_cache_dir('locks'), '%04d.lock' % stripe)
+
+
+def _open_lock_file(path):
+    """
+    :rtype: int or None
+    :return: A descriptor for the lock file, or ``None`` if it can't be
+        created (in a read-only home directory, say), in which case
+        threads still take turns, but processes don't.
+    """
+    try:
+        private_dir(os.path.dirname(path))
+        return os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+    except OSError:
+        return None
+
+
+def _acquire(path):
+    with _locks_lock:
+        lock = _locks.setdefault(path, threading.Lock())
+    lock.acquire()
+    if fcntl is None:
+        return lock, None
+    try:
+        fd = _open_lock_file(path)
+        if fd is None:
+            return lock, None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+    except BaseException:
+        lock.release()
+        raise
+    return lock, fd
+
+
+def _release(held):
+    # In reverse, so that no-one is handed a lock they then wait behind
+    # another of ours for.
+    while held:
+        lock, fd = held.pop()
+        if fd is not None:
+            try:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            finally:
+                os.close(fd)
+        lock.release()
+
+
+@contextlib.contextmanager
+def locked(filenames):
+    """
+    Holds the write lock for each of ``filenames`` for the duration of the
+    block. Locks are taken in a fixed order, so writers to overlapping sets
+    of files can't deadlock, and may be released by a different thread from
+    the one that took them.
+
+    The locks aren't re-entrant: writing to the same files (through another
+    :py:class:`KubeConfig <kubeconfig.KubeConfig>`, say) from within the
+    block will wait forever.
+
+    :param list filenames: The files about to be read and written.
+    """
+    while True:
+        # Several files may share a lock file, which must only be taken once.
+        paths = sorted(set(lock_file(filename) for filename in filenames))
+        held = []
+        try:
+            for path in paths:
+                held.append(_acquire(path))
+        except BaseException:
+            _release(held)
+            raise
+        # A symlink may have been created or changed while we waited, in
+        # which case the file it now points to is the one to lock.
+        if paths == sorted(set(lock_file(filename) for filename in filenames)):
+            break
+        _release(held)
+    try:
+        yield
+    finally:
+        _release(held)
@@ -0,0 +1,228 @@
+"""
+A compact, read-only representation of a view, for very large configs.
+
+:py:meth:`KubeConfig.view <kubeconfig.KubeConfig.view>` returns nested dicts
+and lists, which take several hundred bytes per entry before counting any of
+the values. With ``view(compact=True)``, you get a :py:class:`CompactConfig`
+instead: each cluster, context, and user is a slotted object, names and
+other often-repeated strings are interned, and empty mappings are shared.
+
+.. code-block:: py
+
+    config = conf.view(compact=True)
+    for cluster in config.clusters:
+        print(cluster.name, cluster.server)
+
+    # The familiar form, when something needs it.
+    config.to_dict() == conf.view()
+
+Settings without an attribute of their own (such as a user's ``exec``
+block) are kept, as they appear in the view, in each entry's ``extra``
+mapping.
+"""
+import copy
+import sys
+import types
+
+#: The empty mapping shared by every entry that has nothing in it.
+EMPTY = types.MappingProxyType({})
+
+
+# Entry class -> the body keys it has attributes for.
+_KNOWN_KEYS = {}
+
+
+def _intern(value):
+    return sys.intern(value) if type(value) is str else value
+
+
+def _mapping(value):
+    return value if value else EMPTY
+
+
+class _Entry(object):
+    """
+    The base for named entries. Subclasses list their attributes in
+    ``_FIELDS``, as ``(attribute, view key, intern)`` triples.
+    """
+
+    __slots__ = ('name', 'extra')
+    _FIELDS = ()
+    _BODY_KEY = None
+
+    def __init__(self, name, **kwargs):
+        self.name = _intern(name)
+        for attr, _, intern in self._FIELDS:
+            value = kwargs.pop(attr, None)
+            setattr(self, attr, _intern(value) if intern else value)
+        self.extra = _mapping(kwargs.pop('extra', None))
+        if kwargs:
+            raise TypeError("Unexpected arguments: %s" % ', '.join(sorted(kwargs)))
+
+    @classmethod
+    def from_dict(cls, item):
+        """
+        :param dict item: An entry as found in a view, such as
+            ``{'name': ..., 'cluster': {...}}``.
+        """
+        body = item.get(cls._BODY_KEY) or {}
+        kwargs = {}
+        for attr, key, _ in cls._FIELDS:
+            if key in body:
+                kwargs[attr] = body[key]
+        known = cls._keys()
+        extra = {key: copy.deepcopy(value) for key, value in body.items() if key not in known}
+        return cls(item['name'], extra=extra, **kwargs)
+
+    @classmethod
+    def _keys(cls):
+        keys = _KNOWN_KEYS.get(cls)
+        if keys is None:
+            keys = _KNOWN_KEYS[cls] = frozenset(key for _, key, _ in cls._FIELDS)
+        return keys
+
+    def to_dict(self):
+        """
+        :rtype: dict
+        :return: The entry as it would appear in a view.
+        """
+        body = {}
+        for attr, key, _ in self._FIELDS:
+            value = getattr(self, attr)
+            if value is not None:
+                body[key] = value
+        body.update(copy.deepcopy(dict(self.extra)))
+        return {'name': self.name, self._BODY_KEY: body}
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, self.name)
+
+
+class Cluster(_Entry):
+    """A cluster entry. Unset attributes are ``None``."""
+
+    __slots__ = ('server', 'certificate_authority', 'certificate_authority_data',
+                 'insecure_skip_tls_verify', 'tls_server_name', 'proxy_url')
+    _FIELDS = (
+        ('server', 'server', True),
+        ('certificate_authority', 'certificate-authority', False),
+        ('certificate_authority_data', 'certificate-authority-data', False),
+        ('insecure_skip_tls_verify', 'insecure-skip-tls-verify', False),
+        ('tls_server_name', 'tls-server-name', True),
+        ('proxy_url', 'proxy-url', True),
+    )
+    _BODY_KEY = 'cluster'
+
+
+class Context(_Entry):
+    """A context entry. Unset attributes are ``None``."""
+
+    __slots__ = ('cluster', 'user', 'namespace')
+    _FIELDS = (
+        ('cluster', 'cluster', True),
+        ('user', 'user', True),
+        ('namespace', 'namespace', True),
+    )
+    _BODY_KEY = 'context'
+
+
+class User(_Entry):
+    """A user entry. Unset attributes are ``None``."""
+
+    __slots__ = ('token', 'token_file', 'username', 'password', 'client_certificate',
+                 'client_certificate_data', 'client_key', 'client_key_data')
+    _FIELDS = (
+        ('token', 'token', False),
+        ('token_file', 'tokenFile', False),
+        ('username', 'username', True),
+        ('password', 'password', False),
+        ('client_certificate', 'client-certificate', False),
+        ('client_certificate_data', 'client-certificate-data', False),
+        ('client_key', 'client-key', False),
+        ('client_key_data', 'client-key-data', False),
+    )
+    _BODY_KEY = 'user'
+
+
+class CompactConfig(object):
+    """
+    A whole view. ``clusters``, ``contexts``, and ``users`` are tuples of
+    :py:class:`Cluster`, :py:class:`Context`, and :py:class:`User` entries,
+    in the view's order.
+    """
+
+    __slots__ = ('clusters', 'contexts', 'users', 'current_context', 'preferences',
+                 'extensions', 'api_version', 'kind')
+
+    def __init__(self, clusters=(), contexts=(), users=(), current_context='',
+                 preferences=None, extensions=(), api_version='v1', kind='Config'):
+        self.clusters = tuple(clusters)
+        self.contexts = tuple(contexts)
+        self.users = tuple(users)
+        self.current_context = _intern(current_context)
+        self.preferences = _mapping(preferences)
+        self.extensions = tuple(extensions)
+        self.api_version = api_version
+        self.kind = kind
+
+    @classmethod
+    def from_view(cls, view):
+        """
+        :param dict view: As returned by
+            :py:meth:`KubeConfig.view <kubeconfig.KubeConfig.view>`. Nothing
+            in the result refers back into it, so it may be changed or
+            discarded afterwards.
+        :rtype: CompactConfig
+        """
+        return cls(
+            clusters=[Cluster.from_dict(item) for item in view.get('clusters') or ()],
+            contexts=[Context.from_dict(item) for item in view.get('contexts') or ()],
+            users=[User.from_dict(item) for item in view.get('users') or ()],
+            current_context=view.get('current-context') or '',
+            preferences=copy.deepcopy(view.get('preferences')),
+            extensions=copy.deepcopy(view.get('extensions') or ()),
+            api_version=view.get('apiVersion'),
+            kind=view.get('kind'))
+
+    def to_dict(self):
+        """
+        :rtype: dict
+        :return: The config in the same form as
+            :py:meth:`KubeConfig.view <kubeconfig.KubeConfig.view>`.
+        """
+        view = {
+            'clusters': [cluster.to_dict() for cluster in self.clusters],
+            'contexts': [context.to_dict() for context in self.contexts],
+            'users': [user.to_dict() for user in self.users],
+            'current-context': self.current_context,
+            'preferences': copy.deepcopy(dict(self.preferences)),
+        }
+        if self.api_version is not None:
+            view['apiVersion'] = self.api_version
+        if self.kind is not None:
+            view['kind'] = self.kind
+        if self.extensions:
+            view['extensions'] = copy.deepcopy(list(self.extensions))
+        return view
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        return result if result is NotImplemented else not result
+
+    __hash__ = None
@@ -0,0 +1,1425 @@
+"""
+An in-process kubeconfig engine.
+
+This module reads, merges, modifies, and writes kubeconfig files directly
+instead of shelling out to ``kubectl``. It follows the same loading
+precedence, merging, and write-back rules that ``kubectl config`` uses, and
+is what backs :py:class:`KubeConfig <kubeconfig.KubeConfig>` when it is
+constructed with ``backend='native'``.
+"""
+import base64
+import binascii
+import contextlib
+import copy
+import functools
+import itertools
+import mmap
+import os
+import re
+import stat
+import tempfile
+import time
+
+from . import embedded
+from . import exceptions
+from . import locking
+from . import tracing
+from .cache import parse_cache
+
+#: The name-keyed sections of a kubeconfig, paired with the key that holds
+#: each entry's body in the on-disk (v1) list form.
+NAMED_SECTIONS = (
+    ('clusters', 'cluster'),
+    ('contexts', 'context'),
+    ('users', 'user'),
+    ('extensions', 'extension'),
+)
+
+# PyYAML takes longer to import than everything else here put together, and
+# isn't needed at all by the kubectl backend, so it's imported by _yaml() on
+# first use. That also fills these in: libyaml's loader and emitter are many
+# times faster than the pure-Python ones, but are only there if PyYAML was
+# built against libyaml.
+_SafeLoader = None
+_Dumper = None
+
+
+def _yaml():
+    """
+    :rtype: module
+    :return: :py:mod:`yaml`, imported if it hasn't been already.
+    """
+    global _SafeLoader, _Dumper
+    import yaml
+
+    if _SafeLoader is None:
+        _SafeLoader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+    if _Dumper is None:
+        class Dumper(getattr(yaml, 'CSafeDumper', yaml.SafeDumper)):
+            """Writes embedded data handles as the strings they stand for."""
+
+        Dumper.add_representer(
+            embedded.EmbeddedData, lambda dumper, data: dumper.represent_str(data.encoded))
+        _Dumper = Dumper
+    return yaml
+
+
+# Placeholders kubectl substitutes for secrets in a non-raw view.
+_DATA_OMITTED = 'DATA+OMITTED'
+_REDACTED = 'REDACTED'
+
+
+def kubectl_error(message):
+    """
+    :param str message: A kubectl-style error message.
+    :rtype: KubectlCommandError
+    :return: The exception kubectl's own failure would have produced, so that
+        callers see the same error type regardless of backend.
+    """
+    return exceptions.KubectlCommandError('error: %s' % message)
+
+
+#
+# Loading
+#
+
+
+def recommended_home_file():
+    """
+    :rtype: str
+    :return: The config kubectl falls back on when neither ``--kubeconfig``
+        nor ``KUBECONFIG`` are set (``~/.kube/config``).
+    """
+    return os.path.join(os.path.expanduser('~'), '.kube', 'config')
+
+
+def loading_precedence(path=None):
+    """
+    :param str path: An explicit kubeconfig path, if any.
+    :rtype: list
+    :return: The files that make up the effective config, highest
+        precedence first. An explicit path wins outright, followed by the
+        de-duplicated ``KUBECONFIG`` entries, followed by
+        ``~/.kube/config``.
+    """
+    if path:
+        return [path]
+    paths = []
+    for entry in os.environ.get('KUBECONFIG', '').split(os.pathsep):
+        if entry and entry not in paths:
+            paths.append(entry)
+    return paths or [recommended_home_file()]
+
+
+def default_filename(path=None):
+    """
+    :param str path: An explicit kubeconfig path, if any.
+    :rtype: str
+    :return: The file that new entries are written to. With several
+        ``KUBECONFIG`` entries, this is the first one that exists (or the
+        last one, if none do).
+    """
+    precedence = loading_precedence(path)
+    if path or len(precedence) == 1:
+        return precedence[0]
+    for filename in precedence:
+        if os.path.exists(filename):
+            return filename
+    return precedence[-1]
+
+
+def empty_config():
+    """
+    :rtype: dict
+    :return: An empty config in the internal, name-keyed form used
+        throughout this module.
+    """
+    doc = {section: {} for section, _ in NAMED_SECTIONS}
+    doc['current-context'] = ''
+    doc['preferences'] = {}
+    return doc
+
+
+def from_v1(raw, filename='<string>'):
+    """
+    Converts an on-disk (v1) config into the internal, name-keyed form.
+
+    :param dict raw: The parsed contents of a kubeconfig file.
+    :param str filename: Used for error messages only.
+    :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+        when the document isn't a valid config.
+    :rtype: dict
+    """
+    if raw is None:
+        raw = {}
+    if not isinstance(raw, dict):
+        raise kubectl_error('error loading config file "%s": not a kubeconfig' % filename)
+    doc = empty_config()
+    for section, body_key in NAMED_SECTIONS:
+        entries = doc[section]
+        for item in raw.get(section) or []:
+            if not isinstance(item, dict) or 'name' not in item:
+                raise kubectl_error('error loading config file "%s": invalid %s entry'
+                                    % (filename, section))
+            name = item['name']
+            if name in entries:
+                raise kubectl_error('error loading config file "%s": duplicate name "%s" in %s'
+                                    % (filename, name, section))
+            body = item.get(body_key) or {}
+            # Extensions may hold anything; the rest are objects.
+            if section != 'extensions' and not isinstance(body, dict):
+                raise kubectl_error('error loading config file "%s": %s "%s": %s must be '
+                                    'a mapping' % (filename, section, name, body_key))
+            entries[name] = body
+    doc['current-context'] = raw.get('current-context') or ''
+    doc['preferences'] = raw.get('preferences') or {}
+    return doc
+
+
+def to_v1(doc):
+    """
+    Converts an internal, name-keyed config into the on-disk (v1) form, with
+    each section's entries sorted by name just as kubectl writes them.
+
+    .. note:: Entry bodies are shared with ``doc``, not copied.
+
+    :param dict doc: A config in internal form.
+    :rtype: dict
+    """
+    raw = {
+        'apiVersion': 'v1',
+        'kind': 'Config',
+        'current-context': doc['current-context'],
+        'preferences': doc['preferences'],
+    }
+    for section, body_key in NAMED_SECTIONS:
+        entries = [{'name': name, body_key: body}
+                   for name, body in sorted(doc[section].items(), key=lambda i: i[0])]
+        # Extensions are omitted when empty, the rest are always present.
+        if entries or section != 'extensions':
+            raw[section] = entries
+    return raw
+
+
+def parse(data, filename='<string>'):
+    """
+    :param bytes data: The raw contents of a kubeconfig file.
+    :param str filename: Used for error messages only.
+    :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+        when the contents can't be parsed.
+    :rtype: dict
+    :return: The config, in internal form.
+    """
+    # Embedded certificate data is cut out before parsing (and left as
+    # handles onto ``data``), since it's most of the file and the parser
+    # would otherwise spend most of its time copying it.
+    stripped, handles = embedded.extract(data)
+    doc = from_v1(_load_yaml(stripped, filename), filename)
+    if not embedded.restore(_data_bodies(doc), handles):
+        doc = from_v1(_load_yaml(data, filename), filename)
+        embedded.restore(_data_bodies(doc), {})
+    return doc
+
+
+def _load_yaml(data, filename):
+    yaml = _yaml()
+    try:
+        return yaml.load(data, Loader=_SafeLoader)
+    except yaml.YAMLError as exc:
+        raise kubectl_error('error loading config file "%s": %s' % (filename, exc))
+
+
+def _data_bodies(doc):
+    """
+    :return: The bodies that may hold embedded data: every cluster and user.
+    """
+    return itertools.chain(doc['clusters'].values(), doc['users'].values())
+
+
+def load_file(filename, tracer=None, cache=None):
+    """
+    :param str filename: Path to a kubeconfig file.
+    :param Tracer tracer: Told how long parsing took (see
+        :py:mod:`kubeconfig.tracing`). Defaults to the global tracer.
+    :param ParseCache cache: If given, the file is only parsed if it has
+        changed since it was last loaded through ``cache``. The result is
+        then shared, and must not be changed.
+    :rtype: dict or None
+    :return: The file's config in internal form, or ``None`` if the file
+        doesn't exist.
+    """
+    if cache is not None:
+        return cache.load(filename, lambda data: _parse_file(data, filename, tracer),
+                          tracer=tracer)
+    try:
+        with open(filename, 'rb') as fobj:
+            data = fobj.read()
+    except FileNotFoundError:
+        return None
+    return _parse_file(data, filename, tracer)
+
+
+def _parse_file(data, filename, tracer):
+    start = time.perf_counter()
+    doc = parse(data, filename)
+    tracer = tracing.get_tracer(tracer)
+    if tracer.enabled:
+        tracer.on_parse(filename, time.perf_counter() - start, len(data))
+    return doc
+
+
+_CURRENT_CONTEXT_KEY = b'current-context:'
+_LEADING_SPACE = re.compile(br'\s*')
+
+
+def scan_current_context(filename):
+    """
+    Finds a file's ``current-context`` without parsing the whole document,
+    by looking for the key at the start of a line. Anything unusual (JSON or
+    flow-style documents, block scalars, anchors, a key given twice, a value
+    that may run on to the next line, and the like) falls back on a full
+    parse, which gives the same result as :py:func:`load_file`, errors
+    included.
+
+    :param str filename: Path to a kubeconfig file.
+    :rtype: str or None
+    :return: The file's ``current-context`` (``''`` if it isn't set), or
+        ``None`` if the file doesn't exist.
+    """
+    try:
+        with open(filename, 'rb') as fobj:
+            size = os.fstat(fobj.fileno()).st_size
+            if not size:
+                return ''
+            with mmap.mmap(fobj.fileno(), 0, access=mmap.ACCESS_READ) as data:
+                value = _scan_current_context(data)
+    except FileNotFoundError:
+        return None
+    if value is None:
+        doc = load_file(filename)
+        return doc['current-context'] if doc is not None else None
+    return value
+
+
+def _scan_current_context(data):
+    """
+    :rtype: str or None
+    :return: The ``current-context`` found in ``data``, or ``None`` if a
+        full parse is needed to be sure.
+    """
+    offset = _LEADING_SPACE.match(data).end()
+    if data[offset:offset + 1] in (b'{', b'['):
+        return None
+    if data[:len(_CURRENT_CONTEXT_KEY)] == _CURRENT_CONTEXT_KEY:
+        start = 0
+    else:
+        start = data.find(b'\n' + _CURRENT_CONTEXT_KEY)
+        if start == -1:
+            # Not at the start of any line, but it may still be in there
+            # in some other form.
+            return '' if data.find(b'current-context') == -1 else None
+        start += 1
+    start += len(_CURRENT_CONTEXT_KEY)
+    end = data.find(b'\n', start)
+    if end != -1:
+        # A second key (the last would win), or a value continued on an
+        # indented line.
+        if data.find(b'\n' + _CURRENT_CONTEXT_KEY, end) != -1:
+            return None
+        if data[end + 1:end + 2] in (b' ', b'\t'):
+            return None
+    value = data[start:end if end != -1 else len(data)].strip()
+    if not value or value[:1] in b'|>&*!':
+        return None
+    # Quotes must open and close on this line. One anywhere else may mean
+    # the line is really part of an earlier key's multi-line value.
+    quoted = value[:1] in (b'"', b"'") and len(value) > 1 and value[-1:] == value[:1]
+    if not quoted and (b'"' in value or b"'" in value):
+        return None
+    yaml = _yaml()
+    try:
+        value = yaml.load(value, Loader=_SafeLoader)
+    except yaml.YAMLError:
+        return None
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else None
+
+
+def merge(files):
+    """
+    Merges several configs using kubectl's rules: the first file to define a
+    cluster, context, user, or extension wins, as does the first non-empty
+    ``current-context`` and each first non-empty preference.
+
+    :param list files: ``(filename, doc)`` pairs in precedence order, where
+        ``doc`` is ``None`` for a missing file.
+    :rtype: tuple
+    :return: A ``(merged_doc, origins)`` pair, where ``origins`` maps each
+        named section to a dict of entry name to the file it came from.
+    """
+    merged = empty_config()
+    origins = {section: {} for section, _ in NAMED_SECTIONS}
+    for filename, doc in files:
+        if doc is None:
+            continue
+        for section, _ in NAMED_SECTIONS:
+            merged_entries = merged[section]
+            section_origins = origins[section]
+            for name, body in doc[section].items():
+                if name not in merged_entries:
+                    merged_entries[name] = body
+                    section_origins[name] = filename
+        if not merged['current-context']:
+            merged['current-context'] = doc['current-context']
+        for key, value in doc['preferences'].items():
+            if not merged['preferences'].get(key):
+                merged['preferences'][key] = value
+    return merged, origins
+
+
+def _editable(doc):
+    """
+    :param dict doc: A config in internal form.
+    :rtype: dict
+    :return: A copy of ``doc`` that may be freely modified at the top level.
+        Entry bodies are still shared; use :py:func:`_writable_entry` before
+        changing one.
+    """
+    edited = {section: dict(doc[section]) for section, _ in NAMED_SECTIONS}
+    edited['current-context'] = doc['current-context']
+    edited['preferences'] = copy.deepcopy(doc['preferences'])
+    return edited
+
+
+def _writable_entry(doc, section, name):
+    """
+    :rtype: dict
+    :return: A private copy of the named entry's body (an empty one if the
+        entry doesn't exist yet), stored back into ``doc``.
+    """
+    body = copy.deepcopy(doc[section].get(name) or {})
+    doc[section][name] = body
+    return body
+
+
+class LoadedConfig(object):
+    """
+    The files that make up an effective config, and the result of merging
+    them.
+
+    :param str path: The explicit kubeconfig path, if any.
+    :param list files: ``(filename, doc)`` pairs in precedence order.
+    """
+
+    def __init__(self, path, files):
+        self.path = path
+        self.files = files
+        self.merged, self.origins = merge(files)
+
+    def edit(self, doc=None):
+        """
+        :param dict doc: An earlier working copy to copy, rather than the
+            merged config as loaded.
+        :rtype: dict
+        :return: A working copy of the merged config to apply changes to.
+        """
+        return _editable(self.merged if doc is None else doc)
+
+    def view(self, raw=False, doc=None):
+        """
+        :param bool raw: If ``True``, leave certificate data and tokens in
+            place rather than redacting them. Certificate data is left as
+            :py:class:`EmbeddedData <kubeconfig.embedded.EmbeddedData>`
+            handles.
+        :param dict doc: A working copy (see :py:meth:`edit`) to present
+            instead of the merged config as loaded.
+        :rtype: dict
+        :return: The merged config in v1 form, exactly as
+            ``kubectl config view`` would present it.
+        """
+        view = copy.deepcopy(to_v1(self.merged if doc is None else doc))
+        self._resolve_paths(view)
+        if raw:
+            embedded.wrap(view)
+        else:
+            _redact(view)
+        return view
+
+    def origin(self, section, name):
+        """
+        :rtype: str
+        :return: The file the named entry came from, or the file it would be
+            written to if it's new.
+        """
+        filename = self.origins[section].get(name)
+        return filename if filename else default_filename(self.path)
+
+    def move(self, section, old_name, new_name):
+        """
+        Makes an entry renamed in a working copy go back to the file the old
+        name came from when it's written (see :py:func:`write_changes`).
+        """
+        origins = self.origins[section]
+        if old_name in origins:
+            origins[new_name] = origins[old_name]
+        else:
+            origins.pop(new_name, None)
+
+    def _resolve_paths(self, view):
+        """
+        Makes relative file references absolute with respect to the file
+        that each entry came from, like kubectl does at load time.
+        """
+        for item in view['clusters']:
+            base = os.path.dirname(self.origin('clusters', item['name']))
+            _resolve_path(item['cluster'], 'certificate-authority', base)
+        for item in view['users']:
+            base = os.path.dirname(self.origin('users', item['name']))
+            user = item['user']
+            for key in ('client-certificate', 'client-key', 'tokenFile'):
+                _resolve_path(user, key, base)
+            exec_conf = user.get('exec')
+            if isinstance(exec_conf, dict) and os.sep in (exec_conf.get('command') or ''):
+                _resolve_path(exec_conf, 'command', base)
+
+
+def _resolve_path(body, key, base):
+    value = body.get(key)
+    if value and not os.path.isabs(value):
+        body[key] = os.path.normpath(os.path.join(base, value))
+
+
+def _redact(view):
+    """Swaps secrets out for kubectl's placeholders, in place."""
+    for item in view['clusters']:
+        cluster = item['cluster']
+        if cluster.get('certificate-authority-data'):
+            cluster['certificate-authority-data'] = _DATA_OMITTED
+    for item in view['users']:
+        user = item['user']
+        if user.get('client-certificate-data'):
+            user['client-certificate-data'] = _DATA_OMITTED
+        if user.get('client-key-data'):
+            user['client-key-data'] = _REDACTED
+        if user.get('token'):
+            user['token'] = _REDACTED
+
+
+#
+# Writing
+#
+
+
+def write_file(filename, doc, tracer=None, fsync=False):
+    """
+    Atomically replaces ``filename`` with ``doc``, creating any missing
+    parent directories. Keys are written in the same (sorted) order kubectl
+    writes them in. If the file already holds exactly what would be
+    written, it's left alone.
+
+    As with kubectl, a symlinked file is written through the link, to the
+    file it points to, and an existing file keeps its permissions. New
+    files are only readable by their owner.
+
+    :param str filename: The kubeconfig file to write.
+    :param dict doc: A config in internal form.
+    :param Tracer tracer: Told how long writing took (see
+        :py:mod:`kubeconfig.tracing`). Defaults to the global tracer.
+    :param bool fsync: If ``True``, the new contents are flushed to disk
+        before they replace the old, so that once this returns, they'll
+        survive a crash.
+    :rtype: bool
+    :return: ``True`` if the file was written, ``False`` if it was left
+        alone.
+    """
+    start = time.perf_counter()
+    data = _yaml().dump(to_v1(doc), Dumper=_Dumper, default_flow_style=False,
+                        encoding='utf-8')
+    if _holds(filename, data):
+        return False
+    # The temporary file has to be in the same directory as the file it
+    # replaces, which for a symlink is the directory of its target.
+    target = os.path.realpath(filename)
+    try:
+        mode = stat.S_IMODE(os.stat(target).st_mode)
+    except FileNotFoundError:
+        mode = 0o600
+    dirname = os.path.dirname(target)
+    os.makedirs(dirname, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=dirname, prefix='.kubeconfig-')
+    try:
+        with os.fdopen(fd, 'wb') as fobj:
+            fobj.write(data)
+            if fsync:
+                fobj.flush()
+                os.fsync(fobj.fileno())
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, target)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.unlink(tmp_path)
+        raise
+    tracer = tracing.get_tracer(tracer)
+    if tracer.enabled:
+        tracer.on_write(filename, time.perf_counter() - start, len(data))
+    return True
+
+
+def _holds(filename, data):
+    """
+    :rtype: bool
+    :return: Whether ``filename`` exists and holds exactly ``data``.
+    """
+    try:
+        with open(filename, 'rb') as fobj:
+            # Most changes change the size, which saves reading the file.
+            if os.fstat(fobj.fileno()).st_size != len(data):
+                return False
+            return fobj.read() == data
+    except OSError:
+        return False
+
+
+def write_changes(loaded, doc, tracer=None, fsync=False):
+    """
+    Writes the differences between a loaded config and a modified copy of its
+    merged form back to disk. As with kubectl, changed entries go back to the
+    file they came from, new entries go to the default file, and each file is
+    written at most once.
+
+    :param LoadedConfig loaded: The config as it was loaded.
+    :param dict doc: The modified copy (see :py:meth:`LoadedConfig.edit`).
+    :param Tracer tracer: Passed on to :py:func:`write_file`.
+    :param bool fsync: Passed on to :py:func:`write_file`.
+    :rtype: list
+    :return: The filenames that were written. Files whose contents would
+        have stayed the same aren't.
+    """
+    files = dict(loaded.files)
+    pending = {}
+
+    def target(filename):
+        if filename not in pending:
+            pending[filename] = _editable(files.get(filename) or empty_config())
+        return pending[filename]
+
+    starting = loaded.merged
+    default = default_filename(loaded.path)
+    for section, _ in NAMED_SECTIONS:
+        before = starting[section]
+        origins = loaded.origins[section]
+        for name, body in doc[section].items():
+            old = before.get(name)
+            if old is body or (name in before and old == body):
+                continue
+            target(origins.get(name, default))[section][name] = body
+        for name in before:
+            if name not in doc[section]:
+                target(origins[name])[section].pop(name, None)
+
+    if doc['current-context'] != starting['current-context']:
+        filename = current_context_file(loaded, default)
+        target(filename)['current-context'] = doc['current-context']
+
+    if doc['preferences'] != starting['preferences']:
+        filename = default
+        if not loaded.path:
+            filename = next((f for f, d in loaded.files if d is not None), default)
+        target(filename)['preferences'] = doc['preferences']
+
+    return [filename for filename, file_doc in pending.items()
+            if write_file(filename, file_doc, tracer=tracer, fsync=fsync)]
+
+
+def current_context_file(loaded, default):
+    """
+    :param LoadedConfig loaded: The config, as loaded.
+    :param str default: The file to give when no file sets a current context
+        (see :py:func:`default_filename`).
+    :rtype: str
+    :return: The file holding the effective ``current-context`` (the first
+        one that sets it), or the default file if none do.
+    """
+    if loaded.path:
+        return loaded.path
+    for filename, doc in loaded.files:
+        if doc is not None and doc['current-context']:
+            return filename
+    return default
+
+
+#
+# Property paths (``kubectl config set/unset``)
+#
+
+_STRING = 'string'
+_BOOL = 'bool'
+_BYTES = 'bytes'
+_LIST = 'list'
+
+
+class _MapOf(object):
+    """A schema node for a name-keyed map of ``value_type``."""
+
+    __slots__ = ('value_type',)
+
+    def __init__(self, value_type):
+        self.value_type = value_type
+
+
+_EXEC_SCHEMA = {
+    'command': _STRING,
+    'args': _LIST,
+    'env': _LIST,
+    'apiVersion': _STRING,
+    'installHint': _STRING,
+    'provideClusterInfo': _BOOL,
+    'interactiveMode': _STRING,
+}
+
+_AUTH_PROVIDER_SCHEMA = {
+    'name': _STRING,
+    'config': _MapOf(_STRING),
+}
+
+_CLUSTER_SCHEMA = {
+    'server': _STRING,
+    'tls-server-name': _STRING,
+    'insecure-skip-tls-verify': _BOOL,
+    'certificate-authority': _STRING,
+    'certificate-authority-data': _BYTES,
+    'proxy-url': _STRING,
+    'disable-compression': _BOOL,
+}
+
+_CONTEXT_SCHEMA = {
+    'cluster': _STRING,
+    'user': _STRING,
+    'namespace': _STRING,
+}
+
+_USER_SCHEMA = {
+    'client-certificate': _STRING,
+    'client-certificate-data': _BYTES,
+    'client-key': _STRING,
+    'client-key-data': _BYTES,
+    'token': _STRING,
+    'tokenFile': _STRING,
+    'as': _STRING,
+    'as-uid': _STRING,
+    'as-groups': _LIST,
+    'username': _STRING,
+    'password': _STRING,
+    'auth-provider': _AUTH_PROVIDER_SCHEMA,
+    'exec': _EXEC_SCHEMA,
+}
+
+_CONFIG_SCHEMA = {
+    'preferences': {'colors': _BOOL},
+    'clusters': _MapOf(_CLUSTER_SCHEMA),
+    'contexts': _MapOf(_CONTEXT_SCHEMA),
+    'users': _MapOf(_USER_SCHEMA),
+    'current-context': _STRING,
+}
+
+
+def parse_property_path(path):
+    """
+    Splits a dotted property path into navigation steps, the same way
+    kubectl does. Map keys may contain dots: a key extends up to the first
+    part that names a field of the map's value type, so
+    ``clusters.10.0.0.1.server`` addresses the ``server`` of the
+    ``10.0.0.1`` cluster.
+
+    :param str path: A property path such as ``contexts.prod.namespace``.
+    :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+        when the path doesn't address anything in a config.
+    :rtype: list
+    :return: ``(key, schema)`` pairs, one per step.
+    """
+    parts = path.split('.')
+    steps = []
+    schema = _CONFIG_SCHEMA
+    index = 0
+    while index < len(parts):
+        if isinstance(schema, _MapOf):
+            fields = schema.value_type if isinstance(schema.value_type, dict) else {}
+            length = next((offset for offset, part in enumerate(parts[index + 1:], 1)
+                           if part in fields), len(parts) - index)
+            key = '.'.join(parts[index:index + length])
+            index += length
+            schema = schema.value_type
+        elif isinstance(schema, dict) and parts[index] in schema:
+            key = parts[index]
+            index += 1
+            schema = schema[key]
+        else:
+            raise kubectl_error('unable to parse "%s" at "%s"' % (path, parts[index]))
+        steps.append((key, schema))
+    return steps
+
+
+@functools.lru_cache(maxsize=1024)
+def compile_property_path(path):
+    """
+    Parses a property path as :py:func:`parse_property_path` does, but
+    remembers the result, so that using the same path again costs a
+    dictionary lookup.
+
+    :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+        when the path doesn't address anything in a config.
+    :rtype: tuple
+    :return: The key for each step.
+    """
+    return tuple(key for key, _ in parse_property_path(path))
+
+
+def _parse_bool(value):
+    """Mirrors Go's ``strconv.ParseBool``."""
+    if value in ('1', 't', 'T', 'true', 'TRUE', 'True'):
+        return True
+    if value in ('0', 'f', 'F', 'false', 'FALSE', 'False'):
+        return False
+    raise kubectl_error('invalid boolean value: "%s"' % value)
+
+
+def _assign(body, key, value):
+    """Sets ``key``, or drops it for empty values (kubectl's omitempty)."""
+    if value in ('', False, None):
+        body.pop(key, None)
+    else:
+        body[key] = value
+
+
+def _navigate(doc, steps, create):
+    """
+    Walks all but the last of ``steps``, copying the touched entry before it
+    can be changed.
+
+    :param bool create: If ``True``, missing entries and structs are created
+        along the way. Otherwise, a missing map key is an error and a missing
+        struct returns ``None``.
+    :rtype: dict or None
+    :return: The container the final step refers into.
+    """
+    node = doc
+    parent_schema = _CONFIG_SCHEMA
+    for depth, (key, schema) in enumerate(steps[:-1]):
+        if key not in node and not create:
+            if isinstance(parent_schema, _MapOf):
+                raise kubectl_error('current map key `%s` is invalid' % key)
+            return None
+        if depth == 1 and isinstance(_CONFIG_SCHEMA[steps[0][0]], _MapOf):
+            node = _writable_entry(doc, steps[0][0], key)
+        else:
+            child = node.get(key)
+            if not isinstance(child, dict):
+                child = node[key] = {}
+            node = child
+        parent_schema = schema
+    return node
+
+
+def set_property(doc, path, value):
+    """
+    Applies ``kubectl config set <path> <value>`` to ``doc``.
+
+    :param dict doc: A working copy of a config in internal form.
+    """
+    steps = parse_property_path(path)
+    key, schema = steps[-1]
+    if schema == _STRING:
+        value = '%s' % value
+    elif schema == _BOOL:
+        value = _parse_bool('%s' % value)
+    elif schema == _BYTES:
+        try:
+            value = base64.b64encode(base64.b64decode('%s' % value, validate=True))
+        except (binascii.Error, ValueError) as exc:
+            raise kubectl_error('invalid base64 value for "%s": %s' % (path, exc))
+        value = value.decode('ascii')
+    else:
+        raise kubectl_error('unable to set "%s": only scalar values may be set' % path)
+    node = _navigate(doc, steps, create=True)
+    if len(steps) == 1:
+        node[key] = value
+    else:
+        _assign(node, key, value)
+
+
+def unset_property(doc, path):
+    """
+    Applies ``kubectl config unset <path>`` to ``doc``.
+
+    :param dict doc: A working copy of a config in internal form.
+    """
+    steps = parse_property_path(path)
+    key = steps[-1][0]
+    if len(steps) == 1:
+        doc[key] = empty_config()[key]
+        return
+    node = _navigate(doc, steps, create=False)
+    if node is None:
+        return
+    if isinstance(steps[-2][1], _MapOf) and key not in node:
+        raise kubectl_error('current map key `%s` is invalid' % key)
+    node.pop(key, None)
+
+
+#
+# Merging in fragments
+#
+
+#: The ways :py:meth:`KubeConfig.merge <kubeconfig.KubeConfig.merge>` may
+#: settle a name that's in both configs.
+MERGE_STRATEGIES = ('overwrite', 'keep-existing', 'rename')
+
+
+def load_fragment(fragment):
+    """
+    :param fragment: A config in on-disk (v1) form, or the path of a file
+        holding one. Relative file references in a file are made absolute
+        with respect to the file's directory.
+    :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+        when the fragment isn't a valid config, or the file doesn't exist.
+    :rtype: dict
+    :return: The fragment in internal form, sharing nothing with
+        ``fragment``.
+    """
+    if isinstance(fragment, dict):
+        doc = from_v1(copy.deepcopy(fragment))
+        _check_unredacted(doc)
+        return doc
+    doc = load_file(fragment)
+    if doc is None:
+        raise kubectl_error('cannot merge "%s": no such file' % fragment)
+    return from_v1(LoadedConfig(fragment, [(fragment, doc)]).view(raw=True), fragment)
+
+
+def _check_unredacted(doc):
+    """
+    :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+        when ``doc`` holds the placeholders a non-raw view puts in place of
+        secrets, which would otherwise be written out as if they were the
+        secrets themselves.
+    """
+    placeholders = (
+        ('clusters', 'certificate-authority-data', _DATA_OMITTED),
+        ('users', 'client-certificate-data', _DATA_OMITTED),
+        ('users', 'client-key-data', _REDACTED),
+        ('users', 'token', _REDACTED),
+    )
+    for section, key, placeholder in placeholders:
+        for name, body in doc[section].items():
+            if isinstance(body, dict) and body.get(key) == placeholder:
+                raise kubectl_error('cannot merge %s "%s": its %s is a placeholder; merge a '
+                                    'raw view (view(raw=True)) instead' % (section, name, key))
+
+
+def _free_name(name, *taken):
+    for index in itertools.count(1):
+        candidate = '%s-%d' % (name, index)
+        if not any(candidate in names for names in taken):
+            return candidate
+
+
+def merge_fragment(doc, fragment, strategy='overwrite'):
+    """
+    Merges the clusters, contexts, users, extensions, and preferences of
+    ``fragment`` into ``doc``. ``current-context`` is left alone.
+
+    :param dict doc: A working copy of a config in internal form.
+    :param dict fragment: A config in internal form, which is consumed.
+    :param str strategy: One of :py:data:`MERGE_STRATEGIES`.
+    :rtype: dict
+    :return: The entries that were renamed, as a dict of section name to a
+        dict of old name to new name.
+    """
+    if strategy not in MERGE_STRATEGIES:
+        raise ValueError("Unknown merge strategy: %s" % strategy)
+    renames = {}
+    if strategy == 'rename':
+        # Contexts go last, so that they're compared once they point at the
+        # fragment's own (possibly renamed) clusters and users.
+        sections = [section for section, _ in NAMED_SECTIONS if section != 'contexts']
+        for section in sections + ['contexts']:
+            if section == 'contexts':
+                for name, context in list(fragment['contexts'].items()):
+                    if not isinstance(context, dict):
+                        continue
+                    context = dict(context)
+                    for key, target in (('cluster', 'clusters'), ('user', 'users')):
+                        new_name = renames.get(target, {}).get(context.get(key))
+                        if new_name is not None:
+                            context[key] = new_name
+                    fragment['contexts'][name] = context
+            existing, incoming = doc[section], fragment[section]
+            for name in list(incoming):
+                if name in existing and existing[name] != incoming[name]:
+                    new_name = _free_name(name, existing, incoming)
+                    incoming[new_name] = incoming.pop(name)
+                    renames.setdefault(section, {})[name] = new_name
+
+    for section, _ in NAMED_SECTIONS:
+        existing = doc[section]
+        for name, body in fragment[section].items():
+            if strategy == 'overwrite' or name not in existing:
+                existing[name] = body
+
+    for key, value in fragment['preferences'].items():
+        if strategy == 'overwrite' or key not in doc['preferences']:
+            doc['preferences'][key] = value
+    return renames
+
+
+def _merge_patch(target, patch):
+    """
+    :return: ``target`` with ``patch`` applied as a JSON merge patch (RFC
+        7386). Neither is changed, and nothing is shared with ``patch``.
+    """
+    if not isinstance(patch, dict):
+        return copy.deepcopy(patch)
+    result = dict(target) if isinstance(target, dict) else {}
+    for key, value in patch.items():
+        if value is None:
+            result.pop(key, None)
+        else:
+            result[key] = _merge_patch(result.get(key), value)
+    return result
+
+
+def _check_changeset(changeset):
+    if not isinstance(changeset, dict):
+        raise kubectl_error('invalid changeset: not a mapping')
+    sections = [section for section, _ in NAMED_SECTIONS]
+    for key, value in changeset.items():
+        if key in sections:
+            if not isinstance(value, dict):
+                raise kubectl_error('invalid changeset: %s must map names to patches' % key)
+            for name, patch in value.items():
+                if patch is not None and not isinstance(patch, dict):
+                    raise kubectl_error('invalid changeset: %s "%s" must be a patch or null'
+                                        % (key, name))
+        elif key == 'current-context':
+            if not isinstance(value, str):
+                raise kubectl_error('invalid changeset: current-context must be a string')
+        elif key == 'preferences':
+            if not isinstance(value, dict):
+                raise kubectl_error('invalid changeset: preferences must be a patch')
+        else:
+            raise kubectl_error('invalid changeset: unknown key "%s"' % key)
+
+
+def apply_changeset(doc, changeset):
+    """
+    Applies a changeset, as made by :py:func:`kubeconfig.delta.diff`, to
+    ``doc``.
+
+    :param dict doc: A working copy of a config in internal form. Entry
+        bodies are replaced, never changed.
+    :param dict changeset: The changeset.
+    :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+        when the changeset isn't valid, in which case ``doc`` is left alone.
+    """
+    _check_changeset(changeset)
+    for section, _ in NAMED_SECTIONS:
+        entries = doc[section]
+        for name, patch in (changeset.get(section) or {}).items():
+            if patch is None:
+                entries.pop(name, None)
+            else:
+                entries[name] = _merge_patch(entries.get(name), patch)
+    if 'current-context' in changeset:
+        doc['current-context'] = changeset['current-context']
+    if 'preferences' in changeset:
+        doc['preferences'] = _merge_patch(doc['preferences'], changeset['preferences'])
+
+
+def _check_bool(value):
+    if value is not None and not isinstance(value, bool):
+        raise ValueError("Not a bool: %s", value)
+
+
+def read_embedded(filename, flag):
+    """
+    :param str filename: The file to read.
+    :param str flag: The field or flag the file was given as, for error
+        messages.
+    :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+        when the file can't be read.
+    :rtype: str
+    :return: The base64-encoded contents of ``filename``, for embedding.
+    """
+    try:
+        with open(filename, 'rb') as fobj:
+            return base64.b64encode(fobj.read()).decode('ascii')
+    except OSError as exc:
+        raise kubectl_error('could not read %s data from %s: %s' % (flag, filename, exc))
+
+
+#
+# Exporting
+#
+
+# The file references that flattening embeds, by the section they're in.
+_FLATTEN_FIELDS = (
+    ('clusters', ('certificate-authority',)),
+    ('users', ('client-certificate', 'client-key')),
+)
+
+
+def minify(index, context_name, flatten=True, read=read_embedded):
+    """
+    Builds a config holding just one context, along with the cluster and
+    user it refers to, as ``kubectl config view --minify --raw`` (and, if
+    ``flatten`` is set, ``--flatten``) would.
+
+    :param ConfigIndex index: An index over a raw view.
+    :param str context_name: The context to export.
+    :param bool flatten: If ``True``, certificate and key files are read
+        and embedded, so that the result stands alone.
+    :param callable read: Called with a filename and the field it came from
+        to get the file's base64-encoded contents. Exporting many contexts
+        may pass a memoized version of the default.
+    :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+        when there is no such context, or a file to be embedded can't be
+        read.
+    :rtype: dict
+    :return: The config in v1 form, with any embedded data as plain strings.
+    """
+    resolved = index.resolve(context_name)
+    if resolved is None:
+        raise kubectl_error('cannot locate context %s' % context_name)
+    return minify_resolved(resolved, flatten=flatten, read=read)
+
+
+def minify_resolved(resolved, flatten=True, read=read_embedded):
+    """
+    :py:func:`minify`, for a context that has already been looked up.
+
+    :param ResolvedContext resolved: The context, and the cluster and user
+        it refers to, from an index over a raw view. It's changed in place.
+    :rtype: dict
+    """
+    context_name = resolved.name
+    doc = empty_config()
+    doc['contexts'][context_name] = resolved.context
+    if resolved.cluster is not None:
+        doc['clusters'][resolved.context['cluster']] = resolved.cluster
+    if resolved.user is not None:
+        doc['users'][resolved.context['user']] = resolved.user
+    doc['current-context'] = context_name
+    if flatten:
+        for section, fields in _FLATTEN_FIELDS:
+            for body in doc[section].values():
+                for field in fields:
+                    if body.get(field):
+                        body[field + '-data'] = read(body.pop(field), field)
+    return embedded.materialize(to_v1(doc))
+
+
+#
+# The backend
+#
+
+
+class NativeBackend(object):
+    """
+    Carries out :py:class:`KubeConfig <kubeconfig.KubeConfig>` operations
+    in-process, without invoking ``kubectl``.
+
+    :param str path: An explicit kubeconfig path. If ``None``, the
+        ``KUBECONFIG`` environment variable and ``~/.kube/config`` are used,
+        just as kubectl would.
+    :param Tracer tracer: See :py:mod:`kubeconfig.tracing`.
+    :param bool fsync: If ``True``, changes are flushed to disk before each
+        file is replaced (see :py:func:`write_file`).
+    """
+
+    def __init__(self, path=None, tracer=None, fsync=False):
+        self.path = path
+        self.tracer = tracer
+        self.fsync = fsync
+        # A (LoadedConfig, working doc) pair while a transaction is open.
+        self._transaction = None
+
+    def load(self, cached=True):
+        """
+        :param bool cached: If ``False``, parse every file afresh, and don't
+            keep what's parsed in the parse cache.
+        :rtype: LoadedConfig
+        :return: The current state of every file in the precedence list.
+            Files that haven't changed since they were last loaded (by any
+            backend) aren't parsed again.
+        """
+        cache = parse_cache if cached else None
+        files = [(filename, load_file(filename, tracer=self.tracer, cache=cache))
+                 for filename in loading_precedence(self.path)]
+        return LoadedConfig(self.path, files)
+
+    @property
+    def in_transaction(self):
+        """``True`` while a :py:meth:`transaction` is open."""
+        return self._transaction is not None
+
+    @contextlib.contextmanager
+    def transaction(self):
+        """
+        Collects every change made within the block against a single
+        in-memory copy of the config, and writes them out together once the
+        block completes. If the block raises, nothing is written. Nested
+        transactions join the outermost one.
+
+        Other writers (in this process or any other) wait for the block to
+        complete, so that none of their changes are lost; see
+        :py:mod:`kubeconfig.locking`.
+        """
+        if self._transaction is not None:
+            yield
+            return
+        with locking.locked(loading_precedence(self.path)):
+            loaded = self.load()
+            self._transaction = (loaded, loaded.edit())
+            try:
+                yield
+                write_changes(*self._transaction, tracer=self.tracer, fsync=self.fsync)
+            finally:
+                self._transaction = None
+
+    @contextlib.contextmanager
+    def applying_to(self, loaded, doc):
+        """
+        Directs the changes made within the block at ``doc``, rather than at
+        the files, as if in a :py:meth:`transaction` that's never written.
+        Nothing is locked or read.
+
+        :param LoadedConfig loaded: The config ``doc`` was made from.
+        :param dict doc: A working copy (see :py:meth:`LoadedConfig.edit`).
+        :return: This backend, for convenience.
+        """
+        previous, self._transaction = self._transaction, (loaded, doc)
+        try:
+            yield self
+        finally:
+            self._transaction = previous
+
+    @contextlib.contextmanager
+    def _editing(self):
+        """
+        Yields a working copy of the merged config, and writes whatever
+        changed back to disk once the block completes. Within a transaction,
+        the transaction's copy is yielded and writing is left to it.
+        Otherwise, the files are locked, and read afresh, for the duration.
+        """
+        with self._editing_loaded() as (_, doc):
+            yield doc
+
+    @contextlib.contextmanager
+    def _editing_loaded(self):
+        """
+        As with :py:meth:`_editing`, but yields the config the working copy
+        was made from, too, as a ``(loaded, doc)`` pair.
+        """
+        if self._transaction is not None:
+            yield self._transaction
+            return
+        with locking.locked(loading_precedence(self.path)):
+            loaded = self.load()
+            doc = loaded.edit()
+            yield loaded, doc
+            write_changes(loaded, doc, tracer=self.tracer, fsync=self.fsync)
+
+    def delete_cluster(self, name):
+        with self._editing() as doc:
+            if name not in doc['clusters']:
+                raise kubectl_error('cannot delete cluster %s, not in %s'
+                                    % (name, default_filename(self.path)))
+            del doc['clusters'][name]
+
+    def delete_context(self, name):
+        with self._editing() as doc:
+            if name not in doc['contexts']:
+                raise kubectl_error('cannot delete context %s, not in %s'
+                                    % (name, default_filename(self.path)))
+            del doc['contexts'][name]
+
+    def delete_user(self, name):
+        with self._editing() as doc:
+            if name not in doc['users']:
+                raise kubectl_error('cannot delete user %s, not in %s'
+                                    % (name, default_filename(self.path)))
+            del doc['users'][name]
+
+    def rename_context(self, old_name, new_name):
+        with self._editing_loaded() as (loaded, doc):
+            contexts = doc['contexts']
+            if old_name not in contexts:
+                raise kubectl_error('cannot rename the context "%s", it\'s not in %s'
+                                    % (old_name, default_filename(self.path)))
+            if new_name in contexts:
+                raise kubectl_error('cannot rename the context "%s", the context "%s" already '
+                                    'exists in %s' % (old_name, new_name,
+                                                      default_filename(self.path)))
+            contexts[new_name] = contexts.pop(old_name)
+            # Like kubectl, keep the context in the file it came from.
+            loaded.move('contexts', old_name, new_name)
+            if doc['current-context'] == old_name:
+                doc['current-context'] = new_name
+
+    def merge(self, fragment, strategy='overwrite'):
+        fragment = load_fragment(fragment)
+        with self._editing() as doc:
+            return merge_fragment(doc, fragment, strategy)
+
+    def apply_delta(self, changeset):
+        with self._editing() as doc:
+            apply_changeset(doc, changeset)
+
+    def set(self, name, value):
+        with self._editing() as doc:
+            set_property(doc, name, value)
+
+    def set_cluster(self, name, certificate_authority=None, embed_certs=None,
+                    insecure_skip_tls_verify=None, server=None):
+        _check_bool(embed_certs)
+        _check_bool(insecure_skip_tls_verify)
+        if not name:
+            raise kubectl_error('you must specify a non-empty cluster name')
+        if insecure_skip_tls_verify and certificate_authority:
+            raise kubectl_error('you cannot specify a certificate authority and insecure '
+                                'mode at the same time')
+        ca_data = None
+        if embed_certs:
+            if not certificate_authority:
+                raise kubectl_error('you must specify a --certificate-authority to embed')
+            ca_data = read_embedded(certificate_authority, 'certificate-authority')
+
+        with self._editing() as doc:
+            cluster = _writable_entry(doc, 'clusters', name)
+            if server is not None:
+                _assign(cluster, 'server', server)
+                # A new server invalidates any TLS server name override.
+                cluster.pop('tls-server-name', None)
+            if insecure_skip_tls_verify is not None:
+                _assign(cluster, 'insecure-skip-tls-verify', insecure_skip_tls_verify)
+                if insecure_skip_tls_verify:
+                    cluster.pop('certificate-authority', None)
+                    cluster.pop('certificate-authority-data', None)
+            if certificate_authority is not None:
+                if ca_data is not None:
+                    cluster['certificate-authority-data'] = ca_data
+                    cluster.pop('insecure-skip-tls-verify', None)
+                    cluster.pop('certificate-authority', None)
+                else:
+                    ca_path = certificate_authority
+                    if ca_path:
+                        ca_path = os.path.abspath(ca_path)
+                        cluster.pop('insecure-skip-tls-verify', None)
+                        cluster.pop('certificate-authority-data', None)
+                    _assign(cluster, 'certificate-authority', ca_path)
+
+    def set_context(self, name, cluster=None, namespace=None, user=None):
+        if not name:
+            raise kubectl_error('you must specify a non-empty context name')
+        with self._editing() as doc:
+            context = _writable_entry(doc, 'contexts', name)
+            if cluster is not None:
+                _assign(context, 'cluster', cluster)
+            if namespace is not None:
+                _assign(context, 'namespace', namespace)
+            if user is not None:
+                _assign(context, 'user', user)
+
+    def set_credentials(self, name, auth_provider=None, auth_provider_args=None,
+                        client_certificate=None, client_key=None,
+                        embed_certs=None, password=None, token=None,
+                        username=None):
+        _check_bool(embed_certs)
+        if not name:
+            raise kubectl_error('you must specify a non-empty user name')
+        cert_data = key_data = None
+        if embed_certs:
+            if not client_certificate and not client_key:
+                raise kubectl_error('you must specify a --client-certificate or --client-key '
+                                    'to embed')
+            if client_certificate:
+                cert_data = read_embedded(client_certificate, 'client-certificate')
+            if client_key:
+                key_data = read_embedded(client_key, 'client-key')
+
+        with self._editing() as doc:
+            user = _writable_entry(doc, 'users', name)
+            if client_certificate is not None:
+                _set_file_or_data(user, 'client-certificate', client_certificate,
+                                  cert_data)
+            if client_key is not None:
+                _set_file_or_data(user, 'client-key', client_key, key_data)
+
+            set_token = set_basic = False
+            if token is not None:
+                _assign(user, 'token', token)
+                set_token = bool(token)
+            if username is not None:
+                _assign(user, 'username', username)
+                set_basic = set_basic or bool(username)
+            if password is not None:
+                _assign(user, 'password', password)
+                set_basic = set_basic or bool(password)
+
+            if auth_provider is not None:
+                provider = user.get('auth-provider')
+                if not provider or provider.get('name') != auth_provider:
+                    user['auth-provider'] = {'name': auth_provider}
+            if user.get('auth-provider'):
+                provider = user['auth-provider']
+                provider_config = provider.setdefault('config', {})
+                for key, value in (auth_provider_args or {}).items():
+                    provider_config[key] = '%s' % value
+                if not provider_config:
+                    del provider['config']
+
+            # Setting one kind of auth clears out the other.
+            if set_token or set_basic:
+                if not set_token:
+                    user.pop('token', None)
+                if not set_basic:
+                    user.pop('username', None)
+                    user.pop('password', None)
+
+    def unset(self, name):
+        with self._editing() as doc:
+            unset_property(doc, name)
+
+    def use_context(self, name):
+        with self._editing() as doc:
+            if name not in doc['contexts']:
+                raise kubectl_error('no context exists with the name: "%s"' % name)
+            doc['current-context'] = name
+
+    def validate(self):
+        from . import lint
+        if self._transaction is not None:
+            return lint.check(*self._transaction)
+        return lint.check(self.load())
+
+    def view(self, raw=False, cached=True):
+        if self._transaction is not None:
+            loaded, doc = self._transaction
+            return loaded.view(raw=raw, doc=doc)
+        return self.load(cached=cached).view(raw=raw)
+
+
+def _set_file_or_data(user, key, filename, data):
+    """
+    Points ``key`` at ``filename``, or embeds ``data`` in ``key``-data, clearing
+    out whichever of the two wasn't chosen.
+    """
+    if data is not None:
+        user[key + '-data'] = data
+        user.pop(key, None)
+    else:
+        if filename:
+            filename = os.path.abspath(filename)
+            user.pop(key + '-data', None)
+        _assign(user, key, filename)
@@ -0,0 +1,165 @@
+"""
+In-memory overrides of the context to use, like kubectl's ``--context``,
+``--namespace``, ``--cluster``, and ``--user`` flags.
+
+:py:meth:`KubeConfig.use_context <kubeconfig.KubeConfig.use_context>`
+changes the current context for everyone, by rewriting your config. An
+override applies only to the :py:class:`ConfigOverride` it's made with, so
+any number of threads or tasks can each work against a different context
+at once, without writing to your config or waiting on each other:
+
+.. code-block:: py
+
+    prod = conf.with_context('prod')
+    prod.resolve().cluster['server']
+
+    staging = conf.overrides(context='staging', namespace='qa')
+    subprocess.run(['kubectl', '--kubeconfig', staging.kubeconfig_path(), 'get', 'pods'])
+
+Overrides read through the :py:class:`KubeConfig <kubeconfig.KubeConfig>`
+they came from, sharing its cached view and index.
+"""
+import hashlib
+import os
+import threading
+
+from . import embedded
+from . import exceptions
+from . import native
+from .cache import stat_signature
+from .index import ConfigIndex, ResolvedContext
+
+# (backend, sources, overrides) -> (stat signature, path) for the files
+# kubeconfig_path() has written.
+_files = {}
+_files_lock = threading.Lock()
+
+
+class ConfigOverride(object):
+    """
+    A read-only view of a config with a context (and, optionally, its
+    namespace, cluster, or user) pinned in memory. Create these with
+    :py:meth:`KubeConfig.overrides <kubeconfig.KubeConfig.overrides>` or
+    :py:meth:`KubeConfig.with_context <kubeconfig.KubeConfig.with_context>`.
+
+    :param KubeConfig config: The config to read through.
+    :param str context: The context to use. Defaults to the config's
+        current context, as of each call.
+    :param str namespace: The namespace to use in place of the context's.
+    :param str cluster: The cluster to use in place of the context's.
+    :param str user: The user to use in place of the context's.
+    """
+
+    def __init__(self, config, context=None, namespace=None, cluster=None, user=None):
+        self.config = config
+        self.context = context
+        self.namespace = namespace
+        self.cluster = cluster
+        self.user = user
+
+    def __repr__(self):
+        overrides = ['%s=%r' % (name, getattr(self, name))
+                     for name in ('context', 'namespace', 'cluster', 'user')
+                     if getattr(self, name) is not None]
+        return '<ConfigOverride: %s>' % ', '.join(overrides)
+
+    def current_context(self):
+        """
+        :rtype: str or None
+        :return: The context in use: the overridden one, or else the config's
+            current context.
+        """
+        if self.context is not None:
+            return self.context
+        return self.config.current_context()
+
+    def _resolve(self, index):
+        resolved = index.resolve(self.current_context())
+        if resolved is None:
+            return None
+        name, context, cluster, user = resolved
+        if self.namespace is not None:
+            context['namespace'] = self.namespace
+        if self.cluster is not None:
+            context['cluster'] = self.cluster
+            cluster = index.get_cluster(self.cluster)
+        if self.user is not None:
+            context['user'] = self.user
+            user = index.get_user(self.user)
+        return ResolvedContext(name, context, cluster, user)
+
+    def resolve(self):
+        """
+        :rtype: ResolvedContext or None
+        :return: The context, with the overrides applied, joined with the
+            cluster and user it then refers to, or ``None`` if there's no
+            such context.
+        """
+        return self._resolve(self.config.index())
+
+    def resolve_credentials(self, disk_cache=False):
+        """
+        As :py:meth:`KubeConfig.resolve_credentials <kubeconfig.KubeConfig.resolve_credentials>`,
+        for the overridden context and user.
+
+        :rtype: Credentials
+        """
+        resolved = self.resolve()
+        if resolved is None:
+            raise exceptions.KubeConfigError(
+                "No such context: %s" % self.current_context())
+        return self.config._resolve_credentials(resolved, disk_cache)
+
+    def export(self, flatten=True):
+        """
+        As :py:meth:`KubeConfig.export <kubeconfig.KubeConfig.export>`, with
+        the overrides applied.
+
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            when there is no such context, or a file to be embedded can't be
+            read.
+        :rtype: dict
+        """
+        resolved = self._resolve(ConfigIndex(self.config.view(raw=True)))
+        if resolved is None:
+            raise native.kubectl_error('cannot locate context %s' % self.current_context())
+        return native.minify_resolved(resolved, flatten=flatten)
+
+    def kubeconfig_path(self):
+        """
+        Writes out the :py:meth:`export`, for anything that needs a
+        kubeconfig file (kubectl's ``--kubeconfig``, or ``KUBECONFIG``).
+        Certificate and key files are referred to by their absolute paths
+        rather than embedded, so the file keeps up with their rotation.
+
+        The file is private to you, in a per-user directory under the
+        system's temporary directory, and is named after its contents, so
+        every override that comes to the same config shares one file. It's
+        written once, and only again when your config's files change.
+        Nothing is ever written to your config itself.
+
+        :raise: :py:exc:`KubectlCommandError <kubeconfig.exceptions.KubectlCommandError>`
+            as with :py:meth:`export`.
+        :rtype: str
+        :return: The file's path.
+        """
+        sources = native.loading_precedence(self.config.path)
+        key = (self.config.backend, tuple(os.path.abspath(source) for source in sources),
+               self.context, self.namespace, self.cluster, self.user)
+        signature = stat_signature(sources)
+        with _files_lock:
+            entry = _files.get(key)
+        if entry is not None and entry[0] == signature and os.path.exists(entry[1]):
+            return entry[1]
+
+        # Imported here, as it's only needed when a file has to be written.
+        import json
+
+        config = self.export(flatten=False)
+        digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8')).hexdigest()
+        path = os.path.join(embedded.temp_dir(), digest + '.kubeconfig')
+        if not os.path.exists(path):
+            native.write_file(path, native.from_v1(config), tracer=self.config.tracer)
+        with _files_lock:
+            _files[key] = (signature, path)
+        return path
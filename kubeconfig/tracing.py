@@ -0,0 +1,169 @@
+"""
+Hooks for seeing where time goes: kubectl invocations, config parsing and
+writing, and view cache hits and misses.
+
+Pass a :py:class:`Tracer` to :py:class:`KubeConfig <kubeconfig.KubeConfig>`
+to instrument just that instance, or install one for everything with
+:py:func:`set_tracer`:
+
+.. code-block:: py
+
+    import logging
+
+    from kubeconfig import tracing
+
+    logging.basicConfig(level=logging.DEBUG)
+    tracing.set_tracer(tracing.LoggingTracer())
+
+To feed your own metrics or tracing system, subclass :py:class:`Tracer` and
+override the ``on_*`` methods you're interested in. The default tracer does
+nothing, and costs next to nothing.
+"""
+
+#: Flags whose values are secret.
+SECRET_FLAGS = ('--token', '--password')
+
+#: Fields whose values are secret (or just very large), when they're the
+#: last part of a ``kubectl config set`` property path.
+SECRET_FIELDS = ('token', 'password', 'client-key-data', 'client-certificate-data',
+                 'certificate-authority-data')
+
+REDACTED = 'REDACTED'
+
+
+def redact_argv(argv):
+    """
+    :param list argv: A kubectl command line.
+    :rtype: list
+    :return: A copy of ``argv`` with secrets replaced by ``REDACTED``: the
+        values of ``--token`` and ``--password``, of every
+        ``--auth-provider-arg``, and of ``config set`` for secret fields.
+    """
+    redacted = []
+    redact_next = False
+    for index, arg in enumerate(argv):
+        if redact_next:
+            redacted.append(REDACTED)
+            redact_next = False
+            continue
+        flag, sep, value = arg.partition('=')
+        if flag in SECRET_FLAGS:
+            if sep:
+                arg = flag + '=' + REDACTED
+            else:
+                redact_next = True
+        elif flag == '--auth-provider-arg' and sep:
+            key = value.partition('=')[0]
+            arg = '%s=%s=%s' % (flag, key, REDACTED)
+        elif index >= 2 and argv[index - 2:index] == ['config', 'set'] \
+                and arg.rsplit('.', 1)[-1] in SECRET_FIELDS:
+            redact_next = True
+        redacted.append(arg)
+    return redacted
+
+
+class Tracer(object):
+    """
+    The tracer interface, which also serves as the do-nothing default.
+    Subclasses should set :py:attr:`enabled` to ``True``; events are only
+    passed on to enabled tracers.
+    """
+
+    #: If ``False``, no events are sent to this tracer.
+    enabled = False
+
+    def on_kubectl(self, argv, duration, returncode, output_size):
+        """
+        Called after every kubectl invocation.
+
+        :param list argv: The command line, with secrets redacted (see
+            :py:func:`redact_argv`).
+        :param float duration: Wall time, in seconds.
+        :param int returncode: kubectl's exit code.
+        :param int output_size: The length of kubectl's output, in characters.
+        """
+
+    def on_parse(self, source, duration, size):
+        """
+        Called after a config is parsed.
+
+        :param str source: The file that was parsed, or ``'kubectl'`` for
+            the output of ``kubectl config view``.
+        :param float duration: Wall time, in seconds.
+        :param int size: The size of what was parsed.
+        """
+
+    def on_write(self, filename, duration, size):
+        """
+        Called after a config file is written.
+
+        :param str filename: The file that was written.
+        :param float duration: Wall time, in seconds.
+        :param int size: The length of what was written, in characters.
+        """
+
+    def on_cache(self, name, hit):
+        """
+        Called on every cache lookup.
+
+        :param str name: Which cache was consulted, such as ``'view'``.
+        :param bool hit: Whether the lookup was a hit.
+        """
+
+
+class LoggingTracer(Tracer):
+    """
+    Logs every event.
+
+    :param logger: The :py:class:`logging.Logger` to log to. Defaults to the
+        ``kubeconfig`` logger.
+    :param int level: The level to log at. Defaults to ``DEBUG``.
+    """
+
+    enabled = True
+
+    def __init__(self, logger=None, level=None):
+        # Imported here, since nothing else needs it.
+        import logging
+
+        self.logger = logger or logging.getLogger('kubeconfig')
+        self.level = logging.DEBUG if level is None else level
+
+    def on_kubectl(self, argv, duration, returncode, output_size):
+        self.logger.log(self.level, "kubectl: %s exited %d in %.1fms (%d chars of output)",
+                        ' '.join(argv), returncode, duration * 1000, output_size)
+
+    def on_parse(self, source, duration, size):
+        self.logger.log(self.level, "parse: %s (%d bytes) in %.1fms",
+                        source, size, duration * 1000)
+
+    def on_write(self, filename, duration, size):
+        self.logger.log(self.level, "write: %s (%d chars) in %.1fms",
+                        filename, size, duration * 1000)
+
+    def on_cache(self, name, hit):
+        self.logger.log(self.level, "cache: %s %s", name, 'hit' if hit else 'miss')
+
+
+_tracer = Tracer()
+
+
+def set_tracer(tracer):
+    """
+    Installs ``tracer`` for every :py:class:`KubeConfig
+    <kubeconfig.KubeConfig>` that wasn't given one of its own.
+
+    :param Tracer tracer: The tracer to install, or ``None`` to go back to
+        the do-nothing default.
+    """
+    global _tracer
+    _tracer = tracer if tracer is not None else Tracer()
+
+
+def get_tracer(tracer=None):
+    """
+    :param Tracer tracer: A per-instance tracer, if there is one.
+    :rtype: Tracer
+    :return: ``tracer`` if given, or else the globally installed tracer.
+    """
+    return tracer if tracer is not None else _tracer
@@ -0,0 +1,333 @@
+"""
+Watches the files that make up your config, and tells you what changed.
+
+.. code-block:: py
+
+    import kubeconfig
+
+    def on_change(events):
+        for event in events:
+            if event.section == 'current-context':
+                print('Switched from', event.old, 'to', event.new)
+
+    conf = kubeconfig.KubeConfig()
+    with conf.watch(on_change):
+        serve_forever()
+
+On Linux, changes are picked up through inotify as soon as they happen.
+Elsewhere, or when inotify isn't usable, the files are polled. Either way,
+bursts of changes (such as kubectl's write of a file followed by its lock
+file's removal) are collected into a single notification, and only the
+files that actually changed are parsed again.
+"""
+import collections
+import ctypes
+import ctypes.util
+import logging
+import os
+import select
+import struct
+import sys
+import threading
+
+from . import exceptions
+from . import native
+from .cache import stat_signature
+
+#: One difference between two configs.
+#:
+#: For clusters, contexts, users, and extensions, ``section`` is the
+#: section's name (``'clusters'``, etc.) and ``name`` the entry's. ``kind``
+#: is ``'added'`` or ``'removed'``, with ``old`` or ``new`` holding the
+#: entry's body, or ``'changed'``, with ``field`` naming the body's key that
+#: changed (``'server'``, say) and ``old`` and ``new`` its values (``None``
+#: if missing). An extension that isn't a mapping is reported as a whole,
+#: with ``field`` set to ``None``.
+#:
+#: For ``'current-context'``, ``kind`` is ``'changed'`` and ``old`` and
+#: ``new`` are the names (``''`` if unset). For ``'preferences'``, ``kind``
+#: is ``'changed'``, ``field`` names the preference and ``old`` and ``new``
+#: are its values.
+ChangeEvent = collections.namedtuple(
+    'ChangeEvent', ['kind', 'section', 'name', 'field', 'old', 'new'])
+
+
+def _diff_fields(section, name, old, new):
+    for field in sorted(set(old) | set(new), key=str):
+        if old.get(field) != new.get(field):
+            yield ChangeEvent('changed', section, name, field,
+                              old.get(field), new.get(field))
+
+
+def diff_docs(old, new):
+    """
+    :param dict old: A merged config in internal form.
+    :param dict new: Another one.
+    :rtype: list
+    :return: The :py:class:`ChangeEvent`\\ s that turn ``old`` into ``new``.
+    """
+    events = []
+    for section, _ in native.NAMED_SECTIONS:
+        before, after = old[section], new[section]
+        for name in sorted(set(before) | set(after)):
+            if name not in after:
+                events.append(ChangeEvent('removed', section, name, None, before[name], None))
+            elif name not in before:
+                events.append(ChangeEvent('added', section, name, None, None, after[name]))
+            elif before[name] is not after[name] and before[name] != after[name]:
+                if isinstance(before[name], dict) and isinstance(after[name], dict):
+                    events.extend(_diff_fields(section, name, before[name], after[name]))
+                else:
+                    events.append(ChangeEvent('changed', section, name, None,
+                                              before[name], after[name]))
+    if old['current-context'] != new['current-context']:
+        events.append(ChangeEvent('changed', 'current-context', None, None,
+                                  old['current-context'], new['current-context']))
+    events.extend(_diff_fields('preferences', None, old['preferences'], new['preferences']))
+    return events
+
+
+class _PollingSource(object):
+    """
+    Notices changes by comparing the files' stat signatures.
+    """
+
+    def __init__(self, filenames, stopped):
+        self.filenames = filenames
+        self.stopped = stopped
+        self.signature = stat_signature(filenames)
+
+    def wait(self, timeout):
+        """
+        :rtype: bool
+        :return: Whether anything changed within ``timeout`` seconds.
+        """
+        if self.stopped.wait(timeout):
+            return False
+        signature = stat_signature(self.filenames)
+        changed, self.signature = signature != self.signature, signature
+        return changed
+
+    def close(self):
+        pass
+
+
+# From <sys/inotify.h>.
+_IN_MODIFY = 0x002
+_IN_ATTRIB = 0x004
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_FROM = 0x040
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_MASK = (_IN_MODIFY | _IN_ATTRIB | _IN_CLOSE_WRITE | _IN_MOVED_FROM | _IN_MOVED_TO |
+            _IN_CREATE | _IN_DELETE)
+_EVENT_HEADER = struct.Struct('iIII')
+
+
+class _InotifySource(object):
+    """
+    Notices changes through inotify. Each file's directory is watched rather
+    than the file itself, so that files which are replaced (by an atomic
+    rename) or created later are noticed too. For a symlink, the directory
+    of the file it points to is watched as well, since that's where writes
+    go.
+
+    :raise: OSError when inotify isn't available, or a directory can't be
+        watched.
+    """
+
+    def __init__(self, filenames, stopped):
+        if not sys.platform.startswith('linux'):
+            raise OSError('inotify is only available on Linux')
+        libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.stopped = stopped
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+        self.names = collections.defaultdict(set)
+        try:
+            for filename in filenames:
+                for path in set([os.path.abspath(filename), os.path.realpath(filename)]):
+                    dirname, basename = os.path.split(path)
+                    wd = libc.inotify_add_watch(self.fd, os.fsencode(dirname), _IN_MASK)
+                    if wd < 0:
+                        errno = ctypes.get_errno()
+                        raise OSError(errno, os.strerror(errno), dirname)
+                    self.names[wd].add(os.fsencode(basename))
+        except BaseException:
+            os.close(self.fd)
+            raise
+
+    def wait(self, timeout):
+        """
+        :rtype: bool
+        :return: Whether any of the files changed within ``timeout`` seconds.
+        """
+        if self.stopped.is_set():
+            return False
+        readable, _, _ = select.select([self.fd], [], [], timeout)
+        if not readable:
+            return False
+        changed = False
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return changed
+            offset = 0
+            while offset < len(data):
+                wd, _, _, length = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + length].rstrip(b'\0')
+                offset += length
+                if name in self.names.get(wd, ()):
+                    changed = True
+
+    def close(self):
+        os.close(self.fd)
+
+
+class ConfigWatcher(object):
+    """
+    Watches the files in a config's loading precedence (see
+    :py:func:`loading_precedence <kubeconfig.native.loading_precedence>`),
+    and calls each subscriber with a list of :py:class:`ChangeEvent`\\ s
+    whenever the merged config changes.
+
+    Subscribers are called from the watcher's own thread. Use
+    :py:meth:`KubeConfig.watch <kubeconfig.KubeConfig.watch>` to create one.
+
+    :param str path: The explicit kubeconfig path, if any. The ``KUBECONFIG``
+        environment variable is read once, when the watcher is created.
+    :param float interval: How often, in seconds, to check for changes when
+        polling, and how long :py:meth:`stop` may take to be noticed.
+    :param float debounce: How long, in seconds, the files must go unchanged
+        before they're reloaded.
+    :param bool inotify: Whether to try inotify before falling back to
+        polling. Defaults to ``True``.
+    :param Tracer tracer: See :py:mod:`kubeconfig.tracing`.
+    """
+
+    def __init__(self, path=None, interval=1.0, debounce=0.1, inotify=True, tracer=None):
+        self.path = path
+        self.interval = interval
+        self.debounce = debounce
+        self.inotify = inotify
+        self.tracer = tracer
+        self.filenames = native.loading_precedence(path)
+        self._subscribers = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._signature = stat_signature(self.filenames)
+        self._docs = [self._load(filename) for filename in self.filenames]
+        self._merged, _ = native.merge(zip(self.filenames, self._docs))
+
+    def _load(self, filename, previous=None):
+        try:
+            return native.load_file(filename, tracer=self.tracer)
+        except exceptions.KubectlCommandError:
+            # Most likely caught part-way through being written; the rest of
+            # the write will bring us back.
+            return previous
+
+    @property
+    def config(self):
+        """
+        The merged config as of the last reload, in internal form (clusters,
+        contexts, users, and extensions keyed by name). It must not be
+        changed.
+        """
+        return self._merged
+
+    def subscribe(self, callback):
+        """
+        :param callable callback: Called with a list of
+            :py:class:`ChangeEvent`\\ s after each change.
+        """
+        self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        self._subscribers.remove(callback)
+
+    def poll(self):
+        """
+        Reloads whichever files have changed since they were last loaded.
+        This is what the watcher's thread calls, but it may also be called
+        directly, with or without the thread running.
+
+        :rtype: list
+        :return: The :py:class:`ChangeEvent`\\ s, if any. Subscribers are not
+            called.
+        """
+        with self._lock:
+            signature = stat_signature(self.filenames)
+            if signature == self._signature:
+                return []
+            docs = list(self._docs)
+            for index, (filename, file_signature) in enumerate(signature):
+                if file_signature != self._signature[index][1]:
+                    docs[index] = self._load(filename, previous=docs[index])
+            self._signature, self._docs = signature, docs
+            merged, _ = native.merge(zip(self.filenames, docs))
+            events = diff_docs(self._merged, merged)
+            self._merged = merged
+            return events
+
+    def _notify(self, events):
+        for callback in list(self._subscribers):
+            try:
+                callback(events)
+            except Exception:
+                logging.getLogger('kubeconfig').exception(
+                    "Error in kubeconfig watch subscriber %r", callback)
+
+    def _source(self):
+        if self.inotify:
+            try:
+                return _InotifySource(self.filenames, self._stopped)
+            except OSError:
+                pass
+        return _PollingSource(self.filenames, self._stopped)
+
+    def _run(self, source):
+        try:
+            while not self._stopped.is_set():
+                if not source.wait(self.interval):
+                    continue
+                while source.wait(self.debounce):
+                    pass
+                events = self.poll()
+                if events:
+                    self._notify(events)
+        finally:
+            source.close()
+
+    def start(self):
+        """
+        Starts watching in a background (daemon) thread.
+
+        :return: This watcher, for convenience.
+        """
+        if self._thread is None:
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, args=(self._source(),),
+                                            name='kubeconfig-watch', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """
+        Stops the background thread, waiting for it to finish.
+        """
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
@@ -0,0 +1,239 @@
+import asyncio
+import os
+import stat
+import time
+
+import pytest
+
+import kubeconfig
+from kubeconfig import locking
+
+aio = pytest.importorskip('kubeconfig.aio', reason='needs Python 3.7 or later')
+
+
+def _run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.fixture()
+def slow_kubectl(tmpdir, monkeypatch):
+    """
+    Puts a kubectl on the path that records its pid and then hangs, for
+    checking that abandoned calls don't leave processes behind.
+    """
+    pid_file = str(tmpdir.join('pid'))
+    script = str(tmpdir.join('kubectl'))
+    with open(script, 'w') as fobj:
+        fobj.write('#!/bin/sh\necho $$ > %s\nexec sleep 30\n' % pid_file)
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', str(tmpdir) + os.pathsep + os.environ['PATH'])
+    return pid_file
+
+
+def _assert_reaped(pid_file):
+    for _ in range(50):
+        if os.path.exists(pid_file):
+            break
+        time.sleep(0.01)
+    with open(pid_file) as fobj:
+        pid = int(fobj.read())
+    with pytest.raises(OSError):
+        os.kill(pid, 0)
+
+
+def test_view(sample_path):
+    conf = aio.AsyncKubeConfig(sample_path('simple-complete.config'), backend='native')
+    config = _run(conf.view())
+    assert config['contexts'][0]['name'] == 'test-context'
+    assert _run(conf.current_context()) == 'test-context'
+    assert conf.cache_info() == (1, 1)
+
+
+def test_mutations(copy_sample):
+    path = copy_sample('minimal.config')
+    conf = aio.AsyncKubeConfig(path, backend='native', max_concurrency=2)
+
+    async def provision():
+        await asyncio.gather(*[
+            conf.set_cluster('cluster-%d' % index, server='https://%d' % index)
+            for index in range(5)])
+        await conf.set_context('ctx', cluster='cluster-0')
+        await conf.use_context('ctx')
+        return await conf.view()
+
+    config = _run(provision())
+    assert len(config['clusters']) == 5
+    assert config['current-context'] == 'ctx'
+
+
+def test_errors(copy_sample):
+    conf = aio.AsyncKubeConfig(copy_sample('minimal.config'), backend='native')
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        _run(conf.use_context('invalid'))
+
+
+def test_batch(copy_sample):
+    path = copy_sample('minimal.config')
+    conf = aio.AsyncKubeConfig(path)
+
+    async def provision():
+        async with conf.batch():
+            await conf.set_cluster('c', server='https://c')
+            await conf.set_context('ctx', cluster='c')
+            await conf.use_context('ctx')
+            assert kubeconfig.KubeConfig(path, backend='native').current_context() is None
+
+    _run(provision())
+    assert kubeconfig.KubeConfig(path, backend='native').current_context() == 'ctx'
+
+
+def test_batch_is_per_task(copy_sample):
+    path = copy_sample('minimal.config')
+    conf = aio.AsyncKubeConfig(path, backend='native')
+
+    async def scenario():
+        opened = asyncio.Event()
+
+        async def other():
+            await opened.wait()
+            # Doesn't see (or join) the other task's batch...
+            assert await conf.get('clusters.batched.server') is None
+            # ...and waits for it to finish before changing anything.
+            await conf.set_context('other-task', cluster='c')
+
+        task = asyncio.ensure_future(other())
+        with pytest.raises(RuntimeError):
+            async with conf.batch():
+                await conf.set_cluster('batched', server='https://batched')
+                opened.set()
+                await asyncio.sleep(0.2)
+                raise RuntimeError('rolled back')
+        await task
+
+    _run(scenario())
+    view = kubeconfig.KubeConfig(path, backend='native').view()
+    assert [c['name'] for c in view['contexts']] == ['other-task']
+    assert view['clusters'] == []
+
+
+def test_batch_joined_by_subtasks(copy_sample):
+    path = copy_sample('minimal.config')
+    conf = aio.AsyncKubeConfig(path, backend='native')
+
+    async def provision():
+        async with conf.batch():
+            await asyncio.gather(*[conf.set_cluster('c%d' % i) for i in range(2)])
+            # Nested batches join the outer one.
+            async with conf.batch():
+                await conf.set_cluster('c2')
+            assert kubeconfig.KubeConfig(path, backend='native').view()['clusters'] == []
+
+    _run(provision())
+    view = kubeconfig.KubeConfig(path, backend='native').view()
+    assert [c['name'] for c in view['clusters']] == ['c0', 'c1', 'c2']
+
+
+def test_reads(copy_sample):
+    conf = aio.AsyncKubeConfig(copy_sample('simple-complete.config'), backend='native')
+
+    async def read():
+        assert await conf.get('contexts.test-context.cluster') == 'test-cluster'
+        assert await conf.get_many(['current-context', 'clusters.missing'], default=1) == \
+            {'current-context': 'test-context', 'clusters.missing': 1}
+        assert (await conf.get_context('test-context'))['user'] == 'test-user'
+        assert (await conf.get_cluster('test-cluster'))['server'] == 'https://192.168.1.100'
+        assert (await conf.get_user('missing')) is None
+        resolved = await conf.resolve()
+        assert (resolved.name, resolved.user) == ('test-context', await conf.get_user('test-user'))
+        assert await conf.index() is await conf.index()
+        assert [f.code for f in await conf.validate()] == []
+
+    _run(read())
+
+
+def test_batch_timeout_releases_lock(copy_sample):
+    path = copy_sample('minimal.config')
+    conf = aio.AsyncKubeConfig(path, backend='native')
+    other = kubeconfig.KubeConfig(path, backend='native')
+
+    async def abandon():
+        # Another writer holds the lock for longer than we're prepared to wait.
+        with other.batch():
+            with pytest.raises(asyncio.TimeoutError):
+                async with conf.batch(timeout=0.1):
+                    pass
+            other.set_cluster('other')
+
+    _run(abandon())
+    # The abandoned batch got the lock once the other was done, and let it go.
+    _run(conf.set_cluster('c'))
+    assert [c['name'] for c in other.view()['clusters']] == ['c', 'other']
+
+
+def test_kubectl_writes_locked(tmpdir, monkeypatch):
+    log = str(tmpdir.join('log'))
+    script = str(tmpdir.join('kubectl'))
+    with open(script, 'w') as fobj:
+        fobj.write('#!/bin/sh\necho "$@" >> %s\n' % log)
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', str(tmpdir) + os.pathsep + os.environ['PATH'])
+    path = str(tmpdir.join('config'))
+    conf = aio.AsyncKubeConfig(path)
+
+    async def write():
+        with locking.locked([path]):
+            task = asyncio.ensure_future(conf.use_context('ctx'))
+            await asyncio.sleep(0.2)
+            # Waiting on the lock, without blocking the loop.
+            assert not os.path.exists(log)
+        await task
+
+    _run(write())
+    with open(log) as fobj:
+        assert 'use-context ctx' in fobj.read()
+
+
+def test_kubectl_lock_wait_times_out(tmpdir):
+    path = str(tmpdir.join('config'))
+    conf = aio.AsyncKubeConfig(path, timeout=0.1)
+
+    async def write():
+        with locking.locked([path]):
+            with pytest.raises(asyncio.TimeoutError):
+                await conf.use_context('ctx')
+
+    _run(write())
+    # The abandoned wait let the lock go again once it got it.
+    with locking.locked([path]):
+        pass
+
+
+def test_timeout_kills_kubectl(slow_kubectl):
+    conf = aio.AsyncKubeConfig('unused.config', timeout=0.5)
+    with pytest.raises(asyncio.TimeoutError):
+        _run(conf.use_context('anything'))
+    _assert_reaped(slow_kubectl)
+
+
+def test_cancel_kills_kubectl(slow_kubectl):
+    conf = aio.AsyncKubeConfig('unused.config')
+
+    async def cancel():
+        task = asyncio.ensure_future(conf.view())
+        await asyncio.sleep(0.5)
+        task.cancel()
+        await task
+
+    with pytest.raises(asyncio.CancelledError):
+        _run(cancel())
+    _assert_reaped(slow_kubectl)
+
+
+def test_merge(copy_sample):
+    path = copy_sample('minimal.config')
+    conf = aio.AsyncKubeConfig(path)
+    renames = _run(conf.merge({'clusters': [{'name': 'c', 'cluster': {'server': 'https://c'}}]},
+                              strategy='rename'))
+    assert renames == {}
+    assert kubeconfig.KubeConfig(path, backend='native').get_cluster('c') == \
+        {'server': 'https://c'}
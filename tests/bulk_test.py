@@ -0,0 +1,74 @@
+import os
+import shutil
+
+import pytest
+
+import kubeconfig
+from kubeconfig import bulk
+
+
+@pytest.fixture()
+def tenants(tmpdir, sample_path):
+    paths = []
+    for index in range(6):
+        path = str(tmpdir.mkdir('tenant-%d' % index).join('config'))
+        shutil.copy(sample_path('simple-complete.config'), path)
+        paths.append(path)
+    return str(tmpdir), paths
+
+
+def _server(conf):
+    return conf.view()['clusters'][0]['cluster']['server']
+
+
+def test_expand_paths(tenants):
+    root, paths = tenants
+    pattern = os.path.join(root, '*', 'config')
+    assert bulk.expand_paths(pattern) == paths
+    # Duplicates are dropped, plain paths are kept as-is.
+    assert bulk.expand_paths([paths[1], pattern, 'missing']) == \
+        [paths[1], paths[0]] + paths[2:] + ['missing']
+
+
+@pytest.mark.parametrize('executor', ['thread', 'process'])
+def test_apply(tenants, executor):
+    root, paths = tenants
+    fleet = bulk.KubeConfigFleet(os.path.join(root, '*', 'config'), executor=executor,
+                                 max_workers=3)
+    assert len(fleet) == 6
+    results = fleet.apply('set_cluster', 'test-cluster', server='https://new')
+    assert sorted(result.path for result in results) == paths
+    assert all(result.error is None for result in results)
+    for result in fleet.map(_server):
+        assert result.value == 'https://new'
+
+
+def test_apply_without_iterating(tenants):
+    _, paths = tenants
+    fleet = bulk.KubeConfigFleet(paths)
+    fleet.apply('set_cluster', 'test-cluster', server='https://new')
+    assert all(_server(kubeconfig.KubeConfig(path, backend='native')) == 'https://new'
+               for path in paths)
+
+
+def test_errors_are_reported_per_file(tenants):
+    _, paths = tenants
+    os.remove(paths[0])
+    fleet = bulk.KubeConfigFleet(paths)
+    results = {result.path: result for result in fleet.apply('delete_cluster', 'test-cluster')}
+    assert isinstance(results[paths[0]].error, kubeconfig.exceptions.KubectlCommandError)
+    assert all(results[path].error is None for path in paths[1:])
+
+
+def test_view(tenants):
+    _, paths = tenants
+    views = list(bulk.KubeConfigFleet(paths).view())
+    assert all(result.value['current-context'] == 'test-context' for result in views)
+
+
+def test_invalid_method(tenants):
+    _, paths = tenants
+    with pytest.raises(AttributeError):
+        bulk.KubeConfigFleet(paths).apply('_invalidate_cache')
+    with pytest.raises(ValueError):
+        bulk.KubeConfigFleet(paths, executor='invalid')
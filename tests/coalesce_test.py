@@ -0,0 +1,152 @@
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import pytest
+import yaml
+
+import kubeconfig
+from kubeconfig import native
+
+THIS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+
+@pytest.fixture()
+def path(tmpdir, sample_path):
+    dest = str(tmpdir.join('config'))
+    shutil.copy(sample_path('simple-complete.config'), dest)
+    return dest
+
+
+@pytest.fixture()
+def count_writes(monkeypatch):
+    written = []
+    write_file = native.write_file
+
+    def _write_file(filename, doc, **kwargs):
+        result = write_file(filename, doc, **kwargs)
+        written.append((filename, kwargs.get('fsync')))
+        return result
+    monkeypatch.setattr(native, 'write_file', _write_file)
+    return written
+
+
+def _coalesced(path, window=60):
+    return kubeconfig.KubeConfig(path, backend='native', write_policy='coalesce',
+                                 write_window=window)
+
+
+def _read(path):
+    with open(path) as fobj:
+        return yaml.safe_load(fobj)
+
+
+def test_unknown_write_policy():
+    with pytest.raises(ValueError):
+        kubeconfig.KubeConfig(write_policy='eventually')
+
+
+def test_burst_written_once(path, count_writes):
+    conf = _coalesced(path)
+    for i in range(20):
+        conf.set_context('ctx-%d' % i, cluster='test-cluster', user='test-user')
+    conf.set('contexts.ctx-0.namespace', 'ns')
+    conf.use_context('ctx-0')
+    conf.set_credentials('test-user', token='secret')
+    assert count_writes == []
+    assert [c['name'] for c in _read(path)['contexts']] == ['test-context']
+
+    # Reads see the changes straight away.
+    assert conf.current_context() == 'ctx-0'
+    assert conf.get('contexts.ctx-0.namespace') == 'ns'
+    assert len(conf.view()['contexts']) == 21
+    assert conf.view()['users'][0]['user']['token'] == 'REDACTED'
+    assert conf.view(raw=True)['users'][0]['user']['token'] == 'secret'
+    assert conf.resolve().context['namespace'] == 'ns'
+
+    conf.flush()
+    assert count_writes == [(path, True)]
+    assert len(_read(path)['contexts']) == 21
+    assert _read(path)['current-context'] == 'ctx-0'
+    conf.flush()
+    assert count_writes == [(path, True)]
+
+
+def test_written_once_window_is_up(path, count_writes):
+    conf = _coalesced(path, window=0.05)
+    conf.set_cluster('a', server='https://a')
+    conf.set_cluster('b', server='https://b')
+    for _ in range(100):
+        if count_writes:
+            break
+        time.sleep(0.01)
+    assert count_writes == [(path, True)]
+    assert [c['name'] for c in _read(path)['clusters']] == ['a', 'b', 'test-cluster']
+
+
+def test_invalid_change_not_kept(path, count_writes):
+    conf = _coalesced(path)
+    conf.set_cluster('a', server='https://a')
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        conf.delete_context('missing')
+    conf.flush()
+    assert count_writes == [(path, True)]
+    assert [c['name'] for c in _read(path)['clusters']] == ['a', 'test-cluster']
+
+
+def test_other_writers_kept(path):
+    conf = _coalesced(path)
+    conf.set_cluster('mine', server='https://mine')
+    kubeconfig.KubeConfig(path, backend='native').set_cluster('theirs', server='https://theirs')
+    conf.flush()
+    assert [c['name'] for c in _read(path)['clusters']] == ['mine', 'test-cluster', 'theirs']
+
+
+def test_change_no_longer_applies(path, count_writes):
+    conf = _coalesced(path)
+    conf.set_cluster('mine', server='https://mine')
+    conf.delete_context('test-context')
+    kubeconfig.KubeConfig(path, backend='native').delete_context('test-context')
+    del count_writes[:]
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        conf.flush()
+    assert count_writes == []
+    assert [c['name'] for c in conf.view()['clusters']] == ['test-cluster']
+
+
+def test_scheduled_write_failure_raised_later(path):
+    conf = _coalesced(path, window=0.05)
+    conf.delete_cluster('test-cluster')
+    kubeconfig.KubeConfig(path, backend='native').delete_cluster('test-cluster')
+    time.sleep(0.2)
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        conf.set_cluster('a')
+    # Raised once only.
+    conf.set_cluster('a')
+    conf.flush()
+    assert [c['name'] for c in _read(path)['clusters']] == ['a']
+
+
+def test_batch_writes_pending_first(path, count_writes):
+    conf = _coalesced(path)
+    conf.set_cluster('a')
+    with conf.batch():
+        assert count_writes == [(path, True)]
+        conf.set_cluster('b')
+    assert count_writes == [(path, True), (path, False)]
+    assert [c['name'] for c in _read(path)['clusters']] == ['a', 'b', 'test-cluster']
+
+
+def test_written_at_exit(path):
+    script = '\n'.join([
+        'import sys',
+        'sys.path.insert(0, %r)' % os.path.dirname(THIS_PATH),
+        'import kubeconfig',
+        'conf = kubeconfig.KubeConfig(%r, write_policy="coalesce", write_window=0.2)' % path,
+        'conf.use_context("test-context")',
+        'conf.set_cluster("late", server="https://late")',
+    ])
+    subprocess.check_call([sys.executable, '-c', script])
+    assert [c['name'] for c in _read(path)['clusters']] == ['late', 'test-cluster']
@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+SAMPLES_PATH = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'samples')
+
+
+def _sample(sample_name):
+    return os.path.join(SAMPLES_PATH, sample_name)
+
+
+@pytest.fixture()
+def sample_path():
+    """
+    :return: A function that returns the path of one of the sample configs in
+        ``samples``.
+    """
+    return _sample
+
+
+@pytest.fixture()
+def copy_sample(tmpdir):
+    """
+    :return: A function that copies a sample config into ``tmpdir``, and
+        returns the copy's path.
+    """
+    def _copy(sample_name):
+        dest = str(tmpdir.join(sample_name))
+        shutil.copy(_sample(sample_name), dest)
+        return dest
+    return _copy
+
+
+@pytest.fixture(autouse=True)
+def private_dirs(tmpdir_factory, monkeypatch):
+    """
+    Keeps lock files, cached credentials, and temporary files out of your
+    own cache and temporary directories (and out of each test's ``tmpdir``).
+    """
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir_factory.mktemp('cache')))
+    tmp = str(tmpdir_factory.mktemp('tmp'))
+    monkeypatch.setenv('TMPDIR', tmp)
+    monkeypatch.setattr(tempfile, 'tempdir', tmp)
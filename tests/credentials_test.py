@@ -0,0 +1,233 @@
+import base64
+import json
+import os
+import stat
+import sys
+import threading
+
+import pytest
+import yaml
+
+import kubeconfig
+from kubeconfig import credentials
+from kubeconfig.credentials import Credentials
+
+API_VERSION = 'client.authentication.k8s.io/v1beta1'
+
+# Records each run, along with what it was given, then prints the
+# credential named by its first argument.
+PLUGIN = '''#!%(python)s
+import json, os, sys, time
+with open(%(runs)r, 'a') as fobj:
+    fobj.write(json.dumps({'args': sys.argv[1:], 'env': os.environ.get('PLUGIN_ENV'),
+                           'info': json.loads(os.environ['KUBERNETES_EXEC_INFO'])}) + '\\n')
+time.sleep(float(os.environ.get('PLUGIN_DELAY', '0')))
+if sys.argv[1] == 'fail':
+    sys.stderr.write('no credentials for you\\n')
+    sys.exit(3)
+status = {
+    'token': {'token': 'secret'},
+    'expired': {'token': 'stale', 'expirationTimestamp': '2000-01-01T00:00:00Z'},
+    'expiring': {'token': 'fresh', 'expirationTimestamp': '2999-01-01T00:00:00+01:00'},
+    'empty': {},
+}[sys.argv[1]]
+print(json.dumps({'apiVersion': %(api_version)r, 'kind': 'ExecCredential', 'status': status}))
+'''
+
+
+@pytest.fixture(autouse=True)
+def credential_cache(monkeypatch):
+    cache = credentials.CredentialCache()
+    monkeypatch.setattr(credentials, 'credential_cache', cache)
+    return cache
+
+
+@pytest.fixture()
+def plugin(tmpdir):
+    """
+    Writes a config with a user per plugin mode.
+
+    :return: ``(conf, runs)``: a native :py:class:`KubeConfig` for it, and a
+        function returning the plugin's runs so far.
+    """
+    runs = str(tmpdir.join('runs'))
+    script = str(tmpdir.join('plugin'))
+    with open(script, 'w') as fobj:
+        fobj.write(PLUGIN % {'python': sys.executable, 'runs': runs, 'api_version': API_VERSION})
+    os.chmod(script, 0o755)
+
+    modes = ['token', 'expired', 'expiring', 'empty', 'fail']
+    config = {
+        'clusters': [{'name': 'c', 'cluster': {
+            'server': 'https://c',
+            'certificate-authority-data': base64.b64encode(b'CA').decode('ascii')}}],
+        'users': [{'name': mode, 'user': {'exec': {
+            'apiVersion': API_VERSION, 'command': script, 'args': [mode],
+            'env': [{'name': 'PLUGIN_ENV', 'value': 'from-config'}],
+            'provideClusterInfo': mode == 'token'}}} for mode in modes] + [
+            {'name': 'static', 'user': {
+                'token': 'static-token',
+                'client-certificate-data': base64.b64encode(b'CERT').decode('ascii')}},
+            {'name': 'missing', 'user': {'exec': {
+                'apiVersion': API_VERSION, 'command': str(tmpdir.join('nope')),
+                'installHint': 'Install nope.'}}}],
+        'contexts': [{'name': name, 'context': {'cluster': 'c', 'user': name}}
+                     for name in modes + ['static', 'missing']],
+        'current-context': 'token',
+    }
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        yaml.safe_dump(config, fobj)
+
+    def _runs():
+        if not os.path.exists(runs):
+            return []
+        with open(runs) as fobj:
+            return [json.loads(line) for line in fobj]
+    return kubeconfig.KubeConfig(path, backend='native'), _runs
+
+
+def test_resolve_credentials(plugin):
+    conf, runs = plugin
+    assert conf.resolve_credentials() == Credentials('secret', None, None, None)
+    assert conf.resolve_credentials('token') == Credentials('secret', None, None, None)
+    assert len(runs()) == 1
+    assert runs()[0] == {
+        'args': ['token'],
+        'env': 'from-config',
+        'info': {'apiVersion': API_VERSION, 'kind': 'ExecCredential', 'spec': {
+            'interactive': False,
+            'cluster': {'server': 'https://c', 'certificate-authority-data': 'Q0E='}}}}
+
+
+def test_expiry(plugin):
+    conf, runs = plugin
+    assert conf.resolve_credentials('expired').token == 'stale'
+    assert conf.resolve_credentials('expired').token == 'stale'
+    assert len(runs()) == 2
+
+    creds = conf.resolve_credentials('expiring')
+    assert creds.expires == credentials.parse_timestamp('2998-12-31T23:00:00Z')
+    conf.resolve_credentials('expiring')
+    assert len(runs()) == 3
+
+
+def test_disk_cache(plugin, tmpdir, monkeypatch):
+    conf, runs = plugin
+    directory = str(tmpdir.join('cache'))
+    conf.resolve_credentials('expiring', disk_cache=directory)
+    conf.resolve_credentials('token', disk_cache=directory)
+    # Only credentials that expire are written.
+    filenames = os.listdir(directory)
+    assert len(filenames) == 1
+    assert stat.S_IMODE(os.stat(directory).st_mode) == 0o700
+    assert stat.S_IMODE(os.stat(os.path.join(directory, filenames[0])).st_mode) == 0o600
+
+    # As if in another process.
+    monkeypatch.setattr(credentials, 'credential_cache', credentials.CredentialCache())
+    assert conf.resolve_credentials('expiring', disk_cache=directory).token == 'fresh'
+    assert len(runs()) == 2
+
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('xdg')))
+    credentials.credential_cache.clear()
+    conf.resolve_credentials('expiring', disk_cache=True)
+    assert os.listdir(str(tmpdir.join('xdg', 'kubeconfig', 'exec'))) == filenames
+
+
+@pytest.mark.parametrize('mode', [0o620, 0o602])
+def test_disk_cache_writable_by_others(plugin, tmpdir, monkeypatch, mode):
+    conf, runs = plugin
+    directory = str(tmpdir.join('cache'))
+    conf.resolve_credentials('expiring', disk_cache=directory)
+    os.chmod(os.path.join(directory, os.listdir(directory)[0]), mode)
+    monkeypatch.setattr(credentials, 'credential_cache', credentials.CredentialCache())
+    assert conf.resolve_credentials('expiring', disk_cache=directory).token == 'fresh'
+    assert len(runs()) == 2
+
+
+def test_disk_cache_owned_by_others(plugin, tmpdir, monkeypatch):
+    conf, runs = plugin
+    directory = str(tmpdir.join('cache'))
+    conf.resolve_credentials('expiring', disk_cache=directory)
+    key = os.listdir(directory)[0][:-len('.json')]
+    assert credentials.CredentialCache._load(key, directory).token == 'fresh'
+    uid = os.getuid()
+    monkeypatch.setattr(os, 'getuid', lambda: uid + 1)
+    assert credentials.CredentialCache._load(key, directory) is None
+
+
+def test_concurrent_refreshes(plugin, credential_cache, monkeypatch):
+    conf, runs = plugin
+    monkeypatch.setenv('PLUGIN_DELAY', '0.2')
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(conf.resolve_credentials()))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [creds.token for creds in results] == ['secret'] * 8
+    assert len(runs()) == 1
+    assert (credential_cache.hits, credential_cache.misses) == (7, 1)
+    assert credential_cache._refreshing == {}
+    with pytest.raises(kubeconfig.exceptions.ExecPluginError):
+        conf.resolve_credentials('fail')
+    assert credential_cache._refreshing == {}
+
+
+def test_static_credentials(plugin):
+    conf, runs = plugin
+    assert conf.resolve_credentials('static') == Credentials('static-token', 'CERT', None, None)
+    assert runs() == []
+
+
+@pytest.mark.parametrize('context, message', [
+    ('fail', 'exited 3: no credentials for you'),
+    ('empty', 'neither a token nor a client certificate'),
+    ('missing', 'Install nope.'),
+    ('nonexistent', 'No such context: nonexistent'),
+])
+def test_errors(plugin, context, message):
+    conf, _ = plugin
+    with pytest.raises(kubeconfig.exceptions.KubeConfigError) as exc_info:
+        conf.resolve_credentials(context)
+    assert message in str(exc_info.value)
+
+
+def test_timeout(plugin, monkeypatch):
+    conf, runs = plugin
+    monkeypatch.setattr(credentials, 'PLUGIN_TIMEOUT', 0.5)
+    monkeypatch.setenv('PLUGIN_DELAY', '30')
+    with pytest.raises(kubeconfig.exceptions.ExecPluginError) as exc_info:
+        conf.resolve_credentials('token')
+    assert 'of user token timed out after 0.5 seconds' in str(exc_info.value)
+    # The plugin was killed, and the next request runs it again.
+    monkeypatch.setenv('PLUGIN_DELAY', '0')
+    assert conf.resolve_credentials('token').token == 'secret'
+
+
+@pytest.mark.parametrize('env', [
+    [{'value': 'x'}],
+    [{'name': 'PLUGIN_ENV'}],
+    ['PLUGIN_ENV=x'],
+])
+def test_invalid_env(plugin, env):
+    conf, runs = plugin
+    exec_conf = dict(conf.get_user('token')['exec'], env=env)
+    conf.merge({'users': [{'name': 'bad', 'user': {'exec': exec_conf}}],
+                'contexts': [{'name': 'bad', 'context': {'cluster': 'c', 'user': 'bad'}}]})
+    with pytest.raises(kubeconfig.exceptions.ExecPluginError) as exc_info:
+        conf.resolve_credentials('bad')
+    assert str(exc_info.value).endswith('of user bad: env[0] needs both a name and a value')
+    assert runs() == []
+
+
+@pytest.mark.parametrize('value, expected', [
+    ('1970-01-01T00:00:00Z', 0),
+    ('1970-01-01T01:00:00.123+01:00', 0),
+    ('1970-01-01T00:00:00-00:30', 1800),
+])
+def test_parse_timestamp(value, expected):
+    assert credentials.parse_timestamp(value) == expected
+    with pytest.raises(ValueError):
+        credentials.parse_timestamp(value[:10])
@@ -0,0 +1,184 @@
+import asyncio
+import base64
+import json
+
+import pytest
+import yaml
+
+import kubeconfig
+from kubeconfig import delta
+from kubeconfig import native
+
+
+def _config(clusters=(), contexts=(), users=(), current_context='', preferences=None):
+    return {
+        'apiVersion': 'v1', 'kind': 'Config',
+        'clusters': [{'name': name, 'cluster': body} for name, body in clusters],
+        'contexts': [{'name': name, 'context': body} for name, body in contexts],
+        'users': [{'name': name, 'user': body} for name, body in users],
+        'current-context': current_context,
+        'preferences': preferences or {},
+    }
+
+
+OLD = _config(
+    clusters=[('a', {'server': 'https://a', 'insecure-skip-tls-verify': True}),
+              ('b', {'server': 'https://b'})],
+    contexts=[('ctx', {'cluster': 'a', 'user': 'u', 'namespace': 'ns'})],
+    users=[('u', {'exec': {'command': 'login', 'args': ['--a']}})],
+    current_context='ctx',
+    preferences={'colors': True},
+)
+NEW = _config(
+    clusters=[('a', {'server': 'https://a2'}),
+              ('c', {'server': 'https://c'})],
+    contexts=[('ctx', {'cluster': 'a', 'user': 'u', 'namespace': 'ns'}),
+              ('ctx2', {'cluster': 'c', 'user': 'u'})],
+    users=[('u', {'exec': {'command': 'login', 'args': ['--b']}})],
+    current_context='ctx2',
+)
+
+
+def _write(path, config):
+    with open(path, 'w') as fobj:
+        yaml.safe_dump(config, fobj)
+    return path
+
+
+def _read(path):
+    with open(path) as fobj:
+        return yaml.safe_load(fobj)
+
+
+def test_diff():
+    assert kubeconfig.diff(OLD, NEW) == {
+        'clusters': {
+            'a': {'server': 'https://a2', 'insecure-skip-tls-verify': None},
+            'b': None,
+            'c': {'server': 'https://c'},
+        },
+        'contexts': {'ctx2': {'cluster': 'c', 'user': 'u'}},
+        'users': {'u': {'exec': {'args': ['--b']}}},
+        'current-context': 'ctx2',
+        'preferences': {'colors': None},
+    }
+
+
+def test_diff_same():
+    assert kubeconfig.diff(OLD, OLD) == {}
+    assert kubeconfig.diff(None, None) == {}
+
+
+def test_diff_shares_nothing():
+    changeset = kubeconfig.diff(None, NEW)
+    changeset['users']['u']['exec']['args'].append('--c')
+    assert NEW['users'][0]['user']['exec']['args'] == ['--b']
+
+
+def test_diff_files(tmpdir):
+    data = base64.b64encode(b'CA').decode()
+    old = _write(str(tmpdir.join('old')), OLD)
+    new = _write(str(tmpdir.join('new')), _config(
+        clusters=[('a', {'server': 'https://a', 'certificate-authority-data': data})]))
+    changeset = kubeconfig.diff(old, new)
+    # Embedded data is given as plain strings, so that it can be serialized.
+    assert changeset['clusters']['a'] == {
+        'certificate-authority-data': data, 'insecure-skip-tls-verify': None}
+    assert json.loads(delta.dumps(changeset)) == changeset
+    # A missing file is an empty config.
+    assert kubeconfig.diff(str(tmpdir.join('missing')), old) == kubeconfig.diff(None, OLD)
+
+
+def test_diff_kubeconfig(tmpdir):
+    path = _write(str(tmpdir.join('config')), OLD)
+    conf = kubeconfig.KubeConfig(path, backend='native')
+    assert kubeconfig.diff(conf, OLD) == {}
+    assert kubeconfig.diff(conf, NEW) == kubeconfig.diff(OLD, NEW)
+
+
+def test_dumps_compact():
+    changeset = kubeconfig.diff(OLD, NEW)
+    data = delta.dumps(changeset)
+    assert ' ' not in data.replace('https://', '')
+    assert delta.loads(data) == changeset
+    assert delta.loads(data.encode()) == changeset
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        delta.loads('{')
+
+
+@pytest.mark.parametrize('serialize', [False, True])
+def test_apply_delta(tmpdir, serialize):
+    path = _write(str(tmpdir.join('config')), OLD)
+    changeset = kubeconfig.diff(OLD, NEW)
+    conf = kubeconfig.KubeConfig(path, backend='native')
+    conf.apply_delta(delta.dumps(changeset) if serialize else changeset)
+    assert kubeconfig.diff(conf, NEW) == {}
+    assert kubeconfig.diff(path, NEW) == {}
+
+
+def test_apply_delta_keeps_other_changes(tmpdir):
+    local = _config(
+        clusters=[('a', {'server': 'https://a', 'insecure-skip-tls-verify': True}),
+                  ('b', {'server': 'https://b'}),
+                  ('local', {'server': 'https://local'})],
+        contexts=[('ctx', {'cluster': 'a', 'user': 'u', 'namespace': 'mine'})],
+        current_context='ctx',
+    )
+    path = _write(str(tmpdir.join('config')), local)
+    conf = kubeconfig.KubeConfig(path, backend='native')
+    conf.apply_delta(kubeconfig.diff(OLD, NEW))
+    clusters = {c['name']: c['cluster'] for c in _read(path)['clusters']}
+    assert clusters == {
+        'a': {'server': 'https://a2'},
+        'c': {'server': 'https://c'},
+        'local': {'server': 'https://local'},
+    }
+    assert conf.get('contexts.ctx.namespace') == 'mine'
+
+
+def test_apply_delta_writes_once(tmpdir, monkeypatch):
+    path = _write(str(tmpdir.join('config')), OLD)
+    written = []
+    write_file = native.write_file
+
+    def _write_file(filename, doc, **kwargs):
+        written.append(filename)
+        return write_file(filename, doc, **kwargs)
+    monkeypatch.setattr(native, 'write_file', _write_file)
+    kubeconfig.KubeConfig(path).apply_delta(kubeconfig.diff(OLD, NEW))
+    assert written == [path]
+
+
+@pytest.mark.parametrize('changeset', [
+    [],
+    {'clusters': []},
+    {'current-context': None},
+    {'preferences': 'colors'},
+    {'kind': 'Config'},
+    {'clusters': {'a': 'oops'}},
+    {'contexts': {'ctx': [1, 2]}},
+    {'users': {'u': 'token'}},
+    {'extensions': {'e': 1}},
+    {'clusters': {'c': {'server': 'https://c'}}, 'contexts': {'ctx': [1, 2]}},
+])
+def test_apply_delta_invalid(tmpdir, changeset):
+    path = _write(str(tmpdir.join('config')), OLD)
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kubeconfig.KubeConfig(path, backend='native').apply_delta(changeset)
+    assert _read(path) == OLD
+
+
+def test_apply_changeset_leaves_bodies_alone():
+    doc = native.from_v1(OLD)
+    before = doc['users']['u']
+    native.apply_changeset(doc, {'users': {'u': {'exec': {'command': 'other'}}}})
+    assert before == {'exec': {'command': 'login', 'args': ['--a']}}
+    assert doc['users']['u'] == {'exec': {'command': 'other', 'args': ['--a']}}
+
+
+def test_aio_apply_delta(tmpdir):
+    aio = pytest.importorskip('kubeconfig.aio', reason='needs Python 3.7 or later')
+    path = _write(str(tmpdir.join('config')), OLD)
+    conf = aio.AsyncKubeConfig(path, backend='native')
+    asyncio.run(conf.apply_delta(delta.dumps(kubeconfig.diff(OLD, NEW))))
+    assert kubeconfig.diff(path, NEW) == {}
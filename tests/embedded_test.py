@@ -0,0 +1,121 @@
+import base64
+import copy
+import json
+import os
+import pickle
+import stat
+
+import pytest
+import yaml
+
+import kubeconfig
+from kubeconfig import embedded
+from kubeconfig import native
+from kubeconfig.embedded import EmbeddedData
+
+PEM = b'-----BEGIN CERTIFICATE-----\nMIIBkTCB+wIJAKHHIG...\n-----END CERTIFICATE-----\n'
+ENCODED = base64.b64encode(PEM).decode('ascii')
+
+CONFIG = '''apiVersion: v1
+clusters:
+- cluster:
+    certificate-authority-data: %(data)s
+    server: https://example
+  name: c
+contexts:
+- context:
+    cluster: c
+    user: u
+  name: ctx
+current-context: ctx
+kind: Config
+preferences: {}
+users:
+- name: u
+  user:
+    client-certificate-data: %(data)s
+    client-key-data: "%(data)s"
+''' % {'data': ENCODED}
+
+
+@pytest.fixture()
+def config_file(tmpdir):
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        fobj.write(CONFIG)
+    return path
+
+
+def test_parse():
+    doc = native.parse(CONFIG.encode('utf-8'))
+    ca = doc['clusters']['c']['certificate-authority-data']
+    assert isinstance(ca, EmbeddedData)
+    assert isinstance(ca._buffer, memoryview)
+    assert ca.decode() == PEM
+    assert ca == ENCODED and ca.encoded == ENCODED
+    # Quoted values can't be cut out, but still end up as handles.
+    key = doc['users']['u']['client-key-data']
+    assert isinstance(key, EmbeddedData)
+    assert not isinstance(key._buffer, memoryview)
+    assert key == ca
+
+
+def test_parse_falls_back():
+    data = CONFIG + '''extensions:
+- name: notes
+  extension:
+    text: |
+      client-key-data: %s
+''' % ENCODED
+    doc = native.parse(data.encode('utf-8'))
+    assert doc['extensions']['notes']['text'] == 'client-key-data: %s\n' % ENCODED
+    assert doc['users']['u']['client-certificate-data'] == ENCODED
+
+
+def test_parse_json(tmpdir):
+    doc = native.parse(json.dumps(yaml.safe_load(CONFIG)).encode('utf-8'))
+    assert doc['clusters']['c']['certificate-authority-data'].decode() == PEM
+
+
+def test_view(config_file):
+    conf = kubeconfig.KubeConfig(config_file, backend='native')
+    view = conf.view()
+    assert view['clusters'][0]['cluster']['certificate-authority-data'] == 'DATA+OMITTED'
+    assert view['users'][0]['user']['client-key-data'] == 'REDACTED'
+
+    raw = conf.view(raw=True)
+    ca = raw['clusters'][0]['cluster']['certificate-authority-data']
+    assert isinstance(ca, EmbeddedData)
+    assert ca.decode() == PEM
+    assert json.loads(json.dumps(embedded.materialize(raw))) == yaml.safe_load(CONFIG)
+
+
+def test_write_round_trip(config_file):
+    conf = kubeconfig.KubeConfig(config_file, backend='native')
+    conf.set_context('ctx', namespace='ns')
+    with open(config_file) as fobj:
+        written = yaml.safe_load(fobj)
+    assert written['clusters'][0]['cluster']['certificate-authority-data'] == ENCODED
+    assert written['users'][0]['user']['client-key-data'] == ENCODED
+
+
+def test_handle():
+    handle = EmbeddedData(ENCODED)
+    assert copy.deepcopy(handle) is handle
+    assert pickle.loads(pickle.dumps(handle)) == handle
+    assert hash(handle) == hash(ENCODED)
+    assert handle != EmbeddedData('')
+    assert not EmbeddedData('')
+    assert ENCODED not in repr(handle)
+
+
+def test_write_temp_file(tmpdir, monkeypatch):
+    monkeypatch.setattr(embedded.tempfile, 'tempdir', str(tmpdir))
+    monkeypatch.setattr(embedded, '_temp_files', {})
+    handle = EmbeddedData(ENCODED)
+    path = handle.write_temp_file()
+    with open(path, 'rb') as fobj:
+        assert fobj.read() == PEM
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+    assert EmbeddedData(ENCODED.encode('ascii')).write_temp_file() == path
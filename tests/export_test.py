@@ -0,0 +1,106 @@
+import base64
+import os
+import shutil
+
+import pytest
+import yaml
+
+import kubeconfig
+from kubeconfig import native
+
+
+@pytest.fixture()
+def fleet_config(tmpdir):
+    """A config with three contexts sharing a CA file, and a user with a token."""
+    ca = tmpdir.join('ca.crt')
+    ca.write_binary(b'CA CERT')
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        yaml.safe_dump({
+            'clusters': [{'name': 'c%d' % i, 'cluster': {
+                'server': 'https://c%d' % i, 'certificate-authority': 'ca.crt'}}
+                for i in range(3)],
+            'users': [{'name': 'u', 'user': {'token': 'secret'}}],
+            'contexts': [{'name': 'team/ctx%d' % i, 'context': {
+                'cluster': 'c%d' % i, 'user': 'u', 'namespace': 'ns'}} for i in range(3)],
+            'current-context': 'team/ctx1',
+            'preferences': {},
+        }, fobj)
+    return path
+
+
+@pytest.mark.parametrize('backend', ['native', 'kubectl'])
+def test_export(fleet_config, backend):
+    if backend == 'kubectl' and shutil.which('kubectl') is None:
+        pytest.skip('kubectl is not on the path')
+    conf = kubeconfig.KubeConfig(fleet_config, backend=backend)
+    config = conf.export()
+    assert config == {
+        'apiVersion': 'v1', 'kind': 'Config', 'preferences': {},
+        'clusters': [{'name': 'c1', 'cluster': {
+            'server': 'https://c1',
+            'certificate-authority-data': base64.b64encode(b'CA CERT').decode('ascii')}}],
+        'users': [{'name': 'u', 'user': {'token': 'secret'}}],
+        'contexts': [{'name': 'team/ctx1', 'context': {
+            'cluster': 'c1', 'user': 'u', 'namespace': 'ns'}}],
+        'current-context': 'team/ctx1',
+    }
+    yaml.safe_dump(config)
+
+
+def test_export_unflattened(fleet_config):
+    config = kubeconfig.KubeConfig(fleet_config, backend='native').export(
+        'team/ctx0', flatten=False)
+    assert config['clusters'][0]['cluster']['certificate-authority'] == \
+        os.path.join(os.path.dirname(fleet_config), 'ca.crt')
+
+
+def test_export_errors(fleet_config, tmpdir):
+    conf = kubeconfig.KubeConfig(fleet_config, backend='native')
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        conf.export('missing')
+    os.unlink(str(tmpdir.join('ca.crt')))
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        conf.export()
+
+
+def test_export_many(fleet_config, monkeypatch):
+    reads = []
+    read_embedded = native.read_embedded
+
+    def _read_embedded(filename, flag):
+        reads.append(filename)
+        return read_embedded(filename, flag)
+    monkeypatch.setattr(native, 'read_embedded', _read_embedded)
+
+    conf = kubeconfig.KubeConfig(fleet_config, backend='native')
+    exported = conf.export_many()
+    assert sorted(exported) == ['team/ctx0', 'team/ctx1', 'team/ctx2']
+    assert exported['team/ctx2'] == conf.export('team/ctx2')
+    assert len(reads) == 1
+    assert conf.export_many(['team/ctx0'], flatten=False)['team/ctx0']['clusters'][0][
+        'cluster']['certificate-authority'].endswith('ca.crt')
+
+
+def test_export_many_to_directory(fleet_config, tmpdir):
+    conf = kubeconfig.KubeConfig(fleet_config, backend='native')
+    directory = str(tmpdir.join('out'))
+    exported = conf.export_many(directory=directory)
+    assert exported['team/ctx0'] == os.path.join(directory, 'team_ctx0.kubeconfig')
+    assert oct(os.stat(exported['team/ctx0']).st_mode & 0o777) == oct(0o600)
+    job = kubeconfig.KubeConfig(exported['team/ctx0'], backend='native')
+    assert job.current_context() == 'team/ctx0'
+    assert job.view(raw=True)['users'] == [{'name': 'u', 'user': {'token': 'secret'}}]
+
+
+def test_export_many_colliding_filenames(fleet_config, tmpdir):
+    conf = kubeconfig.KubeConfig(fleet_config, backend='native')
+    conf.merge({'contexts': [{'name': 'team_ctx0', 'context': {'cluster': 'c1', 'user': 'u'}}]})
+    directory = str(tmpdir.join('out'))
+    with pytest.raises(ValueError) as excinfo:
+        conf.export_many(directory=directory)
+    assert 'team_ctx0.kubeconfig' in str(excinfo.value)
+    assert not os.path.exists(directory) or os.listdir(directory) == []
+    exported = conf.export_many(['team/ctx0', 'team/ctx0', 'team/ctx1'], directory=directory)
+    assert sorted(os.listdir(directory)) == ['team_ctx0.kubeconfig', 'team_ctx1.kubeconfig']
+    assert sorted(exported) == ['team/ctx0', 'team/ctx1']
@@ -0,0 +1,116 @@
+
+import pytest
+
+import kubeconfig
+from kubeconfig import native
+from kubeconfig.index import ConfigIndex
+
+
+VIEW = {
+    'clusters': [
+        {'name': 'a', 'cluster': {'server': 'https://shared'}},
+        {'name': 'b', 'cluster': {'server': 'https://shared'}},
+        {'name': 'c', 'cluster': {'server': 'https://c'}},
+    ],
+    'contexts': [
+        {'name': 'a-admin', 'context': {'cluster': 'a', 'user': 'admin'}},
+        {'name': 'b-admin', 'context': {'cluster': 'b', 'user': 'admin'}},
+        {'name': 'c-dev', 'context': {'cluster': 'c', 'user': 'dev', 'namespace': 'dev'}},
+        {'name': 'dangling', 'context': {'cluster': 'missing', 'user': 'missing'}},
+    ],
+    'users': [
+        {'name': 'admin', 'user': {'token': 'admin-token'}},
+        {'name': 'dev', 'user': {'token': 'dev-token'}},
+    ],
+}
+
+
+@pytest.fixture()
+def index():
+    return ConfigIndex(VIEW)
+
+
+def test_get(index):
+    assert index.get_cluster('c') == {'server': 'https://c'}
+    assert index.get_context('c-dev')['namespace'] == 'dev'
+    assert index.get_user('dev') == {'token': 'dev-token'}
+    assert index.get_cluster('missing') is None
+
+
+def test_get_returns_copies(index):
+    index.get_cluster('c')['server'] = 'changed'
+    assert index.get_cluster('c') == {'server': 'https://c'}
+
+
+def test_resolve(index):
+    resolved = index.resolve('c-dev')
+    assert resolved.name == 'c-dev'
+    assert resolved.cluster == {'server': 'https://c'}
+    assert resolved.user == {'token': 'dev-token'}
+    dangling = index.resolve('dangling')
+    assert dangling.cluster is None and dangling.user is None
+    assert index.resolve('missing') is None
+
+
+def test_reverse_lookups(index):
+    assert index.contexts_by_cluster('a') == ['a-admin']
+    assert sorted(index.contexts_by_user('admin')) == ['a-admin', 'b-admin']
+    assert sorted(index.clusters_by_server('https://shared')) == ['a', 'b']
+    assert sorted(index.contexts_by_server('https://shared')) == ['a-admin', 'b-admin']
+    assert index.contexts_by_server('https://nowhere') == []
+
+
+def test_kubeconfig_lookups(sample_path):
+    kc = kubeconfig.KubeConfig(sample_path('simple-complete.config'),
+                               backend='native')
+    assert kc.get_context('test-context') == {'cluster': 'test-cluster', 'user': 'test-user'}
+    assert kc.get_cluster('test-cluster')['server'] == 'https://192.168.1.100'
+    assert kc.get_user('test-user')['auth-provider']['name'] == 'gcp'
+    resolved = kc.resolve()
+    assert resolved.name == 'test-context'
+    assert resolved.cluster['server'] == 'https://192.168.1.100'
+    # The index is built once per parsed view.
+    assert kc.index() is kc.index()
+    assert kc.cache_info().misses == 1
+
+
+@pytest.mark.parametrize('path, expected', [
+    ('contexts.c-dev.namespace', 'dev'),
+    ('contexts.c-dev', {'cluster': 'c', 'user': 'dev', 'namespace': 'dev'}),
+    ('contexts.a-admin.namespace', None),
+    ('contexts.missing.namespace', None),
+    ('users.dev.token', 'dev-token'),
+    ('current-context', None),
+])
+def test_lookup(index, path, expected):
+    assert index.lookup(native.compile_property_path(path)) == expected
+
+
+def test_lookup_returns_copies(index):
+    keys = native.compile_property_path('clusters.c')
+    index.lookup(keys)['server'] = 'changed'
+    assert index.lookup(keys) == {'server': 'https://c'}
+
+
+def test_kubeconfig_get(sample_path):
+    kc = kubeconfig.KubeConfig(sample_path('simple-complete.config'),
+                               backend='native')
+    assert kc.get('contexts.test-context.cluster') == 'test-cluster'
+    assert kc.get('users.test-user.auth-provider.name') == 'gcp'
+    assert kc.get('current-context') == 'test-context'
+    assert kc.get('clusters.missing.server', 'none') == 'none'
+    assert kc.get_many(['contexts.test-context.user', 'clusters.test-cluster.server']) == {
+        'contexts.test-context.user': 'test-user',
+        'clusters.test-cluster.server': 'https://192.168.1.100',
+    }
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.get('nonsense.path')
+    assert kc.cache_info().misses == 1
+
+
+def test_compiled_paths_are_cached():
+    native.compile_property_path.cache_clear()
+    keys = native.compile_property_path('clusters.10.0.0.1.server')
+    assert keys == ('clusters', '10.0.0.1', 'server')
+    assert native.compile_property_path('clusters.10.0.0.1.server') is keys
+    assert native.compile_property_path.cache_info().hits == 1
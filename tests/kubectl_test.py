@@ -1,7 +1,10 @@
 import os
+import subprocess
+import sys
 
 import pytest
 
+import kubeconfig
 from kubeconfig import kubectl
 
 
@@ -9,3 +12,58 @@ def test_find_kubectl():
     """Make sure we can find and run kubectl"""
 
     kubectl.run()
+
+
+@pytest.fixture()
+def fake_kubectl(tmpdir, monkeypatch):
+    """Puts a kubectl that prints its arguments on the path."""
+    script = str(tmpdir.join('kubectl'))
+    with open(script, 'w') as fobj:
+        fobj.write('#!/bin/sh\necho "$@"\n')
+    os.chmod(script, 0o755)
+    monkeypatch.setenv('PATH', str(tmpdir))
+    return script
+
+
+def test_find_kubectl_is_cached(fake_kubectl, tmpdir, monkeypatch):
+    lookups = []
+    which = kubectl.shutil.which
+
+    def _which(*args, **kwargs):
+        lookups.append(args)
+        return which(*args, **kwargs)
+    monkeypatch.setattr(kubectl.shutil, 'which', _which)
+    kubectl._which.cache_clear()
+
+    assert kubectl.find_kubectl() == fake_kubectl
+    assert kubectl.run(subcmd_args=['config', 'view']) == 'config view'
+    assert len(lookups) == 1
+
+    # A different path is searched afresh.
+    monkeypatch.setenv('PATH', str(tmpdir.mkdir('empty')))
+    with pytest.raises(kubectl.exceptions.KubectlNotFoundError):
+        kubectl.run()
+    assert len(lookups) == 2
+
+
+def test_kubectl_removed(fake_kubectl):
+    kubectl.find_kubectl()
+    os.unlink(fake_kubectl)
+    with pytest.raises(kubectl.exceptions.KubectlNotFoundError):
+        kubectl.run()
+
+
+def test_import_is_lazy():
+    code = ('import sys, kubeconfig; kubeconfig.KubeConfig; '
+            'print(sorted(set(sys.modules) & {"distutils", "json", "yaml", "subprocess"}))')
+    proc = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE,
+                          universal_newlines=True, check=True)
+    assert proc.stdout.strip() == '[]'
+
+
+def test_import_star():
+    namespace = {}
+    exec('from kubeconfig import *', namespace)
+    assert namespace['KubeConfig'] is kubeconfig.KubeConfig
+    assert namespace['kubectl'] is kubectl
+    assert namespace['exceptions'] is kubeconfig.exceptions
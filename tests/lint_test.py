@@ -0,0 +1,154 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+import yaml
+
+import kubeconfig
+from kubeconfig import lint
+from kubeconfig.__main__ import main
+
+THIS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+
+def _write(path, clusters=(), contexts=(), users=(), current_context=''):
+    with open(path, 'w') as fobj:
+        yaml.safe_dump({
+            'apiVersion': 'v1', 'kind': 'Config',
+            'clusters': [{'name': name, 'cluster': body} for name, body in clusters],
+            'contexts': [{'name': name, 'context': body} for name, body in contexts],
+            'users': [{'name': name, 'user': body} for name, body in users],
+            'current-context': current_context,
+            'preferences': {},
+        }, fobj)
+    return path
+
+
+@pytest.fixture()
+def broken(tmpdir):
+    tmpdir.join('ca.crt').write('CA')
+    return _write(
+        str(tmpdir.join('config')),
+        clusters=[('ok', {'server': 'https://ok', 'certificate-authority': 'ca.crt'}),
+                  ('spare', {'server': 'https://spare',
+                             'certificate-authority': 'missing.crt'})],
+        contexts=[('good', {'cluster': 'ok', 'user': 'u'}),
+                  ('bad', {'cluster': 'gone', 'user': 'nobody'})],
+        users=[('u', {'token': 'secret'}),
+               ('idle', {'client-certificate': os.path.join(str(tmpdir), 'missing.crt')})],
+        current_context='deleted',
+    )
+
+
+def _codes(findings):
+    return [(f.code, f.section, f.name, f.field) for f in findings]
+
+
+def test_clean(tmpdir):
+    path = _write(str(tmpdir.join('config')), clusters=[('c', {'server': 'https://c'})],
+                  contexts=[('ctx', {'cluster': 'c', 'user': 'u'})],
+                  users=[('u', {'token': 'secret'})], current_context='ctx')
+    assert kubeconfig.KubeConfig(path).validate() == []
+
+
+def test_validate(broken):
+    findings = kubeconfig.KubeConfig(broken).validate()
+    assert _codes(findings) == [
+        ('missing-cluster', 'contexts', 'bad', 'cluster'),
+        ('missing-user', 'contexts', 'bad', 'user'),
+        ('missing-current-context', 'current-context', None, None),
+        ('unused-cluster', 'clusters', 'spare', None),
+        ('missing-file', 'clusters', 'spare', 'certificate-authority'),
+        ('unused-user', 'users', 'idle', None),
+        ('missing-file', 'users', 'idle', 'client-certificate'),
+    ]
+    assert set(f.file for f in findings) == set([broken])
+    assert [f.severity for f in findings] == [
+        'error', 'error', 'error', 'warning', 'error', 'warning', 'error']
+    assert findings[0].message == 'contexts "bad": refers to the missing cluster "gone"'
+
+
+def test_duplicate_names(tmpdir, monkeypatch):
+    first = _write(str(tmpdir.join('first')), clusters=[('c', {'server': 'https://1'})],
+                   contexts=[('ctx', {'cluster': 'c'})])
+    second = _write(str(tmpdir.join('second')), clusters=[('c', {'server': 'https://2'})])
+    monkeypatch.setenv('KUBECONFIG', os.pathsep.join([first, second]))
+    findings = kubeconfig.KubeConfig().validate()
+    assert _codes(findings) == [('duplicate-name', 'clusters', 'c', None)]
+    assert findings[0].file == second
+
+
+def test_validate_in_batch(broken):
+    conf = kubeconfig.KubeConfig(broken, backend='native')
+    with conf.batch():
+        conf.set_cluster('gone', server='https://gone')
+        conf.set_context('spare', cluster='spare', user='idle')
+        codes = [f.code for f in conf.validate()]
+    assert codes == ['missing-user', 'missing-current-context', 'missing-file',
+                     'missing-file']
+
+
+def test_validate_coalesced(broken):
+    conf = kubeconfig.KubeConfig(broken, backend='native', write_policy='coalesce',
+                                 write_window=60)
+    conf.use_context('good')
+    assert 'missing-current-context' not in [f.code for f in conf.validate()]
+    assert not conf._coalescer.pending
+
+
+def test_lint(broken, tmpdir):
+    clean = _write(str(tmpdir.join('clean')))
+    results = {r.path: r for r in lint.lint([broken, clean, str(tmpdir.join('missing'))],
+                                            executor='thread')}
+    assert len(results[broken].value) == 7
+    assert results[clean].value == []
+    assert isinstance(results[str(tmpdir.join('missing'))].error,
+                      kubeconfig.exceptions.KubectlCommandError)
+
+
+def test_main(broken, tmpdir, capsys):
+    clean = _write(str(tmpdir.join('clean')), clusters=[('c', {})])
+    assert main(['lint', '--threads', clean]) == 0
+    assert capsys.readouterr().out == \
+        '%s: warning: clusters "c": no context refers to it [unused-cluster]\n' % clean
+    assert main(['lint', '--threads', '--strict', clean]) == 1
+    capsys.readouterr()
+
+    assert main(['lint', '--threads', '--format', 'json', broken]) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert len(records) == 7
+    assert records[0]['path'] == broken
+    assert records[0]['code'] == 'missing-cluster'
+
+
+def test_main_unreadable(tmpdir, capsys):
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        fobj.write('clusters: [')
+    assert main(['lint', '--threads', path]) == 1
+    out = capsys.readouterr().out
+    assert out.startswith('%s: error: error loading config file' % path)
+    assert out.rstrip().endswith('[unreadable]')
+
+
+def test_main_no_match(broken, tmpdir, capsys):
+    pattern = str(tmpdir.join('nothing*'))
+    assert main(['lint', '--threads', pattern]) == 1
+    assert capsys.readouterr().out == '%s: error: no files match [no-match]\n' % pattern
+    assert main(['lint', '--threads', '--format', 'json', pattern, broken]) == 1
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert records[0] == {'path': pattern, 'severity': 'error', 'code': 'no-match',
+                          'message': 'no files match'}
+    assert len(records) == 8
+
+
+def test_python_m(broken, tmpdir):
+    """Run as a CI job would, with a process pool."""
+    env = dict(os.environ, PYTHONPATH=os.path.dirname(THIS_PATH))
+    proc = subprocess.run(
+        [sys.executable, '-m', 'kubeconfig', 'lint', '-j', '2', str(tmpdir.join('conf*'))],
+        env=env, stdout=subprocess.PIPE, universal_newlines=True)
+    assert proc.returncode == 1
+    assert len(proc.stdout.splitlines()) == 7
@@ -0,0 +1,239 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import yaml
+
+import kubeconfig
+from kubeconfig import locking
+from kubeconfig import native
+
+THIS_PATH = os.path.abspath(os.path.dirname(__file__))
+
+# Adds its own contexts to the config, one change at a time.
+WRITER = '''
+import sys
+sys.path.insert(0, %(root)r)
+import kubeconfig
+conf = kubeconfig.KubeConfig(%(path)r, backend='native')
+for i in range(%(writes)d):
+    conf.set_context('writer-%%s-%%d' %% (sys.argv[1], i), cluster='c')
+    if i %% 5 == 0:
+        with conf.batch():
+            conf.set_cluster('cluster-%%s-%%d' %% (sys.argv[1], i), server='https://c')
+'''
+
+
+def _names(path, section):
+    with open(path) as fobj:
+        return set(item['name'] for item in yaml.safe_load(fobj)[section] or [])
+
+
+def test_lock_file(tmpdir):
+    path = str(tmpdir.join('config'))
+    link = str(tmpdir.join('link'))
+    os.symlink(path, link)
+    assert locking.lock_key(link) == os.path.realpath(path)
+    # A file and a link to it share a lock; other files don't.
+    assert locking.lock_file(link) == locking.lock_file(path)
+    assert locking.lock_file(str(tmpdir.join('other'))) != locking.lock_file(path)
+    assert os.path.dirname(locking.lock_file(path)) == \
+        kubeconfig.cache.user_cache_dir('locks')
+
+
+def test_lock_files_bounded(tmpdir):
+    paths = [str(tmpdir.join('config-%d' % i)) for i in range(locking.STRIPES * 4)]
+    assert len(set(locking.lock_file(path) for path in paths)) <= locking.STRIPES
+
+
+def _named_apart(tmpdir, share):
+    """:return: Two files whose lock files are the same (or not)."""
+    first = str(tmpdir.join('first'))
+    for i in range(locking.STRIPES * 16):
+        second = str(tmpdir.join('second-%d' % i))
+        if (locking.lock_file(first) == locking.lock_file(second)) == share:
+            return first, second
+    raise AssertionError('no such pair')
+
+
+def test_files_sharing_a_lock_file(tmpdir):
+    paths = _named_apart(tmpdir, share=True)
+    # The lock file is only taken once...
+    with locking.locked(paths):
+        pass
+    # ...and either file waits for the other.
+    conf = kubeconfig.KubeConfig(paths[1], backend='native')
+    with locking.locked(paths[:1]):
+        thread = threading.Thread(target=conf.set_cluster, args=('c',))
+        thread.start()
+        thread.join(0.2)
+        assert thread.is_alive()
+    thread.join()
+    assert _names(paths[1], 'clusters') == set(['c'])
+
+
+def test_files_in_one_directory_locked_apart(tmpdir):
+    first, second = _named_apart(tmpdir, share=False)
+    entered = threading.Event()
+    released = threading.Event()
+
+    def _hold():
+        with locking.locked([first]):
+            entered.set()
+            released.wait(5)
+    thread = threading.Thread(target=_hold)
+    thread.start()
+    entered.wait()
+    try:
+        # Doesn't wait for the other file's lock...
+        start = time.time()
+        kubeconfig.KubeConfig(second, backend='native').set_cluster('c')
+        assert time.time() - start < 1
+    finally:
+        released.set()
+        thread.join()
+
+
+def test_lock_file_unavailable(tmpdir, monkeypatch):
+    """Without a usable cache directory, threads still take turns."""
+    tmpdir.join('cache').write('not a directory')
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('cache')))
+    path = str(tmpdir.join('config'))
+    with locking.locked([path]):
+        pass
+    kubeconfig.KubeConfig(path, backend='native').set_cluster('c')
+    assert _names(path, 'clusters') == set(['c'])
+
+
+def test_locked_excludes_threads(tmpdir):
+    path = str(tmpdir.join('config'))
+    order = []
+
+    def _hold(name):
+        with locking.locked([path]):
+            order.append(name + ' in')
+            time.sleep(0.05)
+            order.append(name + ' out')
+    threads = [threading.Thread(target=_hold, args=(str(i),)) for i in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert [entry.split()[1] for entry in order] == ['in', 'out'] * 4
+
+
+def test_locked_released_by_another_thread(tmpdir):
+    path = str(tmpdir.join('config'))
+    lock = locking.locked([path])
+    lock.__enter__()
+    thread = threading.Thread(target=lock.__exit__, args=(None, None, None))
+    thread.start()
+    thread.join()
+    with locking.locked([path]):
+        pass
+
+
+def test_locked_notices_new_symlinks(tmpdir):
+    path = str(tmpdir.join('link'))
+    target = str(tmpdir.join('target'))
+    entered = threading.Event()
+    held = []
+
+    def _create():
+        with locking.locked([path]):
+            entered.set()
+            time.sleep(0.1)
+            os.symlink(target, path)
+
+    def _wait():
+        entered.wait()
+        with locking.locked([path]):
+            # The lock taken is the target's, not the one waited on.
+            held.append(locking._locks[locking.lock_file(target)].locked())
+    threads = [threading.Thread(target=_create), threading.Thread(target=_wait)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert held == [True]
+
+
+def test_concurrent_threads(tmpdir):
+    """One shared KubeConfig, written and read from many threads at once."""
+    path = str(tmpdir.join('config'))
+    conf = kubeconfig.KubeConfig(path, backend='native')
+    errors = []
+
+    def _write(n):
+        try:
+            for i in range(5):
+                conf.set_context('thread-%d-%d' % (n, i), cluster='c')
+                assert conf.get('contexts.thread-%d-%d.cluster' % (n, i)) == 'c'
+        except Exception as exc:
+            errors.append(exc)
+    threads = [threading.Thread(target=_write, args=(n,)) for n in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    expected = set('thread-%d-%d' % (n, i) for n in range(16) for i in range(5))
+    assert _names(path, 'contexts') == expected
+    assert set(c['name'] for c in conf.view()['contexts']) == expected
+
+
+def test_batch_is_per_thread(tmpdir):
+    path = str(tmpdir.join('config'))
+    conf = kubeconfig.KubeConfig(path, backend='native')
+    opened = threading.Event()
+    seen = []
+
+    def _other():
+        opened.wait()
+        # Doesn't see (or join) the other thread's batch...
+        seen.append(conf.get('clusters.batched.server'))
+        # ...and waits for it to be written before changing anything.
+        conf.set_cluster('other', server='https://other')
+    thread = threading.Thread(target=_other)
+    thread.start()
+    with conf.batch():
+        conf.set_cluster('batched', server='https://batched')
+        opened.set()
+        time.sleep(0.1)
+    thread.join()
+    assert seen == [None]
+    assert _names(path, 'clusters') == set(['batched', 'other'])
+
+
+def test_view_built_once(tmpdir, monkeypatch):
+    path = str(tmpdir.join('config'))
+    conf = kubeconfig.KubeConfig(path, backend='native')
+    conf.set_cluster('c', server='https://c')
+    views = []
+    view = native.NativeBackend.view
+
+    def _view(self, raw=False):
+        views.append(raw)
+        time.sleep(0.05)
+        return view(self, raw=raw)
+    monkeypatch.setattr(native.NativeBackend, 'view', _view)
+    threads = [threading.Thread(target=conf.view) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert views == [False]
+
+
+def test_concurrent_processes(tmpdir):
+    """Many processes writing to the same file lose none of each other's changes."""
+    path = str(tmpdir.join('config'))
+    script = WRITER % {'root': os.path.dirname(THIS_PATH), 'path': path, 'writes': 10}
+    procs = [subprocess.Popen([sys.executable, '-c', script, str(n)]) for n in range(8)]
+    assert [proc.wait() for proc in procs] == [0] * 8
+    assert _names(path, 'contexts') == set(
+        'writer-%d-%d' % (n, i) for n in range(8) for i in range(10))
+    assert _names(path, 'clusters') == set(
+        'cluster-%d-%d' % (n, i) for n in range(8) for i in range(0, 10, 5))
@@ -0,0 +1,112 @@
+import gc
+import sys
+import tracemalloc
+
+import yaml
+
+import kubeconfig
+from kubeconfig import cache
+from kubeconfig import model
+
+
+def _view(entries):
+    return {
+        'apiVersion': 'v1', 'kind': 'Config', 'current-context': 'ctx-0',
+        'preferences': {},
+        'clusters': [{'name': 'cluster-%d' % index,
+                      'cluster': {'server': 'https://10.0.%d.1' % (index % 4)}}
+                     for index in range(entries)],
+        'contexts': [{'name': 'ctx-%d' % index,
+                      'context': {'cluster': 'cluster-%d' % index, 'user': 'user-%d' % index,
+                                  'namespace': 'default'}}
+                     for index in range(entries)],
+        'users': [{'name': 'user-%d' % index, 'user': {'token': 'token-%d' % index}}
+                  for index in range(entries)],
+    }
+
+
+def test_round_trip(sample_path):
+    for sample in ('simple-complete.config', 'minimal.config'):
+        conf = kubeconfig.KubeConfig(sample_path(sample), backend='native')
+        compact = conf.view(compact=True)
+        assert compact.to_dict() == conf.view()
+        assert compact == model.CompactConfig.from_view(conf.view())
+
+
+def test_attributes(sample_path):
+    conf = kubeconfig.KubeConfig(sample_path('simple-complete.config'), backend='native')
+    compact = conf.view(compact=True)
+    assert compact.current_context == 'test-context'
+    cluster, = compact.clusters
+    assert (cluster.name, cluster.server, cluster.proxy_url) == \
+        ('test-cluster', 'https://192.168.1.100', None)
+    context, = compact.contexts
+    assert (context.cluster, context.user, context.namespace) == \
+        ('test-cluster', 'test-user', None)
+    user, = compact.users
+    assert user.extra['auth-provider']['name'] == 'gcp'
+    assert context.extra is model.EMPTY
+    assert compact.preferences is model.EMPTY
+    assert not hasattr(user, '__dict__')
+
+
+def test_interning():
+    view = _view(2)
+    # Build equal strings that aren't the same object.
+    view['contexts'][1]['context']['namespace'] = ''.join(['def', 'ault'])
+    compact = model.CompactConfig.from_view(view)
+    assert compact.contexts[0].namespace is compact.contexts[1].namespace
+    assert compact.contexts[0].cluster is sys.intern('cluster-0')
+
+
+def test_not_shared_with_view():
+    view = _view(1)
+    view['users'][0]['user']['exec'] = {'command': 'aws'}
+    compact = model.CompactConfig.from_view(view)
+    view['users'][0]['user']['exec']['command'] = 'changed'
+    assert compact.users[0].extra['exec'] == {'command': 'aws'}
+    compact.to_dict()['users'][0]['user']['exec']['command'] = 'changed'
+    assert compact.users[0].extra['exec'] == {'command': 'aws'}
+
+
+def _retained(conf, compact, rounds=3):
+    """
+    :return: The fewest bytes that a view (and whatever it leaves in the
+        caches) held over a few rounds, since the interpreter's table of
+        interned strings grows now and then, and stays grown.
+    """
+    sizes = []
+    for _ in range(rounds):
+        conf.cache_clear()
+        cache.parse_cache.clear()
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = conf.view(compact=compact)
+            gc.collect()
+            sizes.append(tracemalloc.get_traced_memory()[0])
+        finally:
+            tracemalloc.stop()
+        del result
+    return min(sizes)
+
+
+def test_smaller_than_dicts(tmpdir):
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        yaml.safe_dump(_view(500), fobj)
+    # Counting what the caches keep, too.
+    conf = kubeconfig.KubeConfig(path, backend='native')
+    assert _retained(conf, compact=True) < _retained(conf, compact=False) / 5
+
+
+def test_compact_not_cached(tmpdir):
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        yaml.safe_dump(_view(2), fobj)
+    conf = kubeconfig.KubeConfig(path, backend='native')
+    before = cache.parse_cache.info()
+    conf.view(compact=True)
+    conf.view(compact=True, raw=True)
+    assert conf.cache_info() == (0, 0)
+    assert cache.parse_cache.info() == before
@@ -0,0 +1,780 @@
+import os
+import shutil
+import threading
+
+import pytest
+import yaml
+
+import kubeconfig
+from kubeconfig import native
+
+
+requires_kubectl = pytest.mark.skipif(
+    shutil.which('kubectl') is None, reason='kubectl is not on the path')
+
+
+def _native(path):
+    return kubeconfig.KubeConfig(path, backend='native')
+
+
+def _read(path):
+    with open(path) as fobj:
+        return yaml.safe_load(fobj)
+
+
+def test_unknown_backend():
+    with pytest.raises(ValueError):
+        kubeconfig.KubeConfig(backend='invalid')
+
+#
+# view / current-context tests
+#
+
+
+def test_view(sample_path):
+    config = _native(sample_path('simple-complete.config')).view()
+    assert config['clusters'][0]['name'] == 'test-cluster'
+    assert config['contexts'][0]['name'] == 'test-context'
+    assert config['current-context'] == 'test-context'
+    assert config['users'][0]['name'] == 'test-user'
+
+
+def test_view_empty_config():
+    config = _native('this-does-not-exist.config').view()
+    assert config == {
+        'apiVersion': 'v1', 'kind': 'Config', 'clusters': [], 'contexts': [],
+        'current-context': '', 'preferences': {}, 'users': []}
+
+
+def test_view_redacts_secrets(copy_sample):
+    kc = _native(copy_sample('minimal.config'))
+    kc.set('users.u.token', 'secret')
+    kc.set('clusters.c.certificate-authority-data', 'Zm9v')
+    assert kc.view()['users'][0]['user']['token'] == 'REDACTED'
+    assert kc.view()['clusters'][0]['cluster']['certificate-authority-data'] == 'DATA+OMITTED'
+    assert kc._backend.view(raw=True)['users'][0]['user']['token'] == 'secret'
+
+
+def test_view_resolves_relative_paths(tmpdir):
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        fobj.write('clusters:\n- name: c\n  cluster:\n    certificate-authority: ca.crt\n')
+    cluster = _native(path).view()['clusters'][0]['cluster']
+    assert cluster['certificate-authority'] == str(tmpdir.join('ca.crt'))
+    # The file itself is left alone.
+    assert _read(path)['clusters'][0]['cluster']['certificate-authority'] == 'ca.crt'
+
+
+def test_current_context(sample_path):
+    assert _native(sample_path('one-context.config')).current_context() == 'test-context'
+    assert _native(sample_path('minimal.config')).current_context() is None
+    assert _native('this-does-not-exist.config').current_context() is None
+
+
+def test_parse_without_libyaml(monkeypatch, sample_path):
+    with open(sample_path('simple-complete.config'), 'rb') as fobj:
+        data = fobj.read()
+    expected = native.parse(data)
+    monkeypatch.setattr(native, '_SafeLoader', yaml.SafeLoader)
+    assert native.parse(data) == expected
+
+
+@pytest.mark.parametrize('content, expected', [
+    ('current-context: foo\n', 'foo'),
+    ('apiVersion: v1\ncurrent-context: foo # comment\nkind: Config\n', 'foo'),
+    ('current-context: "foo: bar"\n', 'foo: bar'),
+    ("current-context: ''\n", ''),
+    ('current-context:\n', ''),
+    ('current-context: |\n  block\n', 'block\n'),
+    ('{"current-context": "json"}', 'json'),
+    ('"current-context": quoted-key\n', 'quoted-key'),
+    ('contexts: []\n', ''),
+    ('', ''),
+    ('current-context: first\ncurrent-context: last\n', 'last'),
+    ('current-context: plain\n  continued\n', 'plain continued'),
+])
+def test_scan_current_context(tmpdir, content, expected):
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        fobj.write(content)
+    assert native.scan_current_context(path) == expected
+    assert native.scan_current_context(path) == native.load_file(path)['current-context']
+
+
+def test_scan_current_context_unclosed_quote(tmpdir):
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        fobj.write('name: "\ncurrent-context: evil"\n"\n')
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        native.load_file(path)
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        native.scan_current_context(path)
+
+
+def test_scan_current_context_missing_file():
+    assert native.scan_current_context('this-does-not-exist.config') is None
+
+
+def test_current_context_precedence(two_files, monkeypatch):
+    # The first file's value is empty, so the second one's wins.
+    assert _native(None).current_context() == 'a'
+    monkeypatch.setattr(native, 'load_file', None)
+    assert _native(None).current_context() == 'a'
+
+
+def test_invalid_file(tmpdir):
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        fobj.write('clusters: [')
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        _native(path).view()
+
+
+@pytest.mark.parametrize('data', [
+    'clusters:\n- name: c\n  cluster: foo\n',
+    'contexts:\n- name: c\n  context: [1, 2]\n',
+    'users:\n- name: u\n  user: 1\n',
+])
+def test_invalid_entry_body(tmpdir, data):
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        fobj.write(data)
+    kc = _native(path)
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError) as excinfo:
+        kc.view()
+    assert 'must be a mapping' in str(excinfo.value)
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.get('clusters')
+
+#
+# KUBECONFIG merging tests
+#
+
+
+@pytest.fixture()
+def two_files(tmpdir, monkeypatch):
+    first = str(tmpdir.join('first'))
+    second = str(tmpdir.join('second'))
+    with open(first, 'w') as fobj:
+        fobj.write(
+            'clusters:\n- name: shared\n  cluster: {server: https://first}\n'
+            'contexts:\n- name: a\n  context: {cluster: shared}\n'
+            'current-context: ""\n')
+    with open(second, 'w') as fobj:
+        fobj.write(
+            'clusters:\n- name: shared\n  cluster: {server: https://second}\n'
+            '- name: only-second\n  cluster: {server: https://only}\n'
+            'current-context: a\n')
+    monkeypatch.setenv('KUBECONFIG', os.pathsep.join([first, second, first]))
+    return first, second
+
+
+def test_merge_precedence(two_files):
+    config = _native(None).view()
+    servers = {c['name']: c['cluster']['server'] for c in config['clusters']}
+    assert servers == {'shared': 'https://first', 'only-second': 'https://only'}
+    assert config['current-context'] == 'a'
+
+
+def test_merge_writes_to_origin(two_files):
+    first, second = two_files
+    kc = _native(None)
+    kc.set_cluster('only-second', server='https://changed')
+    kc.set_cluster('brand-new', server='https://new')
+    kc.set_context('b', cluster='shared')
+    kc.use_context('b')
+    assert [c['name'] for c in _read(first)['clusters']] == ['brand-new', 'shared']
+    assert [c['name'] for c in _read(first)['contexts']] == ['a', 'b']
+    assert _read(second)['clusters'][0]['cluster']['server'] == 'https://changed'
+    # current-context is written where it was found.
+    assert _read(first)['current-context'] == ''
+    assert _read(second)['current-context'] == 'b'
+
+
+@pytest.mark.parametrize('in_batch', [False, True])
+def test_rename_writes_to_origin(two_files, in_batch):
+    first, second = two_files
+    data = _read(second)
+    data['contexts'] = [{'name': 'x', 'context': {'cluster': 'only-second'}}]
+    with open(second, 'w') as fobj:
+        yaml.safe_dump(data, fobj)
+    kc = _native(None)
+    if in_batch:
+        with kc.batch():
+            kc.rename_context('x', 'y')
+            kc.set_context('y', namespace='ns')
+    else:
+        kc.rename_context('x', 'y')
+    assert [c['name'] for c in _read(first)['contexts']] == ['a']
+    assert [c['name'] for c in _read(second)['contexts']] == ['y']
+
+
+def test_explicit_path_ignores_kubeconfig(two_files, sample_path):
+    assert _native(sample_path('minimal.config')).view()['clusters'] == []
+
+#
+# mutation tests
+#
+
+
+def test_delete_cluster(copy_sample):
+    kc = _native(copy_sample('simple-complete.config'))
+    kc.delete_cluster('test-cluster')
+    assert kc.view()['clusters'] == []
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.delete_cluster('test-cluster')
+
+
+def test_delete_context(copy_sample):
+    kc = _native(copy_sample('simple-complete.config'))
+    kc.delete_context('test-context')
+    assert kc.view()['contexts'] == []
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.delete_context('test-context')
+
+
+def test_delete_user(copy_sample):
+    kc = _native(copy_sample('simple-complete.config'))
+    kc.delete_user('test-user')
+    assert kc.view()['users'] == []
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.delete_user('test-user')
+
+
+def test_rename_context(copy_sample):
+    kc = _native(copy_sample('simple-complete.config'))
+    kc.rename_context('test-context', 'test-context-new')
+    config = kc.view()
+    assert [c['name'] for c in config['contexts']] == ['test-context-new']
+    # Renaming the current context follows it along.
+    assert config['current-context'] == 'test-context-new'
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.rename_context('invalid', 'invalid-too')
+
+
+def test_set(copy_sample):
+    kc = _native(copy_sample('simple-complete.config'))
+    kc.set('current-context', 'new-context')
+    kc.set('clusters.10.0.0.1.insecure-skip-tls-verify', 'true')
+    kc.set('users.test-user.auth-provider.config.extra', 'value')
+    config = kc.view()
+    assert config['current-context'] == 'new-context'
+    assert config['clusters'][0] == {
+        'name': '10.0.0.1', 'cluster': {'insecure-skip-tls-verify': True}}
+    assert config['users'][0]['user']['auth-provider']['config']['extra'] == 'value'
+
+
+@pytest.mark.parametrize('name, value', [
+    ('invalid', 'blah'),
+    ('clusters.foo', 'blah'),
+    ('clusters.foo.insecure-skip-tls-verify', 'maybe'),
+    ('clusters.foo.certificate-authority-data', 'not base64!'),
+])
+def test_set_invalid(copy_sample, name, value):
+    kc = _native(copy_sample('minimal.config'))
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.set(name, value)
+
+
+def test_set_cluster(copy_sample, tmpdir):
+    ca_path = str(tmpdir.join('ca.crt'))
+    with open(ca_path, 'wb') as fobj:
+        fobj.write(b'foo')
+    path = copy_sample('simple-complete.config')
+    kc = _native(path)
+    kc.set_cluster('test-cluster', server='https://yarr')
+    kc.set_cluster('new-cluster', certificate_authority=ca_path, embed_certs=True)
+    kc.set_cluster('insecure', insecure_skip_tls_verify=True)
+    clusters = {c['name']: c['cluster'] for c in _read(path)['clusters']}
+    assert clusters['test-cluster']['server'] == 'https://yarr'
+    assert clusters['new-cluster'] == {'certificate-authority-data': 'Zm9v'}
+    assert clusters['insecure'] == {'insecure-skip-tls-verify': True}
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.set_cluster('other', embed_certs=True)
+    with pytest.raises(ValueError):
+        kc.set_cluster('other', embed_certs='yes')
+
+
+def test_set_context(copy_sample):
+    kc = _native(copy_sample('simple-complete.config'))
+    kc.set_context('test-context', cluster='other-cluster', namespace='ns')
+    kc.set_context('new-context', cluster='new-cluster')
+    contexts = {c['name']: c['context'] for c in kc.view()['contexts']}
+    assert contexts['test-context'] == {
+        'cluster': 'other-cluster', 'namespace': 'ns', 'user': 'test-user'}
+    assert contexts['new-context'] == {'cluster': 'new-cluster'}
+
+
+def test_set_credentials(copy_sample):
+    kc = _native(copy_sample('simple-complete.config'))
+    kc.set_credentials('test-user', auth_provider_args={'token-key': 'test'})
+    provider = kc.view()['users'][0]['user']['auth-provider']
+    assert provider['name'] == 'gcp'
+    assert provider['config']['token-key'] == 'test'
+    kc.set_credentials('test-user', auth_provider='other')
+    assert kc.view()['users'][0]['user']['auth-provider'] == {'name': 'other'}
+
+
+def test_set_credentials_clears_other_auth(copy_sample):
+    kc = _native(copy_sample('minimal.config'))
+    kc.set_credentials('new-user', username='new-user', password='pw')
+    kc.set_credentials('new-user', token='secret')
+    user = kc._backend.view(raw=True)['users'][0]['user']
+    assert user == {'token': 'secret'}
+
+
+def test_unset(copy_sample):
+    kc = _native(copy_sample('simple-complete.config'))
+    kc.unset('current-context')
+    kc.unset('contexts.test-context.user')
+    kc.unset('users.test-user')
+    config = kc.view()
+    assert config['current-context'] == ''
+    assert config['contexts'][0]['context'] == {'cluster': 'test-cluster'}
+    assert config['users'] == []
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.unset('invalid')
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.unset('users.missing')
+
+
+def test_use_context(copy_sample):
+    kc = _native(copy_sample('one-context.config'))
+    kc.use_context('test-context')
+    assert kc.current_context() == 'test-context'
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.use_context('invalid')
+
+
+def test_write_creates_file(tmpdir):
+    path = str(tmpdir.join('nested', 'config'))
+    _native(path).set_context('new-context', cluster='c')
+    assert _read(path)['contexts'] == [{'name': 'new-context', 'context': {'cluster': 'c'}}]
+    assert os.stat(path).st_mode & 0o777 == 0o600
+
+
+def test_write_keeps_mode(copy_sample):
+    path = copy_sample('one-context.config')
+    os.chmod(path, 0o640)
+    _native(path).set_context('new-context', cluster='c')
+    assert os.stat(path).st_mode & 0o777 == 0o640
+
+
+def test_write_through_symlink(copy_sample, tmpdir):
+    target = copy_sample('one-context.config')
+    link = str(tmpdir.mkdir('home').join('config'))
+    os.symlink(target, link)
+    _native(link).set_context('new-context', cluster='c')
+    assert os.path.islink(link)
+    assert 'new-context' in [c['name'] for c in _read(target)['contexts']]
+    assert os.listdir(str(tmpdir.join('home'))) == ['config']
+
+
+def test_write_file_unchanged(copy_sample, monkeypatch):
+    path = copy_sample('simple-complete.config')
+    doc = native.load_file(path)
+    synced = []
+    monkeypatch.setattr(native.os, 'fsync', synced.append)
+    # The sample is laid out just as it would be written.
+    before = os.stat(path)
+    assert native.write_file(path, doc, fsync=True) is False
+    assert os.stat(path).st_ino == before.st_ino
+    assert synced == []
+
+    _native(path).use_context('test-context')
+    assert os.stat(path).st_ino == before.st_ino
+    doc['current-context'] = ''
+    assert native.write_file(path, doc, fsync=True) is True
+    assert os.stat(path).st_ino != before.st_ino
+    assert len(synced) == 1
+    assert _read(path)['current-context'] == ''
+
+
+def test_parse_property_path():
+    steps = native.parse_property_path('clusters.a.b.server')
+    assert [key for key, _ in steps] == ['clusters', 'a.b', 'server']
+    steps = native.parse_property_path('users.u.auth-provider.config.x.y')
+    assert [key for key, _ in steps] == ['users', 'u', 'auth-provider', 'config', 'x.y']
+
+#
+# differential tests against kubectl
+#
+
+
+def _apply_ops(kc):
+    kc.set_cluster('c1', server='https://c1')
+    kc.set_cluster('c1', insecure_skip_tls_verify=True)
+    kc.set_credentials('u1', username='user', password='pw')
+    kc.set_credentials('u1', token='tok')
+    kc.set_context('ctx', cluster='c1', user='u1', namespace='ns')
+    kc.set('contexts.ctx.namespace', 'other')
+    kc.rename_context('ctx', 'renamed')
+    kc.use_context('renamed')
+    kc.unset('users.u1.token')
+    kc.set_context('doomed', cluster='c1')
+    kc.delete_context('doomed')
+
+
+@requires_kubectl
+def test_differential(tmpdir, sample_path):
+    native_path = str(tmpdir.join('native'))
+    kubectl_path = str(tmpdir.join('kubectl'))
+    for path in (native_path, kubectl_path):
+        shutil.copy(sample_path('simple-complete.config'), path)
+    _apply_ops(_native(native_path))
+    _apply_ops(kubeconfig.KubeConfig(kubectl_path))
+    assert _native(native_path).view() == kubeconfig.KubeConfig(kubectl_path).view()
+    assert _read(native_path) == _read(kubectl_path)
+
+#
+# batch tests
+#
+
+
+@pytest.fixture()
+def count_writes(monkeypatch):
+    written = []
+    write_file = native.write_file
+
+    def _write_file(filename, doc, **kwargs):
+        written.append(filename)
+        return write_file(filename, doc, **kwargs)
+    monkeypatch.setattr(native, 'write_file', _write_file)
+    return written
+
+
+@pytest.mark.parametrize('backend', ['native', 'kubectl'])
+def test_batch(copy_sample, count_writes, backend):
+    path = copy_sample('minimal.config')
+    kc = kubeconfig.KubeConfig(path, backend=backend)
+    with kc.batch() as batched:
+        assert batched is kc
+        kc.set_cluster('c', server='https://c')
+        kc.set_credentials('u', token='t')
+        kc.set_context('ctx', cluster='c', user='u')
+        kc.use_context('ctx')
+        # Reads within the batch see the pending changes...
+        assert kc.current_context() == 'ctx'
+        # ...which haven't been written yet.
+        assert _read(path)['contexts'] == []
+    assert count_writes == [path]
+    config = _native(path).view()
+    assert config['current-context'] == 'ctx'
+    assert [c['name'] for c in config['clusters']] == ['c']
+    # The original backend is restored afterwards.
+    assert isinstance(kc._backend, kubeconfig.kubeconfig.BACKENDS[backend])
+
+
+def test_batch_rollback(copy_sample, count_writes):
+    path = copy_sample('minimal.config')
+    kc = _native(path)
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        with kc.transaction():
+            kc.set_cluster('c', server='https://c')
+            kc.use_context('missing')
+    assert count_writes == []
+    assert kc.view()['clusters'] == []
+
+
+def test_batch_nested(copy_sample, count_writes):
+    path = copy_sample('minimal.config')
+    kc = _native(path)
+    with kc.batch():
+        kc.set_cluster('a')
+        with kc.batch():
+            kc.set_cluster('b')
+        assert count_writes == []
+    assert count_writes == [path]
+    assert [c['name'] for c in kc.view()['clusters']] == ['a', 'b']
+
+#
+# view cache tests
+#
+
+
+def test_view_cache(copy_sample):
+    path = copy_sample('simple-complete.config')
+    kc = _native(path)
+    assert kc.view() == kc.view()
+    assert kc.current_context() == 'test-context'
+    assert kc.cache_info() == (2, 1)
+    # Callers can't corrupt the cached copy.
+    kc.view()['current-context'] = 'changed'
+    assert kc.current_context() == 'test-context'
+
+
+def test_view_cache_invalidated_by_own_writes(copy_sample):
+    kc = _native(copy_sample('simple-complete.config'))
+    kc.view()
+    kc.use_context('test-context')
+    kc.view()
+    assert kc.cache_info() == (0, 2)
+
+
+def test_view_cache_invalidated_by_other_writers(copy_sample):
+    path = copy_sample('simple-complete.config')
+    kc = _native(path)
+    assert kc.view()['current-context'] == 'test-context'
+    _native(path).set('current-context', 'other-context')
+    assert kc.view()['current-context'] == 'other-context'
+    assert kc.cache_info() == (0, 2)
+
+
+def test_view_cache_notices_new_files(tmpdir, monkeypatch, sample_path):
+    first, second = str(tmpdir.join('first')), str(tmpdir.join('second'))
+    monkeypatch.setenv('KUBECONFIG', os.pathsep.join([first, second]))
+    kc = _native(None)
+    assert kc.current_context() is None
+    shutil.copy(sample_path('one-context.config'), second)
+    assert kc.current_context() == 'test-context'
+
+
+def test_view_cache_disabled(sample_path):
+    kc = kubeconfig.KubeConfig(sample_path('simple-complete.config'), backend='native',
+                               cache=False)
+    kc.view()
+    kc.view()
+    assert kc.cache_info() == (0, 0)
+
+#
+# parse cache tests
+#
+
+
+@pytest.fixture()
+def count_parses(monkeypatch):
+    parsed = []
+    parse = native.parse
+
+    def _parse(data, filename='<string>'):
+        parsed.append(filename)
+        return parse(data, filename)
+    monkeypatch.setattr(native, 'parse', _parse)
+    return parsed
+
+
+def test_parse_cache_only_reparses_changed_files(tmpdir, monkeypatch, count_parses):
+    paths = []
+    for index in range(5):
+        paths.append(str(tmpdir.join('config-%d' % index)))
+        _native(paths[-1]).set_cluster('cluster-%d' % index, server='https://%d' % index)
+    monkeypatch.setenv('KUBECONFIG', os.pathsep.join(paths))
+    kc = _native(None)
+    assert len(kc.view()['clusters']) == 5
+    del count_parses[:]
+
+    _native(paths[2]).set_cluster('cluster-2', server='https://moved')
+    assert count_parses == []
+    servers = {c['name']: c['cluster']['server'] for c in kc.view()['clusters']}
+    assert servers['cluster-2'] == 'https://moved'
+    assert count_parses == [paths[2]]
+
+
+def test_parse_cache_ignores_touched_files(copy_sample, count_parses):
+    path = copy_sample('simple-complete.config')
+    kc = kubeconfig.KubeConfig(path, backend='native', cache=False)
+    kc.view()
+    os.utime(path, ns=(0, 0))
+    kc.view()
+    assert count_parses == [path]
+
+
+def test_parse_cache_eviction(tmpdir):
+    cache = kubeconfig.cache.ParseCache(maxsize=2)
+    paths = [str(tmpdir.join(name)) for name in 'abc']
+    for path in paths:
+        with open(path, 'w') as fobj:
+            fobj.write('current-context: %s\n' % path)
+        cache.load(path, native.parse)
+    cache.load(paths[2], native.parse)
+    cache.load(paths[0], native.parse)
+    assert cache.info() == (1, 4)
+    assert cache.load(str(tmpdir.join('missing')), native.parse) is None
+
+#
+# snapshot tests
+#
+
+
+@pytest.fixture()
+def count_views(monkeypatch):
+    """Records every view the native backend builds."""
+    built = []
+    view = native.NativeBackend.view
+
+    def _view(self, **kwargs):
+        built.append(self.path)
+        return view(self, **kwargs)
+    monkeypatch.setattr(native.NativeBackend, 'view', _view)
+    return built
+
+
+@pytest.mark.parametrize('cache', [True, False])
+def test_snapshot(copy_sample, tmpdir, count_views, cache):
+    path = copy_sample('simple-complete.config')
+    snapshots = str(tmpdir.join('snapshots'))
+    expected = _native(path).view()
+    del count_views[:]
+
+    # Each instance stands in for a new process.
+    for _ in range(3):
+        kc = kubeconfig.KubeConfig(path, backend='native', cache=cache, snapshot=snapshots)
+        assert kc.view() == expected
+        assert kc.get('contexts.test-context.user') == 'test-user'
+    assert count_views == [path]
+    assert kc._snapshots.info() == (1 if cache else 2, 0)
+    assert len(os.listdir(snapshots)) == 1
+
+    _native(path).set('contexts.test-context.namespace', 'changed')
+    kc = kubeconfig.KubeConfig(path, backend='native', cache=cache, snapshot=snapshots)
+    assert kc.get('contexts.test-context.namespace') == 'changed'
+    assert count_views == [path, path]
+    assert len(os.listdir(snapshots)) == 1
+
+
+def test_snapshot_default_directory(copy_sample, tmpdir, monkeypatch):
+    monkeypatch.setenv('XDG_CACHE_HOME', str(tmpdir.join('xdg')))
+    kubeconfig.KubeConfig(copy_sample('minimal.config'), backend='native', snapshot=True).view()
+    assert len(os.listdir(str(tmpdir.join('xdg', 'kubeconfig', 'views')))) == 1
+
+
+def test_snapshot_corrupt(copy_sample, tmpdir, count_views):
+    path = copy_sample('simple-complete.config')
+    cache = kubeconfig.cache.SnapshotCache(str(tmpdir.join('snapshots')))
+    key, signature = 'key', kubeconfig.cache.stat_signature([path])
+    view = _native(path).view()
+    cache.store(key, signature, view)
+    with open(cache.filename(key), 'r+b') as fobj:
+        fobj.truncate(20)
+    assert cache.load(key, signature) is None
+    assert cache.get(key, signature, lambda: view) == view
+    assert cache.load(key, signature) == view
+    assert cache.load(key, kubeconfig.cache.stat_signature([path, path])) is None
+
+
+def test_snapshot_concurrent_writers(copy_sample, tmpdir):
+    """Readers only ever see whole snapshots, however writes interleave."""
+    path = copy_sample('simple-complete.config')
+    cache = kubeconfig.cache.SnapshotCache(str(tmpdir.join('snapshots')))
+    signature = kubeconfig.cache.stat_signature([path])
+    views = [dict(_native(path).view(), marker=i) for i in range(4)]
+    seen = []
+
+    def _write(view):
+        for _ in range(50):
+            cache.store('key', signature, view)
+            seen.append(cache.load('key', signature))
+    threads = [threading.Thread(target=_write, args=(view,)) for view in views]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(view in views for view in seen)
+    assert os.listdir(str(tmpdir.join('snapshots'))) == [os.path.basename(cache.filename('key'))]
+
+#
+# merge tests
+#
+
+
+FRAGMENT = {
+    'clusters': [{'name': 'test-cluster', 'cluster': {'server': 'https://new'}},
+                 {'name': 'new-cluster', 'cluster': {'server': 'https://new'}}],
+    'users': [{'name': 'test-user', 'user': {'token': 'new'}}],
+    'contexts': [{'name': 'new-context',
+                  'context': {'cluster': 'test-cluster', 'user': 'test-user'}}],
+    'current-context': 'new-context',
+    'preferences': {'colors': True},
+}
+
+
+@pytest.mark.parametrize('backend', ['native', 'kubectl'])
+def test_merge_overwrite(copy_sample, count_writes, backend):
+    path = copy_sample('simple-complete.config')
+    kc = kubeconfig.KubeConfig(path, backend=backend)
+    assert kc.merge(FRAGMENT) == {}
+    assert count_writes == [path]
+    written = _read(path)
+    clusters = {c['name']: c['cluster'] for c in written['clusters']}
+    assert clusters['test-cluster'] == {'server': 'https://new'}
+    assert 'new-cluster' in clusters
+    assert written['users'] == [{'name': 'test-user', 'user': {'token': 'new'}}]
+    assert written['current-context'] == 'test-context'
+    assert written['preferences'] == {'colors': True}
+
+
+def test_merge_keep_existing(copy_sample):
+    path = copy_sample('simple-complete.config')
+    _native(path).merge(FRAGMENT, strategy='keep-existing')
+    written = _read(path)
+    clusters = {c['name']: c['cluster'] for c in written['clusters']}
+    assert clusters['test-cluster']['server'] == 'https://192.168.1.100'
+    assert clusters['new-cluster'] == {'server': 'https://new'}
+    assert 'auth-provider' in written['users'][0]['user']
+
+
+def test_merge_rename(copy_sample):
+    path = copy_sample('simple-complete.config')
+    kc = _native(path)
+    renames = kc.merge(FRAGMENT, strategy='rename')
+    assert renames == {'clusters': {'test-cluster': 'test-cluster-1'},
+                       'users': {'test-user': 'test-user-1'}}
+    assert kc.get_cluster('test-cluster')['server'] == 'https://192.168.1.100'
+    assert kc.get_cluster('test-cluster-1') == {'server': 'https://new'}
+    assert kc.get_context('new-context') == {'cluster': 'test-cluster-1',
+                                             'user': 'test-user-1'}
+    # Identical entries merge cleanly.
+    assert kc.merge({'clusters': FRAGMENT['clusters'][1:]}, strategy='rename') == {}
+
+
+def test_merge_rename_follows_renamed_references(tmpdir):
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        yaml.safe_dump({
+            'clusters': [{'name': 'k', 'cluster': {'server': 'https://old'}}],
+            'users': [{'name': 'u', 'user': {'token': 'secret'}}],
+            'contexts': [{'name': 'c', 'context': {'cluster': 'k', 'user': 'u'}}],
+        }, fobj)
+    kc = _native(path)
+    # Only the cluster differs, but the context must follow it.
+    renames = kc.merge({
+        'clusters': [{'name': 'k', 'cluster': {'server': 'https://new'}}],
+        'users': [{'name': 'u', 'user': {'token': 'secret'}}],
+        'contexts': [{'name': 'c', 'context': {'cluster': 'k', 'user': 'u'}}],
+    }, strategy='rename')
+    assert renames == {'clusters': {'k': 'k-1'}, 'contexts': {'c': 'c-1'}}
+    assert kc.get_context('c') == {'cluster': 'k', 'user': 'u'}
+    assert kc.get_context('c-1') == {'cluster': 'k-1', 'user': 'u'}
+
+
+def test_merge_rejects_redacted_view(copy_sample, tmpdir, count_writes):
+    source = str(tmpdir.join('source'))
+    with open(source, 'w') as fobj:
+        yaml.safe_dump({'users': [{'name': 'u', 'user': {'token': 'secret'}}]}, fobj)
+    kc = _native(copy_sample('minimal.config'))
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError) as excinfo:
+        kc.merge(_native(source).view())
+    assert 'view(raw=True)' in str(excinfo.value)
+    assert count_writes == []
+
+
+def test_merge_file(copy_sample, tmpdir):
+    path = copy_sample('minimal.config')
+    fragment = str(tmpdir.mkdir('fragment').join('config'))
+    with open(fragment, 'w') as fobj:
+        yaml.safe_dump({'clusters': [{'name': 'c', 'cluster': {
+            'server': 'https://c', 'certificate-authority': 'ca.crt'}}]}, fobj)
+    _native(path).merge(fragment)
+    assert _native(path).get_cluster('c')['certificate-authority'] == \
+        os.path.join(os.path.dirname(fragment), 'ca.crt')
+
+
+def test_merge_invalid(copy_sample, count_writes):
+    kc = _native(copy_sample('minimal.config'))
+    with pytest.raises(ValueError):
+        kc.merge(FRAGMENT, strategy='invalid')
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.merge('does-not-exist.config')
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        kc.merge({'clusters': [{'cluster': {}}]})
+    assert count_writes == []
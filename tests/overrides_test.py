@@ -0,0 +1,134 @@
+import os
+import stat
+import threading
+
+import pytest
+import yaml
+
+import kubeconfig
+from kubeconfig import native
+from kubeconfig import overrides
+
+
+@pytest.fixture(autouse=True)
+def temp_dir(tmpdir, monkeypatch):
+    """Keeps the files kubeconfig_path() writes to this test."""
+    monkeypatch.setattr(overrides.embedded.tempfile, 'tempdir', str(tmpdir.mkdir('tmp')))
+    monkeypatch.setattr(overrides, '_files', {})
+
+
+@pytest.fixture()
+def config_path(tmpdir):
+    path = str(tmpdir.join('config'))
+    with open(path, 'w') as fobj:
+        yaml.safe_dump({
+            'clusters': [{'name': name, 'cluster': {'server': 'https://%s' % name}}
+                         for name in ('prod', 'staging')] + [
+                {'name': 'local', 'cluster': {'server': 'https://local',
+                                              'certificate-authority': 'ca.crt'}}],
+            'users': [{'name': name, 'user': {'token': '%s-token' % name}}
+                      for name in ('admin', 'dev')],
+            'contexts': [
+                {'name': 'prod', 'context': {'cluster': 'prod', 'user': 'admin'}},
+                {'name': 'staging', 'context': {
+                    'cluster': 'staging', 'user': 'dev', 'namespace': 'qa'}},
+            ],
+            'current-context': 'staging',
+        }, fobj)
+    return path
+
+
+@pytest.fixture()
+def count_writes(monkeypatch):
+    written = []
+    write_file = native.write_file
+
+    def _write_file(filename, doc, **kwargs):
+        written.append(filename)
+        return write_file(filename, doc, **kwargs)
+    monkeypatch.setattr(native, 'write_file', _write_file)
+    return written
+
+
+def test_with_context(config_path):
+    conf = kubeconfig.KubeConfig(config_path, backend='native')
+    prod = conf.with_context('prod', namespace='ops')
+    assert prod.current_context() == 'prod'
+    resolved = prod.resolve()
+    assert resolved.context == {'cluster': 'prod', 'user': 'admin', 'namespace': 'ops'}
+    assert resolved.cluster == {'server': 'https://prod'}
+    assert prod.resolve_credentials().token == 'admin-token'
+    # The config itself is untouched.
+    assert conf.current_context() == 'staging'
+    assert conf.resolve().context['namespace'] == 'qa'
+    assert conf.cache_info().misses == 1
+
+
+def test_overrides(config_path):
+    conf = kubeconfig.KubeConfig(config_path, backend='native')
+    override = conf.overrides(cluster='local', user='admin')
+    assert override.current_context() == 'staging'
+    resolved = override.resolve()
+    assert resolved.context == {'cluster': 'local', 'user': 'admin', 'namespace': 'qa'}
+    assert resolved.cluster['server'] == 'https://local'
+    assert resolved.user == {'token': 'REDACTED'}
+    assert override.resolve_credentials().token == 'admin-token'
+
+    config = override.export(flatten=False)
+    assert config['current-context'] == 'staging'
+    assert config['clusters'] == [{'name': 'local', 'cluster': {
+        'server': 'https://local',
+        'certificate-authority': os.path.join(os.path.dirname(config_path), 'ca.crt')}}]
+    assert config['users'] == [{'name': 'admin', 'user': {'token': 'admin-token'}}]
+
+    assert conf.with_context('missing').resolve() is None
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        conf.with_context('missing').export()
+
+
+def test_kubeconfig_path(config_path, count_writes):
+    conf = kubeconfig.KubeConfig(config_path, backend='native')
+    path = conf.with_context('prod').kubeconfig_path()
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+    with open(path) as fobj:
+        written = yaml.safe_load(fobj)
+    assert written['current-context'] == 'prod'
+    assert [user['name'] for user in written['users']] == ['admin']
+    assert kubeconfig.KubeConfig(path, backend='native').resolve().cluster == {
+        'server': 'https://prod'}
+
+    # Overrides that come to the same config share its file, which is only
+    # written once.
+    count = len(count_writes)
+    assert conf.with_context('prod').kubeconfig_path() == path
+    assert conf.overrides(context='prod').kubeconfig_path() == path
+    assert len(count_writes) == count
+
+    # A change to the config is picked up.
+    conf.set_cluster('prod', server='https://moved')
+    count = len(count_writes)
+    moved = conf.with_context('prod').kubeconfig_path()
+    assert moved != path
+    assert count_writes[count:] == [moved]
+
+
+def test_concurrent_overrides(config_path):
+    conf = kubeconfig.KubeConfig(config_path, backend='native')
+    with open(config_path, 'rb') as fobj:
+        before = fobj.read()
+    results = {}
+
+    def _work(i):
+        name = ('prod', 'staging')[i % 2]
+        override = conf.with_context(name)
+        results[i] = (override.resolve().cluster['server'], override.kubeconfig_path())
+    threads = [threading.Thread(target=_work, args=(i,)) for i in range(40)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert {results[i][0] for i in range(0, 40, 2)} == {'https://prod'}
+    assert {results[i][0] for i in range(1, 40, 2)} == {'https://staging'}
+    assert len({path for _, path in results.values()}) == 2
+    with open(config_path, 'rb') as fobj:
+        assert fobj.read() == before
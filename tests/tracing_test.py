@@ -0,0 +1,119 @@
+import logging
+import os
+import stat
+
+import pytest
+
+import kubeconfig
+from kubeconfig import tracing
+
+
+class RecordingTracer(tracing.Tracer):
+    enabled = True
+
+    def __init__(self):
+        self.events = []
+
+    def on_kubectl(self, argv, duration, returncode, output_size):
+        self.events.append(('kubectl', argv, returncode, output_size))
+
+    def on_parse(self, source, duration, size):
+        self.events.append(('parse', source, size))
+
+    def on_write(self, filename, duration, size):
+        self.events.append(('write', filename))
+
+    def on_cache(self, name, hit):
+        self.events.append(('cache', name, hit))
+
+
+@pytest.fixture()
+def echo_kubectl(tmpdir, monkeypatch):
+    """
+    Puts a kubectl on the path that prints an empty config, or fails if
+    asked to use a context.
+    """
+    script = str(tmpdir.join('kubectl'))
+    with open(script, 'w') as fobj:
+        fobj.write('#!/bin/sh\n'
+                   'case "$*" in *use-context*) echo "error: no context"; exit 1;; esac\n'
+                   'echo \'{"contexts": []}\'\n')
+    os.chmod(script, os.stat(script).st_mode | stat.S_IEXEC)
+    monkeypatch.setenv('PATH', str(tmpdir) + os.pathsep + os.environ['PATH'])
+
+
+def test_redact_argv():
+    argv = ['kubectl', 'config', 'set-credentials', 'me', '--token=hunter2',
+            '--password', 'hunter2', '--username=me',
+            '--auth-provider-arg=client-secret=hunter2']
+    assert tracing.redact_argv(argv) == [
+        'kubectl', 'config', 'set-credentials', 'me', '--token=REDACTED',
+        '--password', 'REDACTED', '--username=me',
+        '--auth-provider-arg=client-secret=REDACTED']
+    assert tracing.redact_argv(['kubectl', 'config', 'set', 'users.me.token', 'hunter2']) \
+        == ['kubectl', 'config', 'set', 'users.me.token', 'REDACTED']
+    assert tracing.redact_argv(['kubectl', 'config', 'set', 'users.me.username', 'me']) \
+        == ['kubectl', 'config', 'set', 'users.me.username', 'me']
+
+
+def test_native_events(copy_sample, sample_path):
+    path = copy_sample('simple-complete.config')
+    tracer = RecordingTracer()
+    conf = kubeconfig.KubeConfig(path, backend='native', tracer=tracer)
+    conf.view()
+    conf.view()
+    conf.set_credentials('test-user', token='hunter2')
+    assert tracer.events == [
+        ('cache', 'view', False),
+        ('parse', path, os.path.getsize(sample_path('simple-complete.config'))),
+        ('cache', 'parse', False),
+        ('cache', 'view', True),
+        ('cache', 'parse', True),
+        ('write', path),
+    ]
+
+
+def test_kubectl_events(echo_kubectl):
+    tracer = RecordingTracer()
+    conf = kubeconfig.KubeConfig('some.config', tracer=tracer)
+    assert conf.view() == {'contexts': []}
+    conf.set_credentials('me', token='hunter2')
+    with pytest.raises(kubeconfig.exceptions.KubectlCommandError):
+        conf.use_context('missing')
+    assert tracer.events == [
+        ('cache', 'view', False),
+        ('kubectl', ['kubectl', '--kubeconfig', 'some.config', 'config', 'view',
+                     '--output=json'], 0, 17),
+        ('parse', 'kubectl', 16),
+        ('kubectl', ['kubectl', '--kubeconfig', 'some.config', 'config',
+                     'set-credentials', 'me', '--token=REDACTED'], 0, 17),
+        ('kubectl', ['kubectl', '--kubeconfig', 'some.config', 'config',
+                     'use-context', 'missing'], 1, 18),
+    ]
+
+
+def test_global_tracer(copy_sample):
+    tracer = RecordingTracer()
+    conf = kubeconfig.KubeConfig(copy_sample('minimal.config'), backend='native')
+    tracing.set_tracer(tracer)
+    try:
+        conf.view()
+    finally:
+        tracing.set_tracer(None)
+    conf.view()
+    assert [event[:2] for event in tracer.events] == [
+        ('cache', 'view'), ('parse', conf.path), ('cache', 'parse')]
+    assert not tracing.get_tracer().enabled
+
+
+def test_logging_tracer(copy_sample, caplog):
+    path = copy_sample('minimal.config')
+    conf = kubeconfig.KubeConfig(path, backend='native', cache=False,
+                                 tracer=tracing.LoggingTracer())
+    with caplog.at_level(logging.DEBUG, logger='kubeconfig'):
+        conf.set_cluster('c', server='https://c')
+    messages = [record.getMessage() for record in caplog.records]
+    assert len(messages) == 3
+    assert messages[0].startswith('parse: %s' % path)
+    assert messages[1] == 'cache: parse miss'
+    assert messages[2].startswith('write: %s' % path)
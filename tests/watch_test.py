@@ -0,0 +1,109 @@
+import os
+import queue
+import sys
+import threading
+
+import pytest
+
+import kubeconfig
+from kubeconfig import watch
+from kubeconfig.watch import ChangeEvent
+
+
+def _native(path):
+    return kubeconfig.KubeConfig(path, backend='native')
+
+
+def test_poll(copy_sample):
+    path = copy_sample('simple-complete.config')
+    watcher = watch.ConfigWatcher(path)
+    assert watcher.poll() == []
+    assert 'test-context' in watcher.config['contexts']
+
+    conf = _native(path)
+    with conf.batch():
+        conf.set_cluster('test-cluster', server='https://moved')
+        conf.set_context('new-context', cluster='test-cluster')
+        conf.use_context('new-context')
+        conf.delete_user('test-user')
+    events = watcher.poll()
+    assert ChangeEvent('changed', 'clusters', 'test-cluster', 'server',
+                       'https://192.168.1.100', 'https://moved') in events
+    assert ChangeEvent('added', 'contexts', 'new-context', None, None,
+                       {'cluster': 'test-cluster'}) in events
+    assert ChangeEvent('changed', 'current-context', None, None,
+                       'test-context', 'new-context') in events
+    assert [event[:3] for event in events if event.kind == 'removed'] == [
+        ('removed', 'users', 'test-user')]
+    assert watcher.poll() == []
+
+
+def test_poll_only_reloads_changed_files(copy_sample, tmpdir, monkeypatch):
+    first = copy_sample('simple-complete.config')
+    second = str(tmpdir.join('second.config'))
+    monkeypatch.setenv('KUBECONFIG', os.pathsep.join([first, second]))
+    watcher = watch.ConfigWatcher()
+    kubeconfig.KubeConfig(second, backend='native').set_cluster('other', server='https://o')
+
+    loaded = []
+    load_file = watch.native.load_file
+
+    def _load_file(filename, **kwargs):
+        loaded.append(filename)
+        return load_file(filename, **kwargs)
+    monkeypatch.setattr(watch.native, 'load_file', _load_file)
+    events = watcher.poll()
+    assert loaded == [second]
+    assert [event[:3] for event in events] == [('added', 'clusters', 'other')]
+
+
+def test_poll_keeps_unparseable_files(copy_sample):
+    path = copy_sample('simple-complete.config')
+    watcher = watch.ConfigWatcher(path)
+    with open(path, 'w') as fobj:
+        fobj.write('clusters: [')
+    assert watcher.poll() == []
+    assert 'test-context' in watcher.config['contexts']
+
+
+@pytest.mark.parametrize('inotify', [True, False])
+def test_watch(copy_sample, inotify):
+    path = copy_sample('simple-complete.config')
+    conf = _native(path)
+    received = queue.Queue()
+    watcher = watch.ConfigWatcher(path, interval=0.05, debounce=0.05, inotify=inotify)
+    watcher.subscribe(received.put)
+    with watcher:
+        conf.use_context('test-context')  # No change to report.
+        conf.set_context('test-context', namespace='other')
+        conf.rename_context('test-context', 'renamed')
+        events = received.get(timeout=5)
+        while not any(event.kind == 'added' for event in events):
+            events = received.get(timeout=5)
+    assert ChangeEvent('added', 'contexts', 'renamed', None, None,
+                       {'cluster': 'test-cluster', 'namespace': 'other',
+                        'user': 'test-user'}) in events
+
+
+@pytest.mark.skipif(not sys.platform.startswith('linux'), reason='inotify is Linux-only')
+def test_inotify_follows_symlinks(copy_sample, tmpdir):
+    target = copy_sample('simple-complete.config')
+    link = str(tmpdir.mkdir('links').join('config'))
+    os.symlink(target, link)
+    source = watch._InotifySource([link], threading.Event())
+    try:
+        _native(link).set_cluster('test-cluster', server='https://moved')
+        assert source.wait(5)
+    finally:
+        source.close()
+
+
+def test_kubeconfig_watch(copy_sample):
+    path = copy_sample('simple-complete.config')
+    received = queue.Queue()
+    conf = _native(path)
+    with conf.watch(received.put, interval=0.05, debounce=0.05):
+        conf.set_cluster('test-cluster', server='https://moved')
+        events = received.get(timeout=5)
+    assert events == [ChangeEvent('changed', 'clusters', 'test-cluster', 'server',
+                                  'https://192.168.1.100', 'https://moved')]